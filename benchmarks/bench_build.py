@@ -0,0 +1,225 @@
+"""
+Benchmark suite for the whole builder, on a synthetic vault.
+
+Generates a reproducible vault (see `synthetic_vault.py`), then measures:
+
+- full `build.py` runs, each in its own process: a cold build, a warm
+  (incremental, nothing changed) build and a cold parallel build, reporting
+  wall time, notes per second and the process's peak RSS, best of
+  `--repeat` runs;
+- the individual stages, in this process: `render_markdown` over every note,
+  `resolve_asset_reference` over every embed, and manifest serialization
+  (`write_manifest`) in both formats, best of `--repeat` runs;
+- file counts of the vault and of the output.
+
+Results can be saved as a baseline JSON and later runs compared against it:
+any metric that is worse than the baseline by more than `--threshold` (a
+fraction) is reported as a regression and the script exits with status 1.
+Baselines are only comparable on the same machine and vault spec.
+
+Usage:
+    python benchmarks/bench_build.py [vault spec options] [--jobs 4] [--repeat 3]
+                                     [--save-baseline PATH] [--baseline PATH] [--threshold 0.15]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from builder.assets import resolve_asset_reference  # noqa: E402
+from builder.constants import DEFAULT_OUTPUT_SUFFIX  # noqa: E402
+from builder.index import VaultIndex  # noqa: E402
+from builder.manifest import build_directory, write_manifest  # noqa: E402
+from builder.markdown import IMAGE_PATTERN, render_markdown  # noqa: E402
+from builder.models import BuildContext, BuildPlan  # noqa: E402
+from builder.utils import format_size  # noqa: E402
+from synthetic_vault import add_spec_arguments, generate_vault, spec_from_arguments  # noqa: E402
+
+BUILD_SCRIPT = Path(__file__).resolve().parent.parent / "build.py"
+HIGHER = "higher"
+LOWER = "lower"
+
+Metrics = Dict[str, Dict]
+
+
+def metric(value: float, unit: str, better: str) -> Dict:
+    """A measurement, with the direction in which it improves."""
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def run_build(vault: Path, workdir: Path, *options: str) -> Tuple[float, Optional[float]]:
+    """
+    Runs `build.py` in a child process.
+
+    Returns:
+        The wall time in seconds and the child's peak RSS in MB (None where
+        the platform cannot report it).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(BUILD_SCRIPT), str(vault), *options], cwd=workdir, stdout=subprocess.DEVNULL)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+        peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    else:
+        process.wait()
+        elapsed, peak = time.perf_counter() - started, None
+    if process.returncode != 0:
+        raise SystemExit(f"build.py {' '.join(options)} failed with status {process.returncode}")
+    return elapsed, peak
+
+
+def best_of(repeat: int, function: Callable[[], None]) -> float:
+    """Returns the shortest of `repeat` timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_full_builds(vault: Path, workdir: Path, notes: int, jobs: int, repeat: int) -> Metrics:
+    """Times cold, warm and parallel runs of `build.py`, keeping the fastest of `repeat` runs each."""
+    metrics: Metrics = {}
+    for name, options in (
+        ("cold build", ["--clean"]),
+        ("warm build", []),
+        (f"cold build --jobs {jobs}", ["--clean", "--jobs", str(jobs)]),
+    ):
+        runs = [run_build(vault, workdir, *options) for _ in range(repeat)]
+        seconds = min(elapsed for elapsed, _ in runs)
+        metrics[f"{name}: time"] = metric(seconds, "s", LOWER)
+        metrics[f"{name}: notes/s"] = metric(notes / seconds, "notes/s", HIGHER)
+        if runs[0][1] is not None:
+            metrics[f"{name}: peak RSS"] = metric(max(peak for _, peak in runs), "MB", LOWER)
+    return metrics
+
+
+def bench_stages(vault: Path, workdir: Path, repeat: int) -> Metrics:
+    """Times rendering, asset resolution and manifest serialization in this process."""
+    ctx = BuildContext(source_root=vault, output_root=workdir / "stages", index=VaultIndex.scan(vault))
+    notes = [(path, path.read_text(encoding="utf-8")) for path in sorted(vault.rglob("*.md"))]
+    size_mb = sum(len(text.encode("utf-8")) for _, text in notes) / (1024 * 1024)
+    references = [
+        (path.parent, match.group(1) or match.group(3))
+        for path, text in notes
+        for match in IMAGE_PATTERN.finditer(text)
+    ]
+
+    def render_all() -> None:
+        for path, text in notes:
+            render_markdown(ctx, path, text)
+
+    def resolve_all() -> None:
+        for directory, reference in references:
+            resolve_asset_reference(ctx, directory, reference)
+
+    metrics: Metrics = {}
+    seconds = best_of(repeat, render_all)
+    metrics["render_markdown: MB/s"] = metric(size_mb / seconds, "MB/s", HIGHER)
+    metrics["render_markdown: notes/s"] = metric(len(notes) / seconds, "notes/s", HIGHER)
+    seconds = best_of(repeat, resolve_all)
+    metrics["resolve_asset_reference: refs/s"] = metric(len(references) / seconds, "refs/s", HIGHER)
+
+    # A planning pass yields the full manifest tree without rendering anything.
+    ctx.output_root.mkdir(exist_ok=True)
+    ctx.plan = BuildPlan()
+    manifest_root = build_directory(ctx, directory=vault, slug_segments=[], ancestor_chain=[])
+    ctx.plan = None
+    for version in (1, 2):
+        ctx.manifest_version = version
+        seconds = best_of(repeat, lambda: write_manifest(ctx, manifest_root))
+        size = (ctx.output_root / "manifest.json").stat().st_size
+        metrics[f"manifest v{version}: time"] = metric(seconds * 1000, "ms", LOWER)
+        metrics[f"manifest v{version}: size"] = metric(size / 1024, "KB", LOWER)
+    return metrics
+
+
+def count_files(root: Path) -> Tuple[int, int]:
+    """Returns the number and total size of the files beneath a directory."""
+    files = [path for path in root.rglob("*") if path.is_file()]
+    return len(files), sum(path.stat().st_size for path in files)
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compares results with a baseline.
+
+    Returns:
+        The names of the metrics that regressed by more than `threshold`.
+    """
+    if results["spec"] != baseline["spec"]:
+        raise SystemExit("The baseline was recorded for a different vault spec; regenerate it with --save-baseline.")
+    regressions = []
+    print(f"\n{'metric':<40}{'baseline':>12}{'now':>12}{'change':>9}")
+    for name, now in results["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if before is None or not before["value"]:
+            continue
+        change = (now["value"] - before["value"]) / before["value"]
+        worse = -change if now["better"] == HIGHER else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40}{before['value']:>12.4g}{now['value']:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_spec_arguments(parser)
+    parser.add_argument("--jobs", type=int, default=4, help="Worker processes for the parallel build.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per build and stage (the best is kept).")
+    parser.add_argument("--save-baseline", type=Path, metavar="PATH", help="Write the results as a baseline JSON.")
+    parser.add_argument("--baseline", type=Path, metavar="PATH", help="Compare the results with a baseline JSON.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Tolerated slowdown as a fraction (default: 0.15).")
+    args = parser.parse_args()
+    spec = spec_from_arguments(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp).resolve()
+        vault = workdir / "vault"
+        counts = generate_vault(vault, spec)
+        metrics = bench_full_builds(vault, workdir, counts.notes + counts.directories, args.jobs, args.repeat)
+        output_files, output_bytes = count_files(workdir / f"{vault.name}{DEFAULT_OUTPUT_SUFFIX}")
+        metrics.update(bench_stages(vault, workdir, args.repeat))
+
+    results = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "spec": asdict(spec),
+        "counts": {**asdict(counts), "output files": output_files, "output bytes": output_bytes},
+        "metrics": metrics,
+    }
+    print(f"Vault: {counts.directories} directories, {counts.notes} notes, {counts.images} images, "
+          f"{counts.scenes} scenes, {counts.embeds} embeds ({format_size(counts.bytes)})")
+    print(f"Output: {output_files} files ({format_size(output_bytes)})\n")
+    for name, measured in metrics.items():
+        print(f"{name:<40}{measured['value']:>12.4g} {measured['unit']}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark for `builder.markdown.render_markdown`.
+
+Builds a throwaway vault containing a few images and one large note made of a
+realistic mix of headings, paragraphs and image embeds, then renders the note
+repeatedly and reports throughput in MB/s of Markdown input.
+
+Usage:
+    python benchmarks/bench_markdown.py [--size-mb 4] [--repeat 5]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from builder.index import VaultIndex  # noqa: E402
+from builder.markdown import render_markdown  # noqa: E402
+from builder.models import BuildContext  # noqa: E402
+
+LINE_TEMPLATES = [
+    "# Heading {n}",
+    "### Sub heading {n} & more",
+    "A paragraph line number {n} with some <em>inline</em> text that runs on for a while.",
+    "Another plain line {n}.",
+    "",
+    "![[image-{m}.png]]",
+    "![Figure {n}](graphics/image-{m}.png)",
+    "![[diagram-{m}]]",
+]
+
+
+def make_note(size_bytes: int, image_count: int, seed: int = 0) -> str:
+    """Generates Markdown text of roughly `size_bytes` bytes."""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        line = rng.choice(LINE_TEMPLATES).format(n=n, m=rng.randrange(image_count))
+        lines.append(line)
+        total += len(line) + 1
+        n += 1
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=4.0, help="Size of the generated note in MB.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed renders.")
+    parser.add_argument("--images", type=int, default=50, help="Number of distinct images in the vault.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        graphics = root / "graphics"
+        graphics.mkdir()
+        for m in range(args.images):
+            (graphics / f"image-{m}.png").write_bytes(b"")
+            (graphics / f"diagram-{m}.excalidraw").write_text("{}", encoding="utf-8")
+        note = root / "notes" / "big.md"
+        note.parent.mkdir()
+        text = make_note(int(args.size_mb * 1024 * 1024), args.images)
+        note.write_text(text, encoding="utf-8")
+        size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+        for label, index in (("file system", None), ("vault index", VaultIndex.scan(root))):
+            ctx = BuildContext(source_root=root, output_root=root / "out", index=index)
+            render_markdown(ctx, note, text)  # warm up
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                render_markdown(ctx, note, text)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"{label:>12}: {size_mb:.2f} MB in {best * 1000:.1f} ms (best of {args.repeat}) -> {size_mb / best:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark for the full-text search index (`builder.search`).
+
+Builds a throwaway vault of generated notes twice, without and with a search
+index attached, and reports the build overhead and the index size, both
+scaled to 1,000 notes. It then edits one note and times the incremental
+rebuild of the index.
+
+Usage:
+    python benchmarks/bench_search.py [--notes 1000] [--words 400]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from builder.constants import SEARCH_DIR_NAME  # noqa: E402
+from builder.index import VaultIndex  # noqa: E402
+from builder.manifest import build_directory, write_manifest  # noqa: E402
+from builder.models import BuildContext  # noqa: E402
+from builder.search import SearchIndex  # noqa: E402
+from builder.state import BuildState  # noqa: E402
+from builder.utils import format_size  # noqa: E402
+
+NOTES_PER_DIRECTORY = 50
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    """Generates pronounceable made-up words."""
+    syllables = ["ka", "lo", "mi", "ne", "ra", "su", "to", "vi", "ber", "dan", "gor", "pel", "tin", "zor"]
+    return ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def make_vault(root: Path, notes: int, words: int, seed: int = 0) -> None:
+    """Writes a vault of `notes` notes of about `words` words each."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(5000, rng)
+    # A Zipf-like draw gives a realistic mix of common and rare terms.
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    (root / "README.md").write_text("# Bench vault\nGenerated notes.\n", encoding="utf-8")
+    for n in range(notes):
+        directory = root / f"section-{n // NOTES_PER_DIRECTORY}"
+        if not directory.exists():
+            directory.mkdir()
+            (directory / "README.md").write_text(f"# Section {n // NOTES_PER_DIRECTORY}\n", encoding="utf-8")
+        lines = [f"# Note {n}"]
+        drawn = rng.choices(vocabulary, weights, k=words)
+        for start in range(0, words, 40):
+            if start and start % 200 == 0:
+                lines.append(f"## Part {start // 200}")
+            lines.append(" ".join(drawn[start:start + 40]) + ".")
+        (directory / f"note-{n}.md").write_text("\n".join(lines), encoding="utf-8")
+
+
+def build(source_root: Path, output_root: Path, search: bool) -> float:
+    """Runs a serial build, returning its duration in seconds."""
+    started = time.perf_counter()
+    state = BuildState.load(output_root)
+    ctx = BuildContext(
+        source_root=source_root,
+        output_root=output_root,
+        state=state,
+        index=VaultIndex.scan(source_root),
+        search=SearchIndex.load(output_root) if search else None,
+    )
+    manifest_root = build_directory(ctx, directory=source_root, slug_segments=[], ancestor_chain=[])
+    write_manifest(ctx, manifest_root)
+    if ctx.search is not None:
+        ctx.search.write(manifest_root)
+    state.prune(ctx)
+    state.save()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1000, help="Number of generated notes.")
+    parser.add_argument("--words", type=int, default=400, help="Words per note.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        vault = root / "vault"
+        vault.mkdir()
+        make_vault(vault, args.notes, args.words)
+        scale = 1000 / args.notes
+
+        plain = build(vault, root / "plain", search=False)
+        indexed = build(vault, root / "indexed", search=True)
+        search_dir = root / "indexed" / SEARCH_DIR_NAME
+        shards = list(search_dir.iterdir())
+        size = sum(path.stat().st_size for path in shards)
+
+        edited = next(vault.glob("section-0/note-*.md"))
+        edited.write_text(edited.read_text(encoding="utf-8") + "\nA freshly added paragraph.", encoding="utf-8")
+        incremental = build(vault, root / "indexed", search=True)
+
+        print(f"{args.notes} notes of {args.words} words")
+        print(f"  build without index: {plain * 1000:.0f} ms")
+        print(f"  build with index:    {indexed * 1000:.0f} ms "
+              f"(+{(indexed - plain) * 1000 * scale:.0f} ms per 1,000 notes)")
+        print(f"  index size:          {format_size(size)} in {len(shards)} files "
+              f"({format_size(size * scale)} per 1,000 notes)")
+        print(f"  one note edited:     {incremental * 1000:.0f} ms incremental rebuild")
+
+
+if __name__ == "__main__":
+    main()
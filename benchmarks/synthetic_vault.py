@@ -0,0 +1,226 @@
+"""
+Generator for reproducible synthetic vaults, used by the build benchmarks.
+
+The vault is a tree of directories `depth` levels deep with `fanout`
+subdirectories per directory. Every directory has a README and
+`notes_per_dir` notes of about `note_words` words, with headings and
+paragraphs drawn from a Zipf-weighted made-up vocabulary. Every directory
+also has a `graphics` folder of small PNG images and Excalidraw scenes,
+nested `graphics_depth` folders deep. Notes embed images at a rate of
+`image_density` embeds per paragraph, mixing Obsidian-style embeds (resolved
+through the `graphics` folders of the note's directory and its ancestors),
+relative Markdown links into nested folders, Excalidraw embeds with and
+without the extension, and a few broken references.
+
+The same spec and seed always produce byte-identical files.
+
+Usage:
+    python benchmarks/synthetic_vault.py OUTPUT [--depth 3] [--fanout 3] [--notes-per-dir 10]
+                                                [--note-words 300] [--image-density 0.3]
+                                                [--images-per-dir 4] [--scenes-per-dir 1]
+                                                [--graphics-depth 2] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+import struct
+import zlib
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import List
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "su", "to", "vi", "ber", "dan", "gor", "pel", "tin", "zor"]
+VOCABULARY_SIZE = 5000
+WORDS_PER_PARAGRAPH = 40
+PARAGRAPHS_PER_SECTION = 5
+# One embed in this many is left unresolvable.
+BROKEN_EMBED_RATE = 50
+
+
+@dataclass
+class VaultSpec:
+    """The shape of a synthetic vault."""
+    depth: int = 3
+    fanout: int = 3
+    notes_per_dir: int = 10
+    note_words: int = 300
+    image_density: float = 0.3
+    images_per_dir: int = 4
+    scenes_per_dir: int = 1
+    graphics_depth: int = 2
+    seed: int = 0
+
+
+@dataclass
+class VaultCounts:
+    """What `generate_vault` wrote."""
+    directories: int = 0
+    notes: int = 0
+    images: int = 0
+    scenes: int = 0
+    embeds: int = 0
+    bytes: int = 0
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Generates pronounceable made-up words."""
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def make_png(width: int, height: int, colour: bytes) -> bytes:
+    """Encodes a valid single-colour RGB PNG."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + colour * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def make_scene(rng: random.Random, label: str) -> str:
+    """Generates an Excalidraw scene of a few connected boxes."""
+    elements = []
+    for box in range(rng.randint(2, 5)):
+        x, y = box * 160, rng.randint(0, 120)
+        elements.append({
+            "id": f"box-{box}", "type": rng.choice(["rectangle", "ellipse", "diamond"]),
+            "x": x, "y": y, "width": 120, "height": 60, "angle": 0,
+            "strokeColor": "#1e1e1e", "backgroundColor": rng.choice(["transparent", "#a5d8ff", "#ffc9c9"]),
+            "fillStyle": rng.choice(["solid", "hachure"]), "strokeWidth": 2, "opacity": 100, "isDeleted": False,
+        })
+        elements.append({
+            "id": f"text-{box}", "type": "text", "x": x + 10, "y": y + 20, "width": 100, "height": 25,
+            "text": f"{label} {box}", "fontSize": 20, "fontFamily": 1, "textAlign": "left",
+            "strokeColor": "#1e1e1e", "opacity": 100, "isDeleted": False,
+        })
+        if box:
+            elements.append({
+                "id": f"arrow-{box}", "type": "arrow", "x": x - 40, "y": y + 30, "width": 40, "height": 0,
+                "points": [[0, 0], [40, 0]], "strokeColor": "#1e1e1e", "strokeWidth": 2, "opacity": 100,
+                "endArrowhead": "arrow", "isDeleted": False,
+            })
+    scene = {"type": "excalidraw", "version": 2, "source": "synthetic", "elements": elements,
+             "appState": {"viewBackgroundColor": "#ffffff"}, "files": {}}
+    return json.dumps(scene, indent=2)
+
+
+class _Generator:
+    """Writes one vault; holds the random state and running counts."""
+
+    def __init__(self, spec: VaultSpec) -> None:
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.vocabulary = make_vocabulary(VOCABULARY_SIZE, self.rng)
+        # A Zipf-like draw gives a realistic mix of common and rare terms.
+        self.weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+        self.counts = VaultCounts()
+
+    def write(self, path: Path, data: bytes) -> None:
+        path.write_bytes(data)
+        self.counts.bytes += len(data)
+
+    def directory(self, path: Path, level: int, embeddable: List[str]) -> None:
+        """Writes a directory, its graphics and notes, then its subdirectories."""
+        path.mkdir(parents=True, exist_ok=True)
+        self.counts.directories += 1
+        title = path.name.replace("-", " ").title() if level else "Synthetic vault"
+        self.write(path / "README.md", f"# {title}\n{self.paragraph()}\n".encode("utf-8"))
+
+        # Images directly in `graphics` are found from this directory and all
+        # of its descendants; nested ones need a relative path.
+        local: List[str] = []
+        nested: List[str] = []
+        folder = path / "graphics"
+        for nesting in range(self.spec.graphics_depth):
+            folder.mkdir(parents=True, exist_ok=True)
+            prefix = "/".join(["graphics"] + [f"set-{n}" for n in range(1, nesting + 1)])
+            for n in range(self.spec.images_per_dir):
+                name = f"img-{level}-{self.counts.directories}-{nesting}-{n}.png"
+                colour = bytes(self.rng.randrange(256) for _ in range(3))
+                self.write(folder / name, make_png(self.rng.randint(32, 96), self.rng.randint(24, 72), colour))
+                self.counts.images += 1
+                (local if nesting == 0 else nested).append(name if nesting == 0 else f"{prefix}/{name}")
+            for n in range(self.spec.scenes_per_dir):
+                name = f"scene-{level}-{self.counts.directories}-{nesting}-{n}"
+                self.write(folder / f"{name}.excalidraw", make_scene(self.rng, name).encode("utf-8"))
+                self.counts.scenes += 1
+                if nesting == 0:
+                    local.append(name if n % 2 else f"{name}.excalidraw")
+            folder = folder / f"set-{nesting + 1}"
+
+        visible = embeddable + local
+        for n in range(self.spec.notes_per_dir):
+            self.write(path / f"note-{n}.md", self.note(f"{title} note {n}", visible, nested).encode("utf-8"))
+            self.counts.notes += 1
+
+        if level < self.spec.depth:
+            for n in range(self.spec.fanout):
+                self.directory(path / f"topic-{level + 1}-{n}", level + 1, visible)
+
+    def paragraph(self) -> str:
+        return " ".join(self.rng.choices(self.vocabulary, self.weights, k=WORDS_PER_PARAGRAPH)) + "."
+
+    def embed(self, visible: List[str], nested: List[str]) -> str:
+        self.counts.embeds += 1
+        if self.rng.randrange(BROKEN_EMBED_RATE) == 0:
+            return "![[missing-image.png]]"
+        if nested and self.rng.random() < 0.25:
+            return f"![Figure]({self.rng.choice(nested)})"
+        return f"![[{self.rng.choice(visible)}]]" if visible else ""
+
+    def note(self, title: str, visible: List[str], nested: List[str]) -> str:
+        lines = [f"# {title}"]
+        for n in range(max(1, self.spec.note_words // WORDS_PER_PARAGRAPH)):
+            if n and n % PARAGRAPHS_PER_SECTION == 0:
+                lines.append(f"## Section {n // PARAGRAPHS_PER_SECTION}")
+            lines.append(self.paragraph())
+            if self.rng.random() < self.spec.image_density:
+                lines.append(self.embed(visible, nested))
+        return "\n".join(lines) + "\n"
+
+
+def generate_vault(root: Path, spec: VaultSpec) -> VaultCounts:
+    """
+    Writes a synthetic vault.
+
+    Args:
+        root: The vault directory; it is created if needed and should be empty.
+        spec: The vault's shape.
+
+    Returns:
+        How many directories, notes, images, scenes and embeds were written,
+        and their total size in bytes.
+    """
+    generator = _Generator(spec)
+    generator.directory(root, 0, [])
+    return generator.counts
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds one option per `VaultSpec` field to a parser."""
+    for spec_field in fields(VaultSpec):
+        parser.add_argument(f"--{spec_field.name.replace('_', '-')}", type=type(spec_field.default), default=spec_field.default,
+                            help=f"default: {spec_field.default}")
+
+
+def spec_from_arguments(args: argparse.Namespace) -> VaultSpec:
+    """Reads a `VaultSpec` back from parsed options."""
+    return VaultSpec(**{spec_field.name: getattr(args, spec_field.name) for spec_field in fields(VaultSpec)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", type=Path, help="Directory to write the vault to.")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    if args.output.exists() and any(args.output.iterdir()):
+        parser.error(f"{args.output} is not empty")
+
+    spec = spec_from_arguments(args)
+    counts = generate_vault(args.output, spec)
+    print(json.dumps({"spec": asdict(spec), "counts": asdict(counts)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
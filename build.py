@@ -7,32 +7,138 @@ command-line arguments, sets up the build context, and orchestrates the
 conversion by calling the core logic from the 'builder' package.
 
 Usage:
-    python build.py /path/to/your/vault [--out /path/to/output_dir]
+    python build.py /path/to/your/vault [--out /path/to/output_dir] [--clean] [--jobs N] [--watch]
+                    [--copy-mode {copy,skip,hardlink,reflink}] [--manifest-version {1,2}]
+                    [--manifest-deltas N] [--previews]
+                    [--packs] [--pack-max-size BYTES] [--pack-max-fragment BYTES]
+                    [--images] [--hashed-assets] [--slim-scenes] [--search] [--embeddings] [--embedder {hashing,sentence-transformers}]
+                    [--migrate-embeddings PICKLE] [--semantic] [--related N]
+                    [--compress] [--compress-min-size BYTES] [--profile [TRACE]] [--profile-top N]
 
 Example:
     python build.py ~/Documents/Obsidian/MyVault --out ./my-site
 
 The script will:
 1.  Read the source vault.
-2.  Create an output directory (e.g., 'MyVault_ready_2_serve').
+2.  Create an output directory (e.g., 'MyVault_ready_2_serve'). If a previous
+    build left its state file there, the build is incremental: only notes whose
+    text or referenced assets changed are re-rendered, unchanged attachments
+    are not copied again, and outputs of deleted sources are removed. Pass
+    '--clean' to wipe the output directory and rebuild everything.
 3.  Recursively scan the vault, starting from the root.
 4.  For each directory containing a 'README.md', it will:
-    - Convert Markdown files (.md) to HTML fragments.
+    - Convert Markdown files (.md) to HTML fragments. '[[Note Name]]'
+      wikilinks become links to the named note's page, resolved through an
+      index of note names built before rendering.
     - Copy over any other files (e.g., images, PDFs).
     - Special 'graphics' directories are copied directly.
+    - Render embedded Excalidraw scenes to SVG in '_excalidraw/' (cached by
+      scene hash), so the interactive viewer is only loaded on click.
+    '--copy-mode' picks how those files are written: 'skip' (the default)
+    leaves files whose size and mtime already match, 'hardlink' and 'reflink'
+    share the vault's bytes instead of duplicating them, and 'copy' always
+    copies. A summary of bytes copied versus skipped is printed at the end.
+    With '--jobs N' (N > 1) the scan only plans this work; notes are then
+    rendered in N worker processes while attachments are copied by N threads.
+    With '--images', PNG, JPEG and WebP images first get downscaled WebP
+    derivatives in '_images/' (encoded in a process pool and cached by
+    content hash), and notes embed them with 'srcset', 'width', 'height' and
+    'loading="lazy"'. Needs Pillow.
+    With '--hashed-assets', attachments are instead stored once per distinct
+    content as '_assets/<hash>.<ext>', fragments link to those blobs and the
+    manifest gets an 'assets' map from vault paths to blobs. Duplicated
+    images are written once, and '_assets/' can be cached forever.
+    With '--slim-scenes', Excalidraw scenes are written without deleted
+    elements, edit history, editor state or unused files, as compact JSON;
+    their embedded images move to '_assets/<hash>.<ext>', shared by every
+    diagram that pastes the same image. The vault is left untouched.
 5.  Generate a 'manifest.json' file in the output directory, which contains
     the entire navigable structure of the processed notes for the SPA to use.
+    Each node lists the notes it links to, its backlinks and its unresolved
+    wikilinks. Version 2 (the default) is compact and carries a slug path index;
+    '--manifest-version 1' emits the original pretty-printed tree.
+    With '--previews', each note's node also gets a preview (an excerpt of
+    its first paragraph, its heading outline, its word count and its first
+    image) and the content hash of its fragment, collected while it renders,
+    so directory listings can show more than titles without fetching.
+    With '--packs', each directory's README and note fragments are also
+    concatenated into packs in '_packs/' (split at '--pack-max-size' bytes,
+    leaving out fragments over '--pack-max-fragment' bytes), and the manifest
+    records each fragment's pack, offset and length, so the client loads a
+    directory's notes with one request.
+    With '--manifest-deltas N', the manifest also gets a content hash (and
+    each node the hash of its fragment), and '_deltas/' holds one small
+    delta from each of the last N manifests to the new one, so returning
+    clients patch their cached copy instead of downloading it again.
+6.  With '--search', also write a full-text search index to '_search/': an
+    inverted index split into shards by term prefix, so the browser only
+    fetches the shards a query needs. Only re-rendered notes are tokenized.
+7.  With '--embeddings', update the note embedding store in '.embeddings/':
+    a float32 matrix (memory-mapped when read) plus a table of note paths and
+    content hashes. Only notes whose content changed are embedded again.
+    '--embedder' picks the model; the default hashes terms and works offline.
+    '--migrate-embeddings' first converts an old 'embedding_cache.pkl'; it
+    needs '--embedder sentence-transformers', the model its vectors came
+    from. Needs NumPy.
+    '--semantic' also exports the vectors for the browser to '_semantic/' as
+    chunked int8 codes with per-row scales, along with each note's
+    '--related N' most similar notes.
+8.  With '--compress', minify the HTML fragments as they are rendered, and
+    after the build write '.gz' (and, if the 'brotli' module is installed,
+    '.br') variants of every text output of at least '--compress-min-size'
+    bytes, using all CPU cores, then print raw versus compressed sizes per
+    file type. Watch mode does not recompress. A build without '--compress'
+    deletes the variants an earlier one wrote.
+9.  With '--profile', time each build phase and every note rendered, file
+    copied and asset reference resolved, write the spans to a Chrome
+    trace-event file ('build-profile.json' by default; open it in
+    chrome://tracing or Perfetto), and print the phase times, file system
+    counters and the '--profile-top N' slowest files.
+10. With '--watch', keep polling the vault and apply each edit incrementally:
+    only the touched notes are re-rendered and the manifest is rewritten.
 """
 
-import json
+import argparse
 import shutil
-import sys
-from datetime import datetime, timezone
 from pathlib import Path
 
-from builder.constants import DEFAULT_OUTPUT_SUFFIX, MANIFEST_FILENAME
-from builder.manifest import build_directory
-from builder.models import BuildContext
+from builder import embeddings
+from builder.asset_store import AssetStore
+from builder.compress import compress_output, remove_compressed
+from builder.constants import (
+    COPY_MODE_SKIP,
+    COPY_MODES,
+    DEFAULT_EMBEDDER,
+    DEFAULT_MANIFEST_VERSION,
+    DEFAULT_MIN_COMPRESS_SIZE,
+    DEFAULT_PACK_MAX_FRAGMENT,
+    DEFAULT_PACK_MAX_SIZE,
+    DEFAULT_PROFILE_TOP,
+    DEFAULT_PROFILE_TRACE,
+    DEFAULT_RELATED_NOTES,
+    DEFAULT_OUTPUT_SUFFIX,
+    MANIFEST_DELTAS_DIR_NAME,
+    MANIFEST_HISTORY_FILENAME,
+    MANIFEST_VERSIONS,
+    PACKS_DIR_NAME,
+    SEARCH_DIR_NAME,
+    SEMANTIC_DIR_NAME,
+)
+from builder.deltas import ManifestDeltas
+from builder.excalidraw import prune_previews
+from builder.images import Image, ImagePipeline
+from builder.index import VaultIndex
+from builder.links import LinkIndex
+from builder.manifest import build_directory, write_manifest
+from builder.models import BuildContext, BuildPlan
+from builder.packs import FragmentPacks
+from builder.parallel import run_plan
+from builder.profile import Profiler, profiled
+from builder.search import SearchIndex
+from builder.semantic import export_semantic
+from builder.state import BuildState
+from builder.utils import format_size
+from builder.watch import VaultWatcher
 
 
 def main() -> None:
@@ -41,49 +147,214 @@ def main() -> None:
 
     Parses arguments, prepares directories, and initiates the manifest build.
     """
-    if len(sys.argv) != 2:
-        raise SystemExit(f"Usage: python {sys.argv[0]} /path/to/your/vault")
+    parser = argparse.ArgumentParser(description="Build the Notes content from an Obsidian vault.")
+    parser.add_argument("vault", help="Path to the Obsidian vault to convert.")
+    parser.add_argument("--clean", action="store_true", help="Wipe the output directory and rebuild everything.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="Render notes in N worker processes (default: 1).")
+    parser.add_argument("--watch", action="store_true", help="After building, keep rebuilding changed notes until interrupted.")
+    parser.add_argument("--copy-mode", choices=COPY_MODES, default=COPY_MODE_SKIP, help="How attachments are written to the output (default: skip).")
+    parser.add_argument("--manifest-version", type=int, choices=MANIFEST_VERSIONS, default=DEFAULT_MANIFEST_VERSION, help=f"Manifest format to emit (default: {DEFAULT_MANIFEST_VERSION}).")
+    parser.add_argument("--manifest-deltas", type=int, default=0, metavar="N", help="Publish deltas from the last N manifests (needs manifest version 2).")
+    parser.add_argument("--previews", action="store_true", help="Store each note's excerpt, outline, word count and first image in the manifest.")
+    parser.add_argument("--packs", action="store_true", help="Also bundle each directory's fragments into packs fetched in one request.")
+    parser.add_argument("--pack-max-size", type=int, default=DEFAULT_PACK_MAX_SIZE, metavar="BYTES", help=f"Split a directory's fragments into packs of at most this size (default: {DEFAULT_PACK_MAX_SIZE}).")
+    parser.add_argument("--pack-max-fragment", type=int, default=DEFAULT_PACK_MAX_FRAGMENT, metavar="BYTES", help=f"Leave larger fragments out of packs (default: {DEFAULT_PACK_MAX_FRAGMENT}).")
+    parser.add_argument("--images", action="store_true", help="Generate responsive WebP image derivatives (needs Pillow).")
+    parser.add_argument("--hashed-assets", action="store_true", help="Store attachments once each as _assets/<hash>.<ext>.")
+    parser.add_argument("--slim-scenes", action="store_true", help="Write Excalidraw scenes in minimal form, their images as hashed assets.")
+    parser.add_argument("--search", action="store_true", help="Write a sharded full-text search index of the notes.")
+    parser.add_argument("--embeddings", action="store_true", help="Update the note embedding store for semantic search (needs NumPy).")
+    parser.add_argument("--embedder", choices=sorted(embeddings.EMBEDDERS), default=DEFAULT_EMBEDDER, help=f"Embedding model for --embeddings (default: {DEFAULT_EMBEDDER}).")
+    parser.add_argument("--migrate-embeddings", type=Path, metavar="PICKLE", help="Convert an embedding_cache.pkl into the store before updating it.")
+    parser.add_argument("--semantic", action="store_true", help="Export quantized embeddings and related notes for the browser (implies --embeddings).")
+    parser.add_argument("--related", type=int, default=DEFAULT_RELATED_NOTES, metavar="N", help=f"Related notes listed per note with --semantic (default: {DEFAULT_RELATED_NOTES}).")
+    parser.add_argument("--compress", action="store_true", help="Minify fragments and write gzip/brotli variants of text outputs.")
+    parser.add_argument("--compress-min-size", type=int, default=DEFAULT_MIN_COMPRESS_SIZE, metavar="BYTES", help=f"Smallest output to compress (default: {DEFAULT_MIN_COMPRESS_SIZE}).")
+    parser.add_argument("--profile", type=Path, nargs="?", const=Path(DEFAULT_PROFILE_TRACE), metavar="TRACE", help=f"Time the build and write a Chrome trace (default: {DEFAULT_PROFILE_TRACE}).")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_PROFILE_TOP, metavar="N", help=f"Slowest files listed with --profile (default: {DEFAULT_PROFILE_TOP}).")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.manifest_deltas < 0:
+        parser.error("--manifest-deltas must not be negative")
+    if args.manifest_deltas and args.manifest_version == 1:
+        parser.error("--manifest-deltas needs --manifest-version 2")
+    if args.pack_max_size < 1 or args.pack_max_fragment < 1:
+        parser.error("--pack-max-size and --pack-max-fragment must be positive")
+    if args.migrate_embeddings and args.embedder != "sentence-transformers":
+        # The pickled vectors come from that model; others would discard them.
+        parser.error("--migrate-embeddings needs --embedder sentence-transformers")
+    if args.migrate_embeddings or args.semantic:
+        args.embeddings = True
+    if args.images and Image is None:
+        parser.error("--images needs Pillow (pip install pillow)")
+    if args.embeddings and embeddings.np is None:
+        parser.error("--embeddings needs NumPy (pip install numpy)")
+    if args.embeddings and args.embedder == "sentence-transformers" and not embeddings.sentence_transformers_available():
+        parser.error("--embedder sentence-transformers needs the sentence-transformers package (pip install sentence-transformers)")
 
-    vault_path = sys.argv[1]
-    source_root = Path(vault_path).resolve()
+    source_root = Path(args.vault).resolve()
 
     if not source_root.exists() or not source_root.is_dir():
         raise SystemExit(f"Error: Vault path not found or is not a directory.\nProvided path: {source_root}")
 
     output_root = Path(f"{source_root.name}{DEFAULT_OUTPUT_SUFFIX}").resolve()
 
-    if output_root.exists():
+    state = BuildState.load(output_root)
+    if output_root.exists() and (args.clean or not state.has_previous):
+        # Without a usable state file we cannot tell which outputs are stale.
         print(f"Removing existing output directory: {output_root}")
         shutil.rmtree(output_root)
+        state = BuildState.load(output_root)
     output_root.mkdir(parents=True, exist_ok=True)
 
     print(f"Source vault: {source_root}")
     print(f"Outputting to: {output_root}")
 
     # The BuildContext holds all the essential path information.
-    ctx = BuildContext(source_root=source_root, output_root=output_root)
+    ctx = BuildContext(
+        source_root=source_root,
+        output_root=output_root,
+        state=state,
+        copy_mode=args.copy_mode,
+        manifest_version=args.manifest_version,
+        slim_scenes=args.slim_scenes,
+        previews=args.previews,
+        minify=args.compress,
+        search=SearchIndex.load(output_root) if args.search else None,
+        profiler=Profiler() if args.profile else None,
+        deltas=ManifestDeltas(args.manifest_deltas) if args.manifest_deltas else None,
+        packs=FragmentPacks(args.pack_max_size, args.pack_max_fragment) if args.packs else None,
+    )
+
+    # The vault is listed once up front; lookups during the build hit memory.
+    with profiled(ctx, "scan vault"):
+        ctx.index = index = VaultIndex.scan(source_root)
+        ctx.links = LinkIndex.scan(ctx)
+
+    if args.jobs > 1:
+        ctx.plan = BuildPlan()
+    if args.hashed_assets:
+        # Fragments link to blobs instead of the attachments' own paths.
+        state.settings["hashed_assets"] = True
+        ctx.assets = AssetStore()
+    if args.previews:
+        # Notes rendered without previews must be rendered again to get them.
+        state.settings["previews"] = True
+    if args.compress:
+        # Fragments are minified as they render, before packs and hashes see them.
+        state.settings["minify"] = True
+    if args.slim_scenes:
+        # Scenes copied before are rewritten (see file_system.copy_file).
+        state.settings["slim_scenes"] = True
+    if args.images:
+        # Fragments rendered with and without derivatives differ.
+        state.settings["images"] = True
+        ctx.images = ImagePipeline.load(output_root)
+        with profiled(ctx, "prepare images"):
+            image_stats = ctx.images.prepare(ctx)
+        print(f"Images: {image_stats.images} found, {image_stats.encoded} encoded, {image_stats.removed} stale derivatives removed.")
 
     # Start the recursive build process from the root of the vault.
-    manifest_root = build_directory(ctx, directory=source_root, slug_segments=[], ancestor_chain=[])
+    with profiled(ctx, "plan build" if ctx.plan is not None else "build directories"):
+        manifest_root = build_directory(ctx, directory=source_root, slug_segments=[], ancestor_chain=[])
     if manifest_root is None:
         raise SystemExit("Build failed: Root directory must contain a README.md to seed the Notes content.")
 
-    # Assemble the final manifest object.
-    manifest = {
-        "source": str(source_root),
-        "output": str(output_root),
-        "publicPath": f"/{output_root.name}",
-        "generatedAt": datetime.now(timezone.utc).isoformat(),
-        "version": 1,
-        "root": manifest_root,
-    }
+    if ctx.plan is not None:
+        with profiled(ctx, "run plan", notes=len(ctx.plan.notes), copies=len(ctx.plan.copies), trees=len(ctx.plan.trees)):
+            run_plan(ctx, ctx.plan, args.jobs)
+        ctx.plan = None
+
+    # Assemble and write the manifest.json file.
+    with profiled(ctx, "write manifest"):
+        manifest_path = write_manifest(ctx, manifest_root)
+    if ctx.packs is None and (output_root / PACKS_DIR_NAME).is_dir():
+        # Packs of an earlier build with '--packs' would go stale.
+        shutil.rmtree(output_root / PACKS_DIR_NAME)
+    if ctx.search is None and (output_root / SEARCH_DIR_NAME).is_dir():
+        # The manifest no longer names it, so an earlier index would only go stale.
+        shutil.rmtree(output_root / SEARCH_DIR_NAME)
+    if not args.semantic and (output_root / SEMANTIC_DIR_NAME).is_dir():
+        # An earlier export would keep relating notes that changed since.
+        shutil.rmtree(output_root / SEMANTIC_DIR_NAME)
+    if ctx.deltas is None:
+        # Deltas of an earlier build with '--manifest-deltas' would still name
+        # its manifest as the latest, so returning clients would keep theirs.
+        if (output_root / MANIFEST_DELTAS_DIR_NAME).is_dir():
+            shutil.rmtree(output_root / MANIFEST_DELTAS_DIR_NAME)
+        (output_root / MANIFEST_HISTORY_FILENAME).unlink(missing_ok=True)
+    if ctx.packs is not None:
+        pack_stats = ctx.packs.stats
+        print(f"Fragment packs: {pack_stats.fragments} fragments in {pack_stats.packs} packs "
+              f"({format_size(pack_stats.bytes)}, {pack_stats.written} packs written, {pack_stats.removed} removed).")
+
+    if ctx.search is not None:
+        with profiled(ctx, "write search index"):
+            search_stats = ctx.search.write(manifest_root)
+        print(f"Search index: {search_stats.notes} notes, {search_stats.terms} terms in {search_stats.shards} shards "
+              f"({format_size(search_stats.bytes)}, {search_stats.shards_written} shards rewritten).")
 
-    # Write the manifest.json file.
-    manifest_path = output_root / MANIFEST_FILENAME
-    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    if args.embeddings:
+        if args.migrate_embeddings:
+            try:
+                migrated = embeddings.migrate_pickle(args.migrate_embeddings, ctx)
+            except ValueError as error:
+                raise SystemExit(f"Error: Cannot migrate embeddings: {error}")
+            print(f"Migrated {migrated} embeddings from {args.migrate_embeddings}.")
+        with profiled(ctx, "update embeddings"):
+            update = embeddings.update_store(ctx, embeddings.EMBEDDERS[args.embedder]())
+        print(f"Embeddings: {update.embedded} notes embedded, {update.reused} reused, {update.removed} dropped.")
+        if args.semantic:
+            with profiled(ctx, "export semantic index"):
+                export = export_semantic(ctx, embeddings.EmbeddingStore.load(embeddings.store_directory(ctx)), manifest_root, args.related)
+            print(f"Semantic export: {export.notes} notes in {export.chunks} chunks "
+                  f"({format_size(export.bytes)}, {export.chunks_written} chunks rewritten).")
 
+    with profiled(ctx, "prune and save state"):
+        removed = len(state.prune(ctx)) + prune_previews(ctx)
+        state.save()
+    print(f"Rendered {state.rendered} notes, reused {state.reused}, removed {removed} stale outputs.")
+    print("Files " + ", ".join(
+        f"{action} {count} ({format_size(ctx.copy_stats.bytes[action])})"
+        for action, count in sorted(ctx.copy_stats.files.items())
+    ) + ".")
+
+    if args.compress:
+        with profiled(ctx, "compress"):
+            report = compress_output(ctx, args.compress_min_size)
+        print("\nCompressed sizes:")
+        for line in report.format():
+            print(f"  {line}")
+    else:
+        # Variants of an earlier build with '--compress' would shadow the new outputs.
+        stale = remove_compressed(ctx)
+        if stale:
+            print(f"\nRemoved {stale} compressed variants of an earlier build.")
+
+    unresolved = index.unresolved_report()
+    if unresolved:
+        print(f"\n{len(unresolved)} unresolved asset references:")
+        for line in unresolved:
+            print(f"  {line}")
+    unresolved_links = ctx.links.unresolved_report()
+    if unresolved_links:
+        print(f"\n{len(unresolved_links)} unresolved wikilinks:")
+        for line in unresolved_links:
+            print(f"  {line}")
     print(f"\nBuild complete. Manifest written to {manifest_path}")
 
+    if ctx.profiler is not None:
+        ctx.profiler.write_trace(args.profile)
+        print(f"\nProfile trace written to {args.profile}")
+        for line in ctx.profiler.summary(args.profile_top):
+            print(f"  {line}")
+        # Watch mode is not profiled.
+        ctx.profiler = None
+
+    if args.watch:
+        VaultWatcher(ctx, manifest_root).run()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+"""
+This file implements the optional content-addressed asset store.
+
+With `--hashed-assets`, every attachment the build copies (any file that is
+not a Markdown note) is written to `_assets/<hash>.<ext>` in the output
+directory instead of under its original path. The hash is the first 16 hex
+digits of the file's SHA-1, the same digest the build state records, and the
+extension is the original one, lower-cased. An image duplicated across
+several `graphics` folders is therefore stored once, and because an edited
+file gets a new name, everything in `_assets/` can be served with
+immutable, long-lived cache headers.
+
+Fragments point straight at the blobs (see `assets.normalise_image_src`),
+and the manifest carries an `assets` map from each attachment's vault path to
+its blob, for clients that need to find an attachment by its original name.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from .constants import ASSETS_DIR_NAME, MARKDOWN_SUFFIX
+from .models import BuildContext
+from .state import hash_file, source_key
+
+
+@dataclass
+class AssetStore:
+    """
+    Names attachments after their content.
+
+    `stored` maps the vault path of every attachment copied by this process
+    to its blob's output-relative path. `digests` caches file hashes where no
+    build state is attached (in worker processes); with a state, its
+    fingerprints are used instead, so watch mode sees edits.
+    """
+    stored: Dict[str, str] = field(default_factory=dict)
+    digests: Dict[str, str] = field(default_factory=dict)
+
+    def blob_path(self, ctx: BuildContext, source: Path) -> Optional[str]:
+        """
+        Returns the output-relative path of a file's blob.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to a file in the vault.
+
+        Returns:
+            A path such as "_assets/0123456789abcdef.png", or None for a
+            Markdown note, which keeps its own path.
+        """
+        suffix = source.suffix.lower()
+        if suffix == MARKDOWN_SUFFIX:
+            return None
+        if ctx.state is not None:
+            digest = ctx.state.fingerprint(ctx, source).digest
+        else:
+            key = source_key(ctx, source)
+            digest = self.digests.get(key)
+            if digest is None:
+                digest = self.digests[key] = hash_file(source)
+        return f"{ASSETS_DIR_NAME}/{digest[:16]}{suffix}"
+
+    def store(self, ctx: BuildContext, source: Path) -> Optional[Path]:
+        """
+        Records that a file is copied into the store.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the file being copied.
+
+        Returns:
+            The absolute destination of its blob, or None for a Markdown note.
+        """
+        blob = self.blob_path(ctx, source)
+        if blob is None:
+            return None
+        self.stored[source_key(ctx, source)] = blob
+        return ctx.output_root / blob
+
+    def asset_map(self, ctx: BuildContext) -> Dict[str, str]:
+        """
+        Returns the manifest's asset map: vault paths mapped to blob paths.
+
+        With a build state attached, attachments the state no longer tracks
+        (files deleted while watching) are left out.
+        """
+        return {
+            key: blob
+            for key, blob in sorted(self.stored.items())
+            if ctx.state is None or key in ctx.state.current
+        }
@@ -8,25 +8,36 @@ is a critical step for ensuring images render correctly.
 """
 
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
+from .constants import GRAPHICS_DIR_NAME
 from .models import BuildContext
+from .profile import RESOLVE, profiled
 from .utils import is_within, posix_relpath
 
 
-def normalise_image_src(ctx: BuildContext, source_dir: Path, relative_dir: Path, raw_reference: str) -> str:
+def normalise_image_src(
+    ctx: BuildContext,
+    source_dir: Path,
+    relative_dir: Path,
+    raw_reference: str,
+    resolve: Optional[Callable[[str], Optional[Path]]] = None,
+) -> str:
     """
     Resolves an image reference and normalizes it for the output HTML.
 
     It takes a raw image reference string, resolves its absolute path using
     `resolve_asset_reference`, and then calculates the relative path from the
-    Markdown file's location to the asset's final location.
+    Markdown file's location to the asset's final location (its blob in
+    `_assets/` when an asset store is attached).
 
     Args:
         ctx: The build context.
         source_dir: The directory containing the Markdown file.
         relative_dir: The relative path of the source directory from the vault root.
         raw_reference: The image src from the Markdown (e.g., "image.png").
+        resolve: An optional resolver already bound to `source_dir`, such as
+            a per-note cache, used instead of `resolve_asset_reference`.
 
     Returns:
         A normalized, relative POSIX path for the <img> src attribute.
@@ -35,13 +46,18 @@ def normalise_image_src(ctx: BuildContext, source_dir: Path, relative_dir: Path,
     if not reference:
         return ""
 
-    resolved_asset_path = resolve_asset_reference(ctx, source_dir, reference)
+    if resolve is not None:
+        resolved_asset_path = resolve(reference)
+    else:
+        resolved_asset_path = resolve_asset_reference(ctx, source_dir, reference)
     if not resolved_asset_path:
         # If resolution fails, return the original reference as a fallback.
         return reference
 
-    # The asset's path relative to the *entire* vault.
-    asset_relative_to_source_root = resolved_asset_path.relative_to(ctx.source_root)
+    # The asset's path relative to the *entire* vault, or its blob's path
+    # when attachments are content-addressed.
+    blob = ctx.assets.blob_path(ctx, resolved_asset_path) if ctx.assets is not None else None
+    asset_relative_to_source_root = Path(blob) if blob else resolved_asset_path.relative_to(ctx.source_root)
 
     try:
         # Calculate the path from the current HTML file's directory to the asset.
@@ -64,6 +80,10 @@ def resolve_asset_reference(ctx: BuildContext, source_dir: Path, reference: str)
     3. If not found, search in a 'graphics' subdirectory of the current
        directory and all ancestor directories up to the vault root.
 
+    A reference without an extension is also tried with '.excalidraw'
+    appended. When the build context carries a vault index, each candidate is
+    a dictionary lookup; otherwise it is probed on the file system.
+
     Args:
         ctx: The build context.
         source_dir: The directory of the Markdown file referencing the asset.
@@ -73,46 +93,62 @@ def resolve_asset_reference(ctx: BuildContext, source_dir: Path, reference: str)
         An absolute Path object to the asset if found and within the vault,
         otherwise None.
     """
-    normalised_ref = reference.replace("\\", "/")
-    source_dir = source_dir.resolve()
+    with profiled(ctx, reference, RESOLVE):
+        normalised_ref = reference.replace("\\", "/")
+        if ctx.index is None:
+            source_dir = source_dir.resolve()
+
+        for candidate in asset_candidates(ctx, source_dir, normalised_ref):
+            if ctx.profiler is not None:
+                ctx.profiler.count("asset probes")
+            if ctx.index is not None:
+                resolved = ctx.index.locate_file(candidate)
+            else:
+                resolved = candidate.resolve()
+                if not (resolved.exists() and resolved.is_file()):
+                    resolved = None
+            if resolved is not None and is_within(resolved, ctx.source_root):
+                return resolved
+
+        return None
+
 
-    # Rule 1: Direct relative path (e.g., ../graphics/image.png)
-    direct_candidate = (source_dir / normalised_ref).resolve()
-    if direct_candidate.exists() and direct_candidate.is_file() and is_within(direct_candidate, ctx.source_root):
-        return direct_candidate
+def asset_candidates(ctx: BuildContext, source_dir: Path, normalised_ref: str) -> Iterator[Path]:
+    """
+    Yields the paths an asset reference may point to, in resolution order.
+
+    Args:
+        ctx: The build context.
+        source_dir: The directory of the Markdown file referencing the asset.
+        normalised_ref: The reference with forward slashes only.
+
+    Yields:
+        Candidate paths, which may still contain '..' segments.
+    """
+    # Rule 1: Direct relative path (e.g., ../graphics/image.png), which also
+    # covers Rule 2, a simple filename in the same directory.
+    yield source_dir / normalised_ref
 
     # If the reference contains a path separator but wasn't found, it's a broken link.
     if "/" in normalised_ref:
-        return None
+        return
 
-    # Rule 2: Simple filename in the same directory.
-    candidate_in_same_dir = (source_dir / normalised_ref).resolve()
-    if candidate_in_same_dir.exists() and candidate_in_same_dir.is_file() and is_within(candidate_in_same_dir, ctx.source_root):
-        return candidate_in_same_dir
-    
     # Rule 2b: If no extension, try adding .excalidraw extension
-    if "." not in normalised_ref:
-        excalidraw_candidate = (source_dir / f"{normalised_ref}.excalidraw").resolve()
-        if excalidraw_candidate.exists() and excalidraw_candidate.is_file() and is_within(excalidraw_candidate, ctx.source_root):
-            return excalidraw_candidate
+    try_excalidraw = "." not in normalised_ref
+    if try_excalidraw:
+        yield source_dir / f"{normalised_ref}.excalidraw"
 
     # Rule 3: Search in 'graphics' subdirectories up the tree.
     current_dir = source_dir
     while True:
-        graphics_dir = current_dir / "graphics"
-        candidate_in_graphics = (graphics_dir / normalised_ref).resolve()
-        if candidate_in_graphics.exists() and candidate_in_graphics.is_file() and is_within(candidate_in_graphics, ctx.source_root):
-            return candidate_in_graphics
-        
+        graphics_dir = current_dir / GRAPHICS_DIR_NAME
+        yield graphics_dir / normalised_ref
+
         # Rule 3b: Also try with .excalidraw extension in graphics directories
-        if "." not in normalised_ref:
-            excalidraw_in_graphics = (graphics_dir / f"{normalised_ref}.excalidraw").resolve()
-            if excalidraw_in_graphics.exists() and excalidraw_in_graphics.is_file() and is_within(excalidraw_in_graphics, ctx.source_root):
-                return excalidraw_in_graphics
-        
-        if current_dir == ctx.source_root:
+        if try_excalidraw:
+            yield graphics_dir / f"{normalised_ref}.excalidraw"
+
+        if current_dir == ctx.source_root or current_dir.parent == current_dir:
             # Stop searching once we've checked the root.
             break
         current_dir = current_dir.parent
-
-    return None
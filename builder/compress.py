@@ -0,0 +1,258 @@
+"""
+This file implements the optional post-build compression stage.
+
+Static hosts and CDNs can serve a precompressed `.gz` or `.br` sibling of a
+file directly instead of compressing it on every request. After a build, this
+stage writes gzip (and, when the `brotli` module is installed, Brotli)
+variants of every text output above a size threshold. Files are processed in
+parallel across cores, and files whose variants are newer than the file
+itself are skipped, so unchanged outputs of an incremental build cost only a
+stat.
+
+The HTML fragments are minified with `minify_html` as they are rendered (see
+manifest.write_markdown_fragment) rather than here: the manifest's fragment
+hashes and the fragment packs are made before this stage runs, and must
+describe the bytes that are served.
+"""
+
+import gzip
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .constants import DEFAULT_MIN_COMPRESS_SIZE
+from .models import BuildContext
+from .state import remove_empty_parents
+from .utils import format_size
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped when the module is missing.
+    brotli = None
+
+TEXT_SUFFIXES = {".html", ".json", ".md", ".excalidraw", ".svg", ".css", ".js", ".txt"}
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+# Tags around which whitespace never affects rendering.
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "details", "div", "dl", "dd", "dt",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+INTER_TAG_WHITESPACE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)([^<>]*)>(\s+)(?=<(/?)([a-zA-Z][a-zA-Z0-9]*))")
+
+
+@dataclass
+class CompressionReport:
+    """
+    Raw and compressed byte totals per file type for one compression run.
+
+    Each dictionary is keyed by file suffix (e.g. ".html"). A type's brotli
+    total only counts files for which a Brotli variant was written.
+    """
+    files: Dict[str, int] = field(default_factory=dict)
+    raw: Dict[str, int] = field(default_factory=dict)
+    gzip: Dict[str, int] = field(default_factory=dict)
+    brotli: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, suffix: str, raw_size: int, gzip_size: int, brotli_size: Optional[int]) -> None:
+        """Adds one file's sizes to its type's totals."""
+        self.files[suffix] = self.files.get(suffix, 0) + 1
+        self.raw[suffix] = self.raw.get(suffix, 0) + raw_size
+        self.gzip[suffix] = self.gzip.get(suffix, 0) + gzip_size
+        if brotli_size is not None:
+            self.brotli[suffix] = self.brotli.get(suffix, 0) + brotli_size
+
+    def format(self) -> List[str]:
+        """Returns the report as aligned table lines."""
+        lines = [f"{'type':<12}{'files':>7}{'raw':>12}{'gzip':>12}{'brotli':>12}"]
+        for suffix in sorted(self.files):
+            brotli_total = format_size(self.brotli[suffix]) if suffix in self.brotli else "-"
+            lines.append(
+                f"{suffix:<12}{self.files[suffix]:>7}{format_size(self.raw[suffix]):>12}"
+                f"{format_size(self.gzip[suffix]):>12}{brotli_total:>12}"
+            )
+        return lines
+
+
+def minify_html(html: str) -> str:
+    """
+    Removes whitespace that cannot affect how an HTML fragment renders.
+
+    Whitespace between two tags is dropped when either tag is a block-level
+    element, and collapsed to a single space otherwise (between two images,
+    for example, it is visible). Text content is never touched.
+
+    Args:
+        html: The HTML fragment.
+
+    Returns:
+        The minified fragment.
+    """
+    def replace(match: "re.Match[str]") -> str:
+        left, right = match.group(2).lower(), match.group(6).lower()
+        tag = match.group(0)[:-len(match.group(4))]
+        if left in BLOCK_TAGS or right in BLOCK_TAGS:
+            return tag
+        return f"{tag} "
+
+    return INTER_TAG_WHITESPACE.sub(replace, html.strip())
+
+
+def compress_output(ctx: BuildContext, min_size: int = DEFAULT_MIN_COMPRESS_SIZE, jobs: Optional[int] = None) -> CompressionReport:
+    """
+    Writes compressed variants of text outputs.
+
+    No output is rewritten; copied attachments in particular share bytes
+    with the vault when they are hard links. Variants whose original no
+    longer exists (e.g. after a stale output was pruned) are deleted, along
+    with any directories this leaves empty. A copied attachment named like a
+    variant (`data.txt.gz` next to `data.txt`) is never touched.
+
+    Args:
+        ctx: The build context.
+        min_size: Files smaller than this many bytes get no compressed
+            variants.
+        jobs: Worker processes to use; defaults to the number of CPUs.
+
+    Returns:
+        A report of raw versus compressed sizes per file type.
+    """
+    output_root = ctx.output_root
+    candidates: List[Path] = []
+    variants: List[Path] = []
+    produced = recorded_outputs(ctx)
+    for path in walk_output(output_root):
+        if path.suffix in COMPRESSED_SUFFIXES:
+            variants.append(path)
+        elif path.suffix.lower() in TEXT_SUFFIXES and not any(
+            f"{path.relative_to(output_root).as_posix()}{suffix}" in produced for suffix in COMPRESSED_SUFFIXES
+        ):
+            # An output whose variant name is taken by a copied attachment is
+            # left alone, or that attachment would be overwritten or deleted.
+            candidates.append(path)
+    for path in compression_variants(ctx, variants):
+        if not path.with_suffix("").exists():
+            path.unlink()
+            remove_empty_parents(path.parent, output_root)
+
+    report = CompressionReport()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(compress_file, candidates, [min_size] * len(candidates), chunksize=32)
+        for path, result in zip(candidates, results):
+            if result is None:
+                continue
+            report.add(path.suffix.lower(), *result)
+    return report
+
+
+def remove_compressed(ctx: BuildContext) -> int:
+    """
+    Deletes the compressed variants an earlier build with compression wrote.
+
+    A build without compression rewrites outputs but not their variants,
+    which hosts would then serve in place of the new bytes.
+
+    Args:
+        ctx: The build context.
+
+    Returns:
+        The number of variants deleted.
+    """
+    removed = 0
+    for path in compression_variants(ctx, [path for path in walk_output(ctx.output_root) if path.suffix in COMPRESSED_SUFFIXES]):
+        path.unlink()
+        remove_empty_parents(path.parent, ctx.output_root)
+        removed += 1
+    return removed
+
+
+def walk_output(output_root: Path) -> Iterator[Path]:
+    """Yields every file of the output directory, skipping hidden ones."""
+    for current_dir, directories, filenames in os.walk(output_root):
+        directories[:] = [name for name in directories if not name.startswith(".")]
+        for filename in filenames:
+            if not filename.startswith("."):
+                yield Path(current_dir) / filename
+
+
+def compression_variants(ctx: BuildContext, paths: List[Path]) -> List[Path]:
+    """
+    Picks the compression stage's variants out of `.gz` and `.br` files.
+
+    A variant is named after a text output; files the build state records as
+    outputs of a source (attachments copied from the vault) are never
+    variants.
+    """
+    produced = recorded_outputs(ctx)
+    return [
+        path for path in paths
+        if path.with_suffix("").suffix.lower() in TEXT_SUFFIXES
+        and path.relative_to(ctx.output_root).as_posix() not in produced
+    ]
+
+
+def recorded_outputs(ctx: BuildContext) -> Set[str]:
+    """Returns the output-relative paths the build state records as outputs."""
+    return {
+        output
+        for record in (ctx.state.current.values() if ctx.state is not None else [])
+        for output in record.outputs
+    }
+
+
+def compress_file(path: Path, min_size: int) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    Writes the compressed variants of one text output.
+
+    A file whose gzip variant is newer than itself was handled by an earlier
+    run and is only measured. Variants that would not be smaller than the
+    original are not written.
+
+    Args:
+        path: The text output to process.
+        min_size: The size threshold below which nothing is written.
+
+    Returns:
+        (raw size, gzip size, brotli size or None), or None if the file is
+        below the threshold.
+    """
+    gzip_path = path.with_name(path.name + ".gz")
+    brotli_path = path.with_name(path.name + ".br")
+    if gzip_path.exists() and gzip_path.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        raw_size = path.stat().st_size
+        brotli_size = brotli_path.stat().st_size if brotli_path.exists() else None
+        return raw_size, gzip_path.stat().st_size, brotli_size
+
+    data = path.read_bytes()
+    if len(data) < min_size:
+        for variant in (gzip_path, brotli_path):
+            variant.unlink(missing_ok=True)
+        return None
+
+    # mtime=0 keeps the gzip bytes identical across builds of the same file.
+    gzip_data = gzip.compress(data, compresslevel=9, mtime=0)
+    gzip_size = write_variant(gzip_path, gzip_data, len(data))
+
+    brotli_size = None
+    if brotli is not None:
+        brotli_size = write_variant(brotli_path, brotli.compress(data, quality=11), len(data))
+    return len(data), gzip_size, brotli_size
+
+
+def write_variant(path: Path, data: bytes, raw_size: int) -> int:
+    """
+    Writes a compressed variant if it saves bytes, otherwise removes any old one.
+
+    Returns:
+        The number of bytes a client will download for this encoding.
+    """
+    if len(data) >= raw_size:
+        path.unlink(missing_ok=True)
+        return raw_size
+    path.write_bytes(data)
+    return len(data)
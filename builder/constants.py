@@ -10,5 +10,82 @@ build logic.
 MARKDOWN_SUFFIX = ".md"
 README_NAME = "README.md"
 MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSIONS = (1, 2)
+DEFAULT_MANIFEST_VERSION = 2
+# Deltas between successive manifests (see deltas.py).
+MANIFEST_DELTAS_DIR_NAME = "_deltas"
+MANIFEST_HISTORY_FILENAME = ".manifest-history.json"
 DEFAULT_OUTPUT_SUFFIX = "_ready_2_serve"
 GRAPHICS_DIR_NAME = "graphics"
+# The SPA route notes are served under (see links.py and toNotesHref in notes/content-store.js).
+NOTES_ROUTE = "/notes"
+BUILD_STATE_FILENAME = ".build-state.json"
+
+# How attachments are written to the output directory (see file_system.write_copy).
+COPY_MODE_COPY = "copy"
+COPY_MODE_SKIP = "skip"
+COPY_MODE_HARDLINK = "hardlink"
+COPY_MODE_REFLINK = "reflink"
+COPY_MODES = (COPY_MODE_COPY, COPY_MODE_SKIP, COPY_MODE_HARDLINK, COPY_MODE_REFLINK)
+
+# Text outputs smaller than this get no precompressed variants (see compress.py).
+DEFAULT_MIN_COMPRESS_SIZE = 1024
+
+# The full-text search index (see search.py).
+SEARCH_DIR_NAME = "_search"
+SEARCH_INDEX_FILENAME = "index.json"
+SEARCH_CACHE_FILENAME = ".search-cache.json"
+SEARCH_SHARD_PREFIX_LENGTH = 2
+
+# The note embedding store (see embeddings.py).
+EMBEDDINGS_DIR_NAME = ".embeddings"
+EMBEDDING_VECTORS_FILENAME = "vectors.npy"
+EMBEDDING_TABLE_FILENAME = "table.json"
+DEFAULT_EMBEDDER = "hashing"
+
+# The semantic search export for the browser (see semantic.py).
+SEMANTIC_DIR_NAME = "_semantic"
+SEMANTIC_INDEX_FILENAME = "index.json"
+DEFAULT_RELATED_NOTES = 5
+
+# Responsive image derivatives (see images.py).
+IMAGES_DIR_NAME = "_images"
+IMAGE_CACHE_FILENAME = ".image-cache.json"
+IMAGE_WIDTHS = (480, 960, 1440)
+# Notes are displayed at most ~700 CSS pixels wide.
+IMAGE_SIZES = "(max-width: 760px) 100vw, 700px"
+
+# Excalidraw scenes pre-rendered to SVG (see excalidraw.py).
+EXCALIDRAW_DIR_NAME = "_excalidraw"
+
+# The content-addressed attachment store (see asset_store.py).
+ASSETS_DIR_NAME = "_assets"
+
+# Note previews stored on manifest nodes (see previews.py).
+PREVIEW_EXCERPT_LENGTH = 200
+PREVIEW_OUTLINE_LENGTH = 20
+
+# Per-directory fragment packs (see packs.py).
+PACKS_DIR_NAME = "_packs"
+DEFAULT_PACK_MAX_SIZE = 512 * 1024
+DEFAULT_PACK_MAX_FRAGMENT = 128 * 1024
+
+# Build profiling (see profile.py).
+DEFAULT_PROFILE_TRACE = "build-profile.json"
+DEFAULT_PROFILE_TOP = 10
+
+# Preprocessed GeoJSON layers for modular_map (see map_tiles.py).
+MAP_INDEX_FILENAME = "index.json"
+MAP_PROPERTIES_FILENAME = "properties.json"
+MAP_TILES_DIR_NAME = "tiles"
+DEFAULT_MAP_ZOOMS = (4, 6, 8, 10, 12)
+DEFAULT_SIMPLIFY_PIXELS = 1.0
+# A level's tiles are this many zoom levels coarser than the level, so about
+# four tiles cover the viewport, but never finer than MAX_MAP_TILE_ZOOM.
+MAP_TILE_ZOOM_OFFSET = 2
+MAX_MAP_TILE_ZOOM = 8
+MAP_COORDINATE_DECIMALS = 6
+
+# The attribute search index of a preprocessed map layer (see map_search.py).
+MAP_SEARCH_INDEX_FILENAME = "search.json"
+MAP_SEARCH_DATA_FILENAME = "search.bin"
@@ -0,0 +1,234 @@
+"""
+This file publishes manifest deltas, so returning clients download only what
+changed since the manifest they already hold.
+
+With `--manifest-deltas N`, every version 2 manifest gets a `hash` that
+depends only on its content (not on `generatedAt`), and every node's HTML
+fragment gets an `htmlHash`, so clients can cache fragments by content and
+refetch only the notes that changed.
+
+The manifest is compared per directory: a directory's entry is its node
+without node ids and with its subdirectories replaced by their keys (their
+vault-relative paths), together with its file nodes. Ids, parents and the
+slug index are positional and are recomputed by the client. The content
+hashes of the entries of the last N manifests are kept in a history file in
+the output directory. Each build then writes, for every one of those older
+manifests, `_deltas/<old hash>.json` holding the entries and top-level
+fields that were added, changed or removed (as null) between it and the new
+manifest, and `_deltas/latest.json` naming the current hash. A client holding
+any of the last N manifests needs one small request to check it is current
+and one more to catch up; older clients download the full manifest.
+"""
+
+import hashlib
+import json
+import posixpath
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from .constants import MANIFEST_DELTAS_DIR_NAME, MANIFEST_HISTORY_FILENAME
+from .models import BuildContext
+from .state import hash_file
+
+DELTA_FORMAT = 1
+# Top-level manifest members that are not compared: the tree and its index
+# are compared per directory, and the timestamp changes on every build.
+UNCOMPARED_MEMBERS = ("root", "index", "generatedAt", "hash")
+
+
+@dataclass
+class ManifestSnapshot:
+    """
+    A manifest's content hashes, and its directory entries for writing deltas.
+
+    `members` and `directories` map top-level members and directory keys to
+    their content hashes; only those are kept in the history file.
+    """
+    hash: str
+    members: Dict[str, str]
+    directories: Dict[str, str]
+    entries: Dict[str, Dict] = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class DeltaStats:
+    """What one `ManifestDeltas.publish` call did."""
+    written: int = 0
+    removed: int = 0
+    changed_directories: int = 0
+
+
+@dataclass
+class ManifestDeltas:
+    """Publishes deltas from the last `keep` manifests to the current one."""
+    keep: int
+
+    def snapshot(self, manifest: Dict) -> ManifestSnapshot:
+        """
+        Hashes a version 2 manifest.
+
+        Args:
+            manifest: The manifest object, without its `hash`.
+
+        Returns:
+            The manifest's snapshot; its `hash` is stable across builds that
+            produce the same content.
+        """
+        entries = directory_entries(manifest["root"])
+        members = {
+            name: content_hash(value)
+            for name, value in manifest.items()
+            if name not in UNCOMPARED_MEMBERS
+        }
+        directories = {key: content_hash(entry) for key, entry in entries.items()}
+        return ManifestSnapshot(
+            hash=content_hash({"members": members, "directories": directories}),
+            members=members,
+            directories=directories,
+            entries=entries,
+        )
+
+    def publish(self, ctx: BuildContext, manifest: Dict, snapshot: ManifestSnapshot) -> DeltaStats:
+        """
+        Writes the deltas from every retained manifest to the current one.
+
+        Call this once the new manifest is in place, so that a client never
+        reads a delta to a manifest it cannot fetch yet.
+
+        Args:
+            ctx: The build context.
+            manifest: The manifest that was written.
+            snapshot: Its snapshot.
+
+        Returns:
+            How many deltas were written and removed, and how many directories
+            changed since the previous manifest.
+        """
+        history_path = ctx.output_root / MANIFEST_HISTORY_FILENAME
+        try:
+            history: List[Dict] = json.loads(history_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            history = []
+
+        stats = DeltaStats()
+        if history and history[-1]["hash"] == snapshot.hash:
+            # Nothing changed; the existing deltas already lead here.
+            return stats
+        if history:
+            previous = history[-1]["directories"]
+            stats.changed_directories = sum(
+                1 for key in previous.keys() | snapshot.directories.keys()
+                if previous.get(key) != snapshot.directories.get(key)
+            )
+
+        history = [entry for entry in history if entry["hash"] != snapshot.hash][-self.keep:]
+        directory = ctx.output_root / MANIFEST_DELTAS_DIR_NAME
+        directory.mkdir(parents=True, exist_ok=True)
+        for old in history:
+            delta = {
+                "format": DELTA_FORMAT,
+                "from": old["hash"],
+                "to": snapshot.hash,
+                "members": changed(old["members"], snapshot.members, manifest),
+                "directories": changed(old["directories"], snapshot.directories, snapshot.entries),
+            }
+            (directory / f"{old['hash']}.json").write_text(json.dumps(delta, separators=(",", ":")), encoding="utf-8")
+            stats.written += 1
+
+        retained = {f"{old['hash']}.json" for old in history}
+        for path in directory.glob("*.json"):
+            if path.name != "latest.json" and path.name not in retained:
+                path.unlink()
+                stats.removed += 1
+        latest = {"format": DELTA_FORMAT, "hash": snapshot.hash, "from": [old["hash"] for old in history]}
+        (directory / "latest.json").write_text(json.dumps(latest, separators=(",", ":")), encoding="utf-8")
+
+        history.append({"hash": snapshot.hash, "members": snapshot.members, "directories": snapshot.directories})
+        history_path.write_text(json.dumps(history[-self.keep:], separators=(",", ":")), encoding="utf-8")
+        return stats
+
+
+def directory_entries(root: Dict) -> Dict[str, Dict]:
+    """
+    Splits a version 2 manifest tree into one entry per directory.
+
+    Args:
+        root: The version 2 root node.
+
+    Returns:
+        Each directory's vault-relative path mapped to its node without
+        `id`, with `directories` holding the subdirectories' paths and with
+        `files` holding its file nodes without `id` and `parent`.
+    """
+    entries: Dict[str, Dict] = {}
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        entry = {key: value for key, value in node.items() if key not in ("id", "directories", "files")}
+        entry["directories"] = [directory_key(child) for child in node["directories"]]
+        entry["files"] = [{key: value for key, value in file.items() if key not in ("id", "parent")} for file in node["files"]]
+        entries[directory_key(node)] = entry
+        pending.extend(node["directories"])
+    return entries
+
+
+def directory_key(node: Dict) -> str:
+    """Returns a directory node's vault-relative path ("" for the root)."""
+    return posixpath.dirname(node["readme"]["source"])
+
+
+def attach_fragment_hashes(ctx: BuildContext, manifest_root: Dict) -> None:
+    """
+    Stores the content hash of each node's HTML fragment on the node, as
+    `htmlHash` on file nodes and on directories' `readme`.
+
+    Args:
+        ctx: The build context.
+        manifest_root: The version 1 manifest node of the vault root.
+    """
+    digest = fragment_hasher(ctx)
+    pending = [manifest_root]
+    while pending:
+        node = pending.pop()
+        node["readme"]["htmlHash"] = digest(node["readme"]["html"])
+        for file in node["files"]:
+            file["htmlHash"] = digest(file["html"])
+        pending.extend(node["directories"])
+
+
+def fragment_hasher(ctx: BuildContext) -> Callable[[str], str]:
+    """
+    Returns a function from an output-relative fragment path to the first 16
+    hex digits of the fragment's SHA-1.
+
+    With a build state attached, digests are kept in it, so a fragment is
+    only hashed after it was rendered.
+    """
+    records = {
+        output: record
+        for record in (ctx.state.current.values() if ctx.state is not None else ())
+        for output in record.outputs
+        if output.endswith(".html")
+    }
+
+    def digest(html: str) -> str:
+        record = records.get(html)
+        if record is None:
+            return hash_file(ctx.output_root / html)[:16]
+        if record.fragment is None:
+            record.fragment = hash_file(ctx.output_root / html)[:16]
+        return record.fragment
+
+    return digest
+
+
+def content_hash(value) -> str:
+    """Hashes a JSON value independently of key order."""
+    return hashlib.sha1(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+
+
+def changed(old: Dict[str, str], new: Dict[str, str], values: Dict) -> Dict:
+    """Returns the values whose hashes differ from `old`, and None for the keys that were removed."""
+    delta = {key: values[key] for key, digest in new.items() if old.get(key) != digest}
+    delta.update({key: None for key in old if key not in new})
+    return delta
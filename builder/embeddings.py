@@ -0,0 +1,306 @@
+"""
+This file maintains the note embedding store used for semantic search.
+
+The store lives in the output directory and consists of two files: a
+contiguous float32 matrix saved as `.npy`, with one row per note, and a JSON
+table listing each row's vault-relative note path and the content digest the
+build state recorded for the note, plus the name of the embedder that
+produced the vectors. The matrix is opened with `mmap_mode`, so reading the
+store costs nothing until rows are touched.
+
+After each build, `update_store` re-embeds only the notes whose digest
+changed (or all of them, if the embedder changed), copies every other row
+from the previous matrix, and replaces both files atomically. Unchanged
+notes are not read at all. Embedders are pluggable; the default hashes terms
+into a fixed number of buckets, which is deterministic and needs no model
+download. `migrate_pickle` converts the old
+`semantic-search-notes/embedding_cache.pkl` into a store once.
+
+NumPy is only needed when the store is used.
+"""
+
+import hashlib
+import json
+import math
+import os
+import pickle
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from .constants import EMBEDDING_TABLE_FILENAME, EMBEDDING_VECTORS_FILENAME, EMBEDDINGS_DIR_NAME, MARKDOWN_SUFFIX
+from .models import BuildContext
+from .search import MIN_TERM_LENGTH, TOKEN_PATTERN
+
+try:
+    import numpy as np
+except ImportError:  # The store is unavailable without NumPy.
+    np = None
+
+# Version 1 stored MD5 hashes of the notes instead of build state digests.
+STORE_VERSION = 2
+HASHING_DIMENSION = 384
+EMBED_BATCH_SIZE = 64
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+
+
+class Embedder(Protocol):
+    """Turns note texts into vectors. `name` identifies the vector space."""
+    name: str
+    dimension: int
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Returns a float32 matrix with one row per text."""
+        ...
+
+
+class HashingEmbedder:
+    """
+    Embeds text by hashing its terms into a fixed number of signed buckets.
+
+    Each term adds 1 + log(count) to one bucket, with a sign taken from the
+    same hash so collisions tend to cancel out, and rows are L2-normalised.
+    The hash is BLAKE2b, so vectors are identical across runs and machines.
+    """
+
+    def __init__(self, dimension: int = HASHING_DIMENSION) -> None:
+        self.dimension = dimension
+        self.name = f"hashing-v1-{dimension}"
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, count in Counter(TOKEN_PATTERN.findall(text.lower())).items():
+                if len(term) < MIN_TERM_LENGTH:
+                    continue
+                bucket = self._buckets.get(term)
+                if bucket is None:
+                    value = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+                    bucket = self._buckets[term] = (value % self.dimension, -1.0 if value >> 63 else 1.0)
+                matrix[row, bucket[0]] += bucket[1] * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embeds text with a sentence-transformers model, the model the vectors in
+    `embedding_cache.pkl` came from. Needs the `sentence-transformers` package.
+    """
+
+    def __init__(self, model_name: str = SENTENCE_TRANSFORMER_MODEL) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.name = f"sentence-transformers/{model_name}"
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = self.model.encode(texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def sentence_transformers_available() -> bool:
+    """
+    Checks whether the sentence-transformers package imports, so a build can
+    refuse the embedder up front rather than fail after rendering everything.
+    """
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+EMBEDDERS: Dict[str, Callable[[], Embedder]] = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+
+@dataclass
+class EmbeddingStore:
+    """
+    An embedding matrix and the table describing its rows.
+
+    `vectors` is memory-mapped when the store was loaded from disk. Row `i`
+    belongs to the note `keys[i]`, whose build state digest was `hashes[i]`.
+    """
+    model: str
+    keys: List[str]
+    hashes: List[str]
+    vectors: "np.ndarray"
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["EmbeddingStore"]:
+        """
+        Opens the store in a directory, or returns None if there is no
+        usable store there.
+        """
+        try:
+            table = json.loads((directory / EMBEDDING_TABLE_FILENAME).read_text(encoding="utf-8"))
+            vectors = np.load(directory / EMBEDDING_VECTORS_FILENAME, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if table.get("version") != STORE_VERSION or vectors.shape[0] != len(table["notes"]):
+            return None
+        keys = [key for key, _ in table["notes"]]
+        hashes = [content_hash for _, content_hash in table["notes"]]
+        return cls(model=table["model"], keys=keys, hashes=hashes, vectors=vectors)
+
+    def save(self, directory: Path) -> None:
+        """
+        Writes the store to a directory. Each file is written to a temporary
+        name first and renamed into place, so readers never see a partial file.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors_path = directory / EMBEDDING_VECTORS_FILENAME
+        temporary_vectors = directory / f".{EMBEDDING_VECTORS_FILENAME}.tmp"
+        with temporary_vectors.open("wb") as handle:
+            np.save(handle, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        table = {
+            "version": STORE_VERSION,
+            "model": self.model,
+            "dimension": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "notes": [[key, content_hash] for key, content_hash in zip(self.keys, self.hashes)],
+        }
+        table_path = directory / EMBEDDING_TABLE_FILENAME
+        temporary_table = directory / f".{EMBEDDING_TABLE_FILENAME}.tmp"
+        temporary_table.write_text(json.dumps(table, separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+        os.replace(temporary_vectors, vectors_path)
+        os.replace(temporary_table, table_path)
+
+    def row(self, key: str) -> Optional[int]:
+        """Returns the row of a note, or None if the store has no vector for it."""
+        try:
+            return self.keys.index(key)
+        except ValueError:
+            return None
+
+
+@dataclass
+class EmbeddingUpdate:
+    """What one `update_store` call did."""
+    embedded: int
+    reused: int
+    removed: int
+
+
+def store_directory(ctx: BuildContext) -> Path:
+    """Returns the directory the embedding store of a build lives in."""
+    return ctx.output_root / EMBEDDINGS_DIR_NAME
+
+
+def update_store(ctx: BuildContext, embedder: Embedder) -> EmbeddingUpdate:
+    """
+    Brings the embedding store in line with the notes of the current build.
+
+    The notes are the Markdown sources the build state recorded a fragment
+    for. A note keeps its previous vector if its digest is unchanged and the
+    store was produced by the same embedder; only the other notes are read.
+    Nothing is written if no vector changed.
+
+    Args:
+        ctx: The build context; it must carry the build state.
+        embedder: The embedder for new and changed notes.
+
+    Returns:
+        How many notes were embedded, reused and dropped (including every
+        row of a store produced by another embedder).
+    """
+    directory = store_directory(ctx)
+    previous = EmbeddingStore.load(directory)
+    discarded = 0
+    if previous is not None and previous.model != embedder.name:
+        discarded = len(previous.keys)
+        previous = None
+    previous_rows = {key: row for row, key in enumerate(previous.keys)} if previous is not None else {}
+
+    keys = sorted(
+        key for key, record in ctx.state.current.items()
+        if key.endswith(MARKDOWN_SUFFIX) and any(output.endswith(".html") for output in record.outputs)
+    )
+    hashes: List[str] = []
+    reused: List[Tuple[int, int]] = []
+    changed: List[int] = []
+    texts: List[str] = []
+    for position, key in enumerate(keys):
+        digest = ctx.state.current[key].digest
+        hashes.append(digest)
+        row = previous_rows.get(key)
+        if row is not None and previous.hashes[row] == digest:
+            reused.append((position, row))
+        else:
+            changed.append(position)
+            texts.append((ctx.source_root / key).read_bytes().decode("utf-8", errors="replace"))
+
+    removed = discarded + len(previous_rows.keys() - set(keys))
+    if previous is not None and not changed and previous.keys == keys:
+        return EmbeddingUpdate(embedded=0, reused=len(reused), removed=0)
+
+    vectors = np.empty((len(keys), embedder.dimension), dtype=np.float32)
+    if reused:
+        positions, rows = (np.fromiter(column, dtype=np.intp, count=len(reused)) for column in zip(*reused))
+        vectors[positions] = previous.vectors[rows]
+    for start in range(0, len(changed), EMBED_BATCH_SIZE):
+        batch = changed[start:start + EMBED_BATCH_SIZE]
+        vectors[batch] = embedder.embed(texts[start:start + EMBED_BATCH_SIZE])
+
+    # Release the memory map before its file is replaced.
+    del previous
+    EmbeddingStore(model=embedder.name, keys=keys, hashes=hashes, vectors=vectors).save(directory)
+    return EmbeddingUpdate(embedded=len(changed), reused=len(reused), removed=removed)
+
+
+def migrate_pickle(pickle_path: Path, ctx: BuildContext, model: str = f"sentence-transformers/{SENTENCE_TRANSFORMER_MODEL}") -> int:
+    """
+    Converts an `embedding_cache.pkl` into the store of a build.
+
+    The pickle maps absolute note paths to {"hash": md5 hex, "embedding":
+    float32 vector}. A path is kept if it contains the vault's directory name;
+    the part after it becomes the note's vault-relative key. A vector is
+    migrated if the note's current content still has the pickled MD5 hash,
+    and stored with the note's build state digest, so the next
+    `update_store` with an embedder named `model` reuses it.
+
+    Args:
+        pickle_path: The pickle to convert.
+        ctx: The build context whose output directory receives the store;
+            it must carry the build state.
+        model: The name of the embedder that produced the pickled vectors.
+
+    Returns:
+        The number of vectors migrated.
+
+    Raises:
+        ValueError: If no path in the pickle lies inside the vault, which
+            would otherwise replace the store with an empty one.
+    """
+    with pickle_path.open("rb") as handle:
+        cache = pickle.load(handle)
+
+    marker = f"/{ctx.source_root.name}/"
+    matched = False
+    entries: Dict[str, Tuple[str, "np.ndarray"]] = {}
+    for path, entry in cache.items():
+        posix = str(path).replace("\\", "/")
+        if marker not in posix:
+            continue
+        matched = True
+        key = posix.rsplit(marker, 1)[1]
+        record = ctx.state.current.get(key)
+        if record is not None and hashlib.md5((ctx.source_root / key).read_bytes()).hexdigest() == entry["hash"]:
+            entries[key] = (record.digest, np.asarray(entry["embedding"], dtype=np.float32))
+    if not matched:
+        raise ValueError(f"no note path in {pickle_path} contains {marker!r}")
+
+    keys = sorted(entries)
+    dimension = len(entries[keys[0]][1]) if keys else 0
+    vectors = np.empty((len(keys), dimension), dtype=np.float32)
+    for row, key in enumerate(keys):
+        vectors[row] = entries[key][1]
+    EmbeddingStore(model=model, keys=keys, hashes=[entries[key][0] for key in keys], vectors=vectors).save(store_directory(ctx))
+    return len(keys)
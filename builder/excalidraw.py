@@ -0,0 +1,378 @@
+"""
+This file renders Excalidraw scenes to static SVG at build time.
+
+Notes embed `.excalidraw` files as placeholders that `utils/excalidraw.js`
+turns into an interactive viewer, which pulls React and the Excalidraw bundle
+from a CDN. With a pre-rendered SVG in the placeholder, a page shows the
+diagram immediately, and the viewer is only loaded when the reader asks for
+it.
+
+The renderer covers the common elements: rectangles, ellipses, diamonds,
+lines and arrows (with arrowheads), text, freehand strokes and embedded
+images. Hand-drawn roughness is not imitated; shapes are drawn with clean
+strokes and hachure fills become a hatch pattern.
+
+SVGs are written to `_excalidraw/` in the output directory and named after the
+scene's content hash (the same SHA-1 the build state records), so a scene is
+only rendered again when it changes, and the file can be shared by every note
+that embeds it.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .constants import EXCALIDRAW_DIR_NAME
+from .models import BuildContext
+from .utils import escape_html
+
+SCENE_PADDING = 10
+DEFAULT_LINE_HEIGHT = 1.25
+FONT_FAMILIES = {
+    1: "Virgil, 'Comic Sans MS', 'Segoe Print', cursive",
+    2: "Helvetica, Arial, sans-serif",
+    3: "Cascadia, 'Cascadia Code', Consolas, monospace",
+}
+ARROWHEAD_LENGTH = 15
+ARROWHEAD_ANGLE = math.radians(25)
+DRAWN_TYPES = {"rectangle", "ellipse", "diamond", "line", "arrow", "freedraw", "text", "image"}
+SVG_SIZE_PATTERN = re.compile(rb'width="(\d+)" height="(\d+)"')
+
+Point = Tuple[float, float]
+
+
+def excalidraw_preview(ctx: BuildContext, scene_path: Path) -> Optional[Tuple[str, int, int]]:
+    """
+    Returns the SVG preview of a scene, rendering it if it is not cached yet.
+
+    Args:
+        ctx: The build context.
+        scene_path: The `.excalidraw` file.
+
+    Returns:
+        The SVG's output-relative POSIX path and its width and height, or None
+        if the scene cannot be read, is malformed or has nothing to draw.
+    """
+    try:
+        data = scene_path.read_bytes()
+    except OSError:
+        return None
+    name = f"{hashlib.sha1(data).hexdigest()[:16]}.svg"
+    destination = ctx.output_root / EXCALIDRAW_DIR_NAME / name
+    relative = f"{EXCALIDRAW_DIR_NAME}/{name}"
+
+    try:
+        with destination.open("rb") as handle:
+            match = SVG_SIZE_PATTERN.search(handle.read(512))
+        if match:
+            return relative, int(match.group(1)), int(match.group(2))
+    except OSError:
+        pass
+
+    try:
+        scene = json.loads(data.decode("utf-8"))
+        # Malformed scenes (wrong types, huge or missing numbers) keep the
+        # click-to-load placeholder instead of failing the build.
+        rendered = render_scene_svg(scene)
+    except (UnicodeDecodeError, TypeError, ValueError, AttributeError, OverflowError):
+        return None
+    if rendered is None:
+        return None
+    svg, width, height = rendered
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    # Worker processes may render the same scene at once; each writes its own
+    # temporary file and the rename is atomic.
+    temporary = destination.with_name(f".{name}.{os.getpid()}.tmp")
+    temporary.write_text(svg, encoding="utf-8")
+    os.replace(temporary, destination)
+    return relative, width, height
+
+
+def prune_previews(ctx: BuildContext) -> int:
+    """
+    Deletes previews that no note of the current build embeds.
+
+    The scenes a note embeds are among its recorded references, together
+    with their content hash, which names the preview.
+
+    Returns:
+        The number of previews deleted.
+    """
+    directory = ctx.output_root / EXCALIDRAW_DIR_NAME
+    if ctx.state is None or not directory.is_dir():
+        return 0
+    keep: Set[str] = {
+        recorded[1][:16]
+        for record in ctx.state.current.values()
+        for recorded in record.references.values()
+        if recorded and recorded[0].lower().endswith(".excalidraw")
+    }
+    removed = 0
+    for path in directory.iterdir():
+        # Compressed variants (`.svg.gz`) share their preview's hash.
+        if path.name.partition(".")[0] not in keep:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def render_scene_svg(scene: Dict) -> Optional[Tuple[str, int, int]]:
+    """
+    Renders an Excalidraw scene to a standalone SVG document.
+
+    Args:
+        scene: The parsed `.excalidraw` JSON.
+
+    Returns:
+        The SVG markup and its width and height in pixels, or None if the
+        scene has no visible elements.
+
+    Raises:
+        ValueError: If an element's coordinates are not finite numbers.
+    """
+    elements = [
+        element for element in scene.get("elements") or []
+        if isinstance(element, dict) and element.get("type") in DRAWN_TYPES and not element.get("isDeleted")
+    ]
+    files = scene.get("files") or {}
+    bounds = scene_bounds(elements)
+    if bounds is None:
+        return None
+    min_x, min_y, max_x, max_y = bounds
+    min_x -= SCENE_PADDING
+    min_y -= SCENE_PADDING
+    extent_x, extent_y = max_x - min_x + SCENE_PADDING, max_y - min_y + SCENE_PADDING
+    if not all(math.isfinite(value) for value in (min_x, min_y, extent_x, extent_y)):
+        raise ValueError("scene coordinates are not finite")
+    width = max(1, math.ceil(extent_x))
+    height = max(1, math.ceil(extent_y))
+
+    patterns: Dict[Tuple[str, str], Tuple[str, str]] = {}
+    body: List[str] = []
+    background = (scene.get("appState") or {}).get("viewBackgroundColor")
+    if background and background != "transparent":
+        body.append(f'<rect x="{min_x:g}" y="{min_y:g}" width="{width}" height="{height}" fill="{escape_html(background)}"/>')
+    for element in elements:
+        markup = render_element(element, files, patterns)
+        if markup:
+            body.append(markup)
+
+    defs = f"<defs>{''.join(markup for _, markup in patterns.values())}</defs>" if patterns else ""
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="{min_x:g} {min_y:g} {width} {height}">{defs}{"".join(body)}</svg>\n'
+    )
+    return svg, width, height
+
+
+def scene_bounds(elements: Iterable[Dict]) -> Optional[Tuple[float, float, float, float]]:
+    """Returns the (min x, min y, max x, max y) box around all elements."""
+    xs: List[float] = []
+    ys: List[float] = []
+    for element in elements:
+        for x, y in element_outline(element):
+            xs.append(x)
+            ys.append(y)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def element_outline(element: Dict) -> List[Point]:
+    """Returns scene coordinates that enclose an element, rotation included."""
+    x, y = float(element.get("x", 0)), float(element.get("y", 0))
+    width, height = float(element.get("width", 0)), float(element.get("height", 0))
+    points = element.get("points")
+    if points:
+        outline = [(x + float(px), y + float(py)) for px, py in points]
+    else:
+        outline = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+    angle = float(element.get("angle") or 0)
+    if angle:
+        cx, cy = x + width / 2, y + height / 2
+        cos, sin = math.cos(angle), math.sin(angle)
+        outline = [(cx + (px - cx) * cos - (py - cy) * sin, cy + (px - cx) * sin + (py - cy) * cos) for px, py in outline]
+    return outline
+
+
+def render_element(element: Dict, files: Dict, patterns: Dict[Tuple[str, str], Tuple[str, str]]) -> str:
+    """
+    Renders one element as SVG markup, or an empty string if there is
+    nothing to draw.
+
+    Args:
+        element: The element.
+        files: The scene's embedded files, keyed by file id.
+        patterns: The (id, markup) of the fill patterns defined so far,
+            keyed by colour and style; updated in place.
+    """
+    kind = element.get("type")
+    x, y = float(element.get("x", 0)), float(element.get("y", 0))
+    width, height = float(element.get("width", 0)), float(element.get("height", 0))
+    stroke = stroke_attributes(element)
+    fill = fill_attribute(element, patterns)
+
+    if kind == "rectangle":
+        radius = min(32.0, min(width, height) * 0.25) if element.get("roundness") else 0
+        rounded = f' rx="{radius:g}"' if radius else ""
+        shape = f'<rect x="{x:g}" y="{y:g}" width="{width:g}" height="{height:g}"{rounded}{fill}{stroke}/>'
+    elif kind == "ellipse":
+        shape = f'<ellipse cx="{x + width / 2:g}" cy="{y + height / 2:g}" rx="{width / 2:g}" ry="{height / 2:g}"{fill}{stroke}/>'
+    elif kind == "diamond":
+        corners = [(x + width / 2, y), (x + width, y + height / 2), (x + width / 2, y + height), (x, y + height / 2)]
+        shape = f'<polygon points="{format_points(corners)}"{fill}{stroke}/>'
+    elif kind in ("line", "arrow"):
+        shape = render_linear(element, x, y, fill, stroke)
+    elif kind == "freedraw":
+        points = [(x + float(px), y + float(py)) for px, py in element.get("points") or []]
+        if not points:
+            return ""
+        colour = escape_html(element.get("strokeColor") or "#1e1e1e")
+        stroke_width = float(element.get("strokeWidth") or 1) * 2
+        shape = (f'<polyline points="{format_points(points)}" fill="none" stroke="{colour}" stroke-width="{stroke_width:g}" '
+                 f'stroke-linecap="round" stroke-linejoin="round"/>')
+    elif kind == "text":
+        shape = render_text(element, x, y, width, height)
+    elif kind == "image":
+        file = files.get(element.get("fileId") or "") or {}
+        data_url = file.get("dataURL")
+        if not data_url:
+            return ""
+        scale_x, scale_y = (element.get("scale") or [1, 1])[:2]
+        flip = ""
+        if scale_x < 0 or scale_y < 0:
+            flip = f' transform="translate({x + width / 2:g} {y + height / 2:g}) scale({scale_x:g} {scale_y:g}) translate({-(x + width / 2):g} {-(y + height / 2):g})"'
+        shape = (f'<image href="{escape_html(data_url)}" x="{x:g}" y="{y:g}" width="{width:g}" height="{height:g}" '
+                 f'preserveAspectRatio="none"{flip}/>')
+    else:
+        return ""
+
+    attributes = ""
+    angle = float(element.get("angle") or 0)
+    if angle:
+        attributes += f' transform="rotate({math.degrees(angle):g} {x + width / 2:g} {y + height / 2:g})"'
+    opacity = element.get("opacity", 100)
+    if opacity is not None and opacity < 100:
+        attributes += f' opacity="{max(0, opacity) / 100:g}"'
+    return f"<g{attributes}>{shape}</g>" if attributes else shape
+
+
+def render_linear(element: Dict, x: float, y: float, fill: str, stroke: str) -> str:
+    """Renders a line or arrow with its arrowheads."""
+    points = [(x + float(px), y + float(py)) for px, py in element.get("points") or []]
+    if len(points) < 2:
+        return ""
+    closed = points[0] == points[-1] and len(points) > 2
+    if closed:
+        markup = [f'<polygon points="{format_points(points[:-1])}"{fill}{stroke}/>']
+    else:
+        markup = [f'<polyline points="{format_points(points)}" fill="none"{stroke}/>']
+    colour = escape_html(element.get("strokeColor") or "#1e1e1e")
+    stroke_width = float(element.get("strokeWidth") or 1)
+    if element.get("type") == "arrow":
+        for head, tip, previous in (
+            (element.get("endArrowhead"), points[-1], points[-2]),
+            (element.get("startArrowhead"), points[0], points[1]),
+        ):
+            if head:
+                markup.append(render_arrowhead(head, tip, previous, colour, stroke_width))
+    return "".join(markup)
+
+
+def render_arrowhead(head: str, tip: Point, previous: Point, colour: str, stroke_width: float) -> str:
+    """Renders one arrowhead pointing at `tip`, coming from `previous`."""
+    direction = math.atan2(tip[1] - previous[1], tip[0] - previous[0])
+    length = ARROWHEAD_LENGTH + stroke_width * 2
+    if head in ("dot", "circle"):
+        radius = length / 3
+        return f'<circle cx="{tip[0]:g}" cy="{tip[1]:g}" r="{radius:g}" fill="{colour}"/>'
+    if head == "bar":
+        half = length / 2
+        ends = [
+            (tip[0] + half * math.cos(direction + math.pi / 2), tip[1] + half * math.sin(direction + math.pi / 2)),
+            (tip[0] + half * math.cos(direction - math.pi / 2), tip[1] + half * math.sin(direction - math.pi / 2)),
+        ]
+        return f'<polyline points="{format_points(ends)}" fill="none" stroke="{colour}" stroke-width="{stroke_width:g}"/>'
+    wings = [
+        (tip[0] - length * math.cos(direction - ARROWHEAD_ANGLE), tip[1] - length * math.sin(direction - ARROWHEAD_ANGLE)),
+        tip,
+        (tip[0] - length * math.cos(direction + ARROWHEAD_ANGLE), tip[1] - length * math.sin(direction + ARROWHEAD_ANGLE)),
+    ]
+    if head == "triangle":
+        return f'<polygon points="{format_points(wings)}" fill="{colour}" stroke="{colour}" stroke-width="{stroke_width:g}"/>'
+    return (f'<polyline points="{format_points(wings)}" fill="none" stroke="{colour}" stroke-width="{stroke_width:g}" '
+            f'stroke-linecap="round" stroke-linejoin="round"/>')
+
+
+def render_text(element: Dict, x: float, y: float, width: float, height: float) -> str:
+    """Renders a (possibly multi-line) text element."""
+    text = element.get("text") or ""
+    if not text:
+        return ""
+    font_size = float(element.get("fontSize") or 20)
+    line_height = font_size * float(element.get("lineHeight") or DEFAULT_LINE_HEIGHT)
+    lines = text.split("\n")
+    align = element.get("textAlign") or "left"
+    anchor, anchor_x = {"center": ("middle", x + width / 2), "right": ("end", x + width)}.get(align, ("start", x))
+    # Text boxes are sized to their content, so the vertical alignment only
+    # matters when the box is taller than the lines.
+    top = y
+    vertical = element.get("verticalAlign")
+    if vertical == "middle":
+        top = y + (height - line_height * len(lines)) / 2
+    elif vertical == "bottom":
+        top = y + height - line_height * len(lines)
+    # Place each baseline where a line box of `line_height` would put it.
+    baseline = (line_height - font_size) / 2 + font_size * 0.8
+    family = FONT_FAMILIES.get(element.get("fontFamily"), FONT_FAMILIES[1])
+    colour = escape_html(element.get("strokeColor") or "#1e1e1e")
+    spans = "".join(
+        f'<tspan x="{anchor_x:g}" y="{top + index * line_height + baseline:g}">{escape_html(line)}</tspan>'
+        for index, line in enumerate(lines)
+    )
+    return (f'<text font-family="{escape_html(family)}" font-size="{font_size:g}" fill="{colour}" '
+            f'text-anchor="{anchor}" xml:space="preserve">{spans}</text>')
+
+
+def stroke_attributes(element: Dict) -> str:
+    """Returns the stroke attributes of a shape."""
+    colour = element.get("strokeColor") or "#1e1e1e"
+    if colour == "transparent":
+        return ' stroke="none"'
+    stroke_width = float(element.get("strokeWidth") or 1)
+    attributes = f' stroke="{escape_html(colour)}" stroke-width="{stroke_width:g}"'
+    style = element.get("strokeStyle")
+    if style == "dashed":
+        attributes += f' stroke-dasharray="{stroke_width * 4:g} {stroke_width * 3:g}"'
+    elif style == "dotted":
+        attributes += f' stroke-dasharray="{stroke_width:g} {stroke_width * 3:g}" stroke-linecap="round"'
+    return attributes
+
+
+def fill_attribute(element: Dict, patterns: Dict[Tuple[str, str], Tuple[str, str]]) -> str:
+    """Returns the fill attribute of a shape, defining a hatch pattern if needed."""
+    colour = element.get("backgroundColor") or "transparent"
+    if colour == "transparent":
+        return ' fill="none"'
+    style = element.get("fillStyle") or "hachure"
+    if style == "solid":
+        return f' fill="{escape_html(colour)}"'
+    key = (colour, "cross-hatch" if style == "cross-hatch" else "hachure")
+    if key not in patterns:
+        pattern_id = f"fill-{len(patterns)}"
+        lines = f'<line x1="0" y1="0" x2="0" y2="8" stroke="{escape_html(colour)}" stroke-width="1.5"/>'
+        if key[1] == "cross-hatch":
+            lines += f'<line x1="0" y1="0" x2="8" y2="0" stroke="{escape_html(colour)}" stroke-width="1.5"/>'
+        patterns[key] = (pattern_id, f'<pattern id="{pattern_id}" patternUnits="userSpaceOnUse" width="8" height="8" '
+                                     f'patternTransform="rotate(45)">{lines}</pattern>')
+    return f' fill="url(#{patterns[key][0]})"'
+
+
+def format_points(points: Iterable[Point]) -> str:
+    """Formats points for a `points` attribute."""
+    return " ".join(f"{x:g},{y:g}" for x, y in points)
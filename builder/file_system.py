@@ -7,15 +7,32 @@ the underlying storage, making the code cleaner and easier to test. This module
 is responsible for the side effects of reading from and writing to disk.
 """
 
+import ctypes
+import os
 import shutil
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
-from .constants import README_NAME
-from .models import BuildContext
+from .constants import COPY_MODE_COPY, COPY_MODE_HARDLINK, COPY_MODE_REFLINK, README_NAME
+from .index import VaultIndex
+from .models import BuildContext, DirectoryEntry
+from .profile import COPY, profiled
+from .scenes import is_scene, write_slim_scene
+from .utils import posix_path
 
+# Actions reported by write_copy and tallied in CopyStats.
+COPIED = "copied"
+SKIPPED = "skipped"
+LINKED = "linked"
+CLONED = "cloned"
+SLIMMED = "slimmed"
 
-def find_readme(directory: Path) -> Optional[Path]:
+# Linux ioctl request number for cloning a file's extents (from linux/fs.h).
+FICLONE = 0x40049409
+
+
+def find_readme(directory: Path, index: Optional[VaultIndex] = None) -> Optional[Path]:
     """
     Finds the README.md file in a directory, case-insensitively.
 
@@ -24,38 +41,128 @@ def find_readme(directory: Path) -> Optional[Path]:
 
     Args:
         directory: The directory to search within.
+        index: An optional vault index to consult instead of the file system.
 
     Returns:
         A Path object to the README file if found, otherwise None.
     """
+    if index is not None:
+        return index.find_readme(directory)
     for entry in directory.iterdir():
         if entry.is_file() and entry.name.lower() == README_NAME.lower():
             return entry
     return None
 
 
+def list_directory(ctx: BuildContext, directory: Path) -> List[DirectoryEntry]:
+    """
+    Lists a directory's children, sorted case-insensitively by name.
+
+    Args:
+        ctx: The build context, whose vault index is used when present.
+        directory: The directory to list.
+
+    Returns:
+        One DirectoryEntry per child.
+    """
+    if ctx.index is not None:
+        return ctx.index.list_directory(directory)
+    if ctx.profiler is not None:
+        ctx.profiler.count("directory listings")
+    return [
+        DirectoryEntry(path=child, is_dir=child.is_dir(), is_file=child.is_file())
+        for child in sorted(directory.iterdir(), key=lambda p: p.name.lower())
+    ]
+
+
 def copy_file(source: Path, ctx: BuildContext, relative_dir: Path) -> None:
     """
     Copies a single file to its corresponding location in the output directory.
 
-    It ensures the destination directory exists before copying.
+    The destination is normally the same path below the output root; with an
+    asset store attached it is the file's blob in `_assets/` instead. The
+    file is then handled by the first rule that applies:
+
+    - The build state shows the source is unchanged and its output is still
+      present: nothing is written.
+    - The destination is a blob that already exists: nothing is written,
+      since a blob is named after its content.
+    - `slim_scenes` is set and the file is a readable Excalidraw scene: it is
+      rewritten in minimal form (see `copy_slim_scene`).
+    - A build plan is attached: the copy is queued on the plan.
+    - Otherwise the file is written in the context's copy mode, creating the
+      destination directory if needed.
+
+    Turning `slim_scenes` on or off rewrites every scene, unchanged or not.
+    The output is recorded in the build state in every case.
 
     Args:
         source: The absolute path to the source file.
         ctx: The build context containing output paths.
         relative_dir: The file's parent directory relative to the vault root.
     """
-    destination = ctx.output_root / relative_dir / source.name
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(source, destination)
+    blob = ctx.assets.store(ctx, source) if ctx.assets is not None else None
+    destination = blob or ctx.output_root / relative_dir / source.name
+    scene = is_scene(source)
+    # Turning `--slim-scenes` on or off changes what a scene's output holds.
+    rewritten = scene and ctx.state is not None and ctx.state.setting_changed("slim_scenes")
+    if not rewritten and ctx.state is not None and ctx.state.is_unchanged(ctx, source, destination):
+        ctx.copy_stats.record(SKIPPED, ctx.state.fingerprint(ctx, source).size)
+        if scene and ctx.slim_scenes:
+            # The images moved out of the scene are outputs of it too.
+            ctx.state.carry_outputs(ctx, source)
+    elif not rewritten and not (scene and ctx.slim_scenes) and blob is not None and blob.exists():
+        # A blob is named after its content, so an existing one is already right.
+        ctx.copy_stats.record(SKIPPED, source.stat().st_size)
+    elif scene and ctx.slim_scenes and copy_slim_scene(ctx, source, destination):
+        pass  # Unreadable scenes fall through to a plain copy.
+    elif ctx.plan is not None:
+        ctx.plan.copies.append((source, destination))
+    else:
+        ctx.copy_stats.record(*profiled_copy(ctx, source, destination))
+    if ctx.state is not None:
+        ctx.state.record_output(ctx, source, destination)
+
+
+def copy_slim_scene(ctx: BuildContext, source: Path, destination: Path) -> bool:
+    """
+    Writes the slimmed form of an Excalidraw scene (see scenes.py).
+
+    Scenes are slimmed right away, even with a build plan attached, so the
+    images moved out of them can be recorded as outputs.
+
+    Args:
+        ctx: The build context.
+        source: The `.excalidraw` file in the vault.
+        destination: The absolute path of its output.
+
+    Returns:
+        False if the file is not a readable scene and must be copied as is.
+    """
+    with profiled(ctx, posix_path(source.relative_to(ctx.source_root)), COPY) as span:
+        slimmed = write_slim_scene(ctx, source, destination)
+        if slimmed is None:
+            return False
+        size = len(slimmed.text.encode("utf-8"))
+        if span is not None:
+            span.update(action=SLIMMED, bytes_written=size, images=len(slimmed.blobs))
+    ctx.copy_stats.record(SLIMMED, size)
+    if ctx.state is not None:
+        for blob in slimmed.blobs:
+            ctx.state.record_output(ctx, source, ctx.output_root / blob)
+    return True
 
 
 def copy_graphics_directory(ctx: BuildContext, directory: Path, relative_dir: Path) -> None:
     """
     Recursively copies an entire 'graphics' directory to the output.
 
-    If the destination already exists, it is removed first to ensure a clean
-    copy. This is used to transfer all image assets without processing them.
+    When a build state or an asset store is attached, or scenes are slimmed,
+    each file goes through `copy_file` on its own: unchanged files are
+    skipped, attachments land in their blobs and scenes are rewritten, and
+    the build state prunes the outputs of removed files. Otherwise the whole
+    directory is replaced by a fresh copy, or the copy is queued if a build
+    plan is attached.
 
     Args:
         ctx: The build context containing output paths.
@@ -63,6 +170,158 @@ def copy_graphics_directory(ctx: BuildContext, directory: Path, relative_dir: Pa
         relative_dir: The directory's path relative to the vault root.
     """
     destination = ctx.output_root / relative_dir
+    if ctx.state is not None or ctx.assets is not None or ctx.slim_scenes:
+        walk = ctx.index.walk(directory) if ctx.index is not None else (
+            (Path(current_dir), filenames) for current_dir, _, filenames in os.walk(directory)
+        )
+        for current_path, filenames in walk:
+            current_relative = relative_dir / current_path.relative_to(directory)
+            if ctx.assets is None:
+                (ctx.output_root / current_relative).mkdir(parents=True, exist_ok=True)
+            for filename in sorted(filenames):
+                copy_file(current_path / filename, ctx, current_relative)
+        return
+
+    if ctx.plan is not None:
+        ctx.plan.trees.append((directory, destination))
+        return
+    for result in profiled_tree(ctx, directory, destination):
+        ctx.copy_stats.record(*result)
+
+
+def profiled_copy(ctx: BuildContext, source: Path, destination: Path) -> Tuple[str, int]:
+    """Runs `write_copy` in the context's copy mode, timing it if the build is profiled."""
+    with profiled(ctx, posix_path(source.relative_to(ctx.source_root)), COPY) as span:
+        action, size = write_copy(source, destination, ctx.copy_mode)
+        if span is not None:
+            span.update(action=action, bytes_written=0 if action == SKIPPED else size)
+    return action, size
+
+
+def profiled_tree(ctx: BuildContext, source: Path, destination: Path) -> List[Tuple[str, int]]:
+    """Runs `write_tree` in the context's copy mode, timing it if the build is profiled."""
+    with profiled(ctx, posix_path(source.relative_to(ctx.source_root)) + "/", COPY) as span:
+        results = write_tree(source, destination, ctx.copy_mode)
+        if span is not None:
+            span.update(files=len(results), bytes_written=sum(size for action, size in results if action != SKIPPED))
+    return results
+
+
+def write_copy(source: Path, destination: Path, mode: str = COPY_MODE_COPY) -> Tuple[str, int]:
+    """
+    Writes one file to the output, creating the destination's parent
+    directory if needed.
+
+    The mode decides how:
+    - "copy" always copies the bytes (and metadata).
+    - "skip" leaves the destination alone if its size and modification time
+      already match the source, and copies otherwise.
+    - "hardlink" links the destination to the source; a destination that is
+      already the same file is left alone.
+    - "reflink" clones the file on copy-on-write file systems (Btrfs, XFS,
+      APFS) if size and modification time differ, sharing the blocks.
+    Links and clones fall back to a copy where the file system refuses them.
+    An existing destination is unlinked before being rewritten, so a link
+    never writes through to the vault.
+
+    Args:
+        source: The absolute path to the source file.
+        destination: The absolute path to write it to.
+        mode: One of the COPY_MODES constants.
+
+    Returns:
+        The action taken ("copied", "skipped", "linked" or "cloned") and the
+        file's size in bytes.
+    """
+    source_stat = source.stat()
+    try:
+        destination_stat: Optional[os.stat_result] = destination.stat()
+    except FileNotFoundError:
+        destination_stat = None
+
+    if destination_stat is not None:
+        if mode == COPY_MODE_HARDLINK:
+            if os.path.samestat(source_stat, destination_stat):
+                return SKIPPED, source_stat.st_size
+        elif mode != COPY_MODE_COPY:
+            if (destination_stat.st_size == source_stat.st_size
+                    and destination_stat.st_mtime_ns == source_stat.st_mtime_ns):
+                return SKIPPED, source_stat.st_size
+        destination.unlink()
+    else:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == COPY_MODE_HARDLINK:
+        try:
+            os.link(source, destination)
+            return LINKED, source_stat.st_size
+        except OSError:
+            pass
+    elif mode == COPY_MODE_REFLINK:
+        if clone_file(source, destination):
+            shutil.copystat(source, destination)
+            return CLONED, source_stat.st_size
+
+    shutil.copy2(source, destination)
+    return COPIED, source_stat.st_size
+
+
+def write_tree(source: Path, destination: Path, mode: str = COPY_MODE_COPY) -> List[Tuple[str, int]]:
+    """
+    Replaces a destination directory with a fresh copy of a source directory.
+
+    Args:
+        source: The absolute path to the directory to copy.
+        destination: The absolute path of the copy.
+        mode: How each file is written, as for `write_copy`.
+
+    Returns:
+        The (action, size) result of every file written.
+    """
+    results: List[Tuple[str, int]] = []
+
+    def copy_one(src: str, dst: str) -> str:
+        results.append(write_copy(Path(src), Path(dst), mode))
+        return dst
+
     if destination.exists():
         shutil.rmtree(destination)
-    shutil.copytree(directory, destination)
+    shutil.copytree(source, destination, copy_function=copy_one)
+    return results
+
+
+def clone_file(source: Path, destination: Path) -> bool:
+    """
+    Creates `destination` as a copy-on-write clone of `source`.
+
+    Uses the FICLONE ioctl on Linux and clonefile(2) on macOS.
+
+    Args:
+        source: The file to clone.
+        destination: The path of the clone, which must not exist yet.
+
+    Returns:
+        True if the clone was made; False if the platform or file system
+        does not support it, in which case nothing is left behind.
+    """
+    if sys.platform == "darwin":
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.clonefile(os.fsencode(source), os.fsencode(destination), 0) == 0
+        except (AttributeError, OSError):
+            return False
+
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with source.open("rb") as source_handle, destination.open("wb") as destination_handle:
+        try:
+            fcntl.ioctl(destination_handle.fileno(), FICLONE, source_handle.fileno())
+            return True
+        except OSError:
+            pass
+    destination.unlink()
+    return False
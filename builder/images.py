@@ -0,0 +1,204 @@
+"""
+This file generates responsive derivatives of the vault's raster images.
+
+Before notes are rendered, every PNG, JPEG and WebP image in the vault index
+is measured and encoded as WebP at a few widths (never wider than the
+original) into `_images/` in the output directory. Derivatives are named
+after the image's content hash, so an unchanged image is never processed
+again, and a small cache file remembers each image's size and mtime so it is
+not even re-hashed. Missing derivatives are encoded in a process pool. An
+image Pillow cannot read is recorded as failed with its content hash, and is
+not tried again until its content changes.
+
+The renderer then looks images up in the pipeline and writes `srcset`,
+`sizes`, `width`, `height` and `loading="lazy"` on their `<img>` tags, keeping
+the original file as the `src` fallback.
+
+Pillow is only needed when the pipeline is used.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .constants import IMAGE_CACHE_FILENAME, IMAGE_WIDTHS, IMAGES_DIR_NAME
+from .models import BuildContext
+from .state import hash_file, source_key
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # The image pipeline is unavailable without Pillow.
+    Image = None
+
+RASTER_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+WEBP_QUALITY = 80
+CACHE_VERSION = 1
+
+
+@dataclass
+class ImageInfo:
+    """
+    An image's intrinsic size and its derivatives.
+
+    `variants` pairs each derivative's file name in `_images/` with its width.
+    """
+    width: int
+    height: int
+    variants: List[Tuple[str, int]]
+
+
+@dataclass
+class ImageStats:
+    """What one `ImagePipeline.prepare` call did."""
+    images: int = 0
+    encoded: int = 0
+    removed: int = 0
+
+
+@dataclass
+class ImagePipeline:
+    """
+    The derivatives of every raster image in the vault, keyed by the image's
+    absolute path as the vault index reports it.
+
+    `records` is the cache saved between builds, keyed by vault-relative path:
+    size, mtime, content hash and the image's `ImageInfo` fields, or `failed`
+    for an image that could not be read.
+    """
+    output_root: Path
+    images: Dict[Path, ImageInfo] = field(default_factory=dict)
+    records: Dict[str, Dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, output_root: Path) -> "ImagePipeline":
+        """Reads the derivative cache from an output directory, if there is a usable one."""
+        try:
+            data = json.loads((output_root / IMAGE_CACHE_FILENAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(output_root)
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return cls(output_root)
+        return cls(output_root, records=data.get("images", {}))
+
+    def get(self, path: Path) -> Optional[ImageInfo]:
+        """Returns the derivatives of an image, or None if it has none."""
+        return self.images.get(path)
+
+    def prepare(self, ctx: BuildContext, jobs: Optional[int] = None) -> ImageStats:
+        """
+        Brings the derivatives in line with the images currently in the vault.
+
+        Args:
+            ctx: The build context; it must carry a vault index.
+            jobs: Worker processes for encoding; defaults to the number of CPUs.
+
+        Returns:
+            How many images there are, how many were encoded and how many
+            stale derivatives were deleted.
+        """
+        directory = self.output_root / IMAGES_DIR_NAME
+        directory.mkdir(parents=True, exist_ok=True)
+        stats = ImageStats()
+        records: Dict[str, Dict] = {}
+        pending: List[Tuple[Path, str, Dict]] = []
+        for folder, filenames in ctx.index.walk(ctx.source_root):
+            for filename in filenames:
+                path = folder / filename
+                if path.suffix.lower() not in RASTER_SUFFIXES:
+                    continue
+                key = source_key(ctx, path)
+                stat = path.stat()
+                record = self.records.get(key)
+                if record is None or record["size"] != stat.st_size or record["mtime_ns"] != stat.st_mtime_ns:
+                    digest = hash_file(path)
+                    if record is None or record["digest"] != digest:
+                        record = {"digest": digest}
+                    record = {**record, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                records[key] = record
+                stats.images += 1
+                if record.get("failed"):
+                    continue
+                if "variants" in record and all((directory / name).exists() for name, _ in record["variants"]):
+                    continue
+                pending.append((path, key, record))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(
+                    encode_derivatives,
+                    [path for path, _, _ in pending],
+                    [record["digest"] for _, _, record in pending],
+                    [directory] * len(pending),
+                )
+                for (path, key, record), result in zip(pending, results):
+                    if result is None:
+                        # Unreadable images keep being served as they are, and
+                        # are skipped until a new digest resets the record.
+                        records[key] = {**record, "failed": True}
+                        continue
+                    width, height, variants = result
+                    records[key] = {**record, "width": width, "height": height, "variants": [list(variant) for variant in variants]}
+                    stats.encoded += 1
+
+        self.records = records
+        self.images = {
+            ctx.source_root / key: ImageInfo(record["width"], record["height"], [tuple(variant) for variant in record["variants"]])
+            for key, record in records.items()
+            if not record.get("failed")
+        }
+
+        keep = {name for record in records.values() for name, _ in record.get("variants", [])}
+        for path in directory.iterdir():
+            if path.name not in keep:
+                path.unlink()
+                stats.removed += 1
+
+        data = {"version": CACHE_VERSION, "images": dict(sorted(records.items()))}
+        (self.output_root / IMAGE_CACHE_FILENAME).write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        return stats
+
+
+def derivative_widths(width: int) -> List[int]:
+    """Returns the widths to encode an image of the given width at."""
+    return sorted({target for target in IMAGE_WIDTHS if target < width} | {min(width, IMAGE_WIDTHS[-1])})
+
+
+def encode_derivatives(source: Path, digest: str, directory: Path) -> Optional[Tuple[int, int, List[Tuple[str, int]]]]:
+    """
+    Encodes the WebP derivatives of one image that do not exist yet.
+
+    This touches no shared state, so it runs in a worker process.
+
+    Args:
+        source: The image file.
+        digest: The image's content hash, which names its derivatives.
+        directory: The `_images/` output directory.
+
+    Returns:
+        The image's width and height (after applying its EXIF orientation)
+        and its (file name, width) derivatives, or None if Pillow cannot read
+        the image or refuses it as a decompression bomb.
+    """
+    try:
+        with Image.open(source) as opened:
+            image = ImageOps.exif_transpose(opened)
+            if image.mode not in ("RGB", "RGBA"):
+                has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            width, height = image.size
+            variants: List[Tuple[str, int]] = []
+            for target in derivative_widths(width):
+                name = f"{digest[:16]}-{target}.webp"
+                destination = directory / name
+                if not destination.exists():
+                    resized = image if target == width else image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+                    temporary = directory / f".{name}.tmp"
+                    resized.save(temporary, "WEBP", quality=WEBP_QUALITY, method=4)
+                    os.replace(temporary, destination)
+                variants.append((name, target))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    return width, height, variants
@@ -0,0 +1,202 @@
+"""
+This file builds an in-memory index of the vault from a single directory walk.
+
+Resolving an image reference used to probe the file system once per candidate
+location, for every reference, and every directory was listed again to find
+its README and its children. The index lists each directory exactly once with
+`os.scandir` and answers all of those questions with dictionary lookups. It
+also collects the references that could not be resolved, so the build can
+report broken embeds.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .constants import README_NAME
+from .models import DirectoryEntry
+
+
+class VaultIndex:
+    """
+    A snapshot of every directory and file beneath the vault root.
+
+    Paths are stored exactly as the walk produced them (the root joined with
+    each entry name), which matches what `Path.iterdir` yields. Lookups accept
+    lexically normalised paths; on case-insensitive file systems they also
+    ignore case, as the file system itself would.
+    """
+
+    def __init__(self, root: Path, case_sensitive: bool = True) -> None:
+        self.root = root
+        self.case_sensitive = case_sensitive
+        self.children: Dict[Path, List[DirectoryEntry]] = {}
+        self.unresolved: Dict[str, List[str]] = {}
+        self._files: Set[str] = set()
+        self._links: Dict[str, Path] = {}
+
+    @classmethod
+    def scan(cls, root: Path) -> "VaultIndex":
+        """
+        Walks the vault once and indexes every directory and file in it.
+
+        Symbolic links are followed, as `Path.iterdir` and `Path.is_dir` would,
+        but a directory that links back to one of its own ancestors is not
+        entered again.
+
+        Args:
+            root: The absolute, resolved path of the vault.
+
+        Returns:
+            The populated index.
+        """
+        index = cls(root, case_sensitive=_is_case_sensitive(root))
+        root_stat = root.stat()
+        index._scan_tree(root, False, ((root_stat.st_dev, root_stat.st_ino),))
+        return index
+
+    def rescan(self, top: Path) -> None:
+        """
+        Forgets everything indexed beneath a directory and lists it again.
+
+        This keeps the index current when files are added, removed or renamed
+        without walking the rest of the vault.
+
+        Args:
+            top: A directory inside the vault (or the vault root itself).
+        """
+        for directory, filenames in list(self.walk(top)):
+            for name in filenames:
+                path = directory / name
+                key = self._key(path)
+                self._files.discard(key)
+                self._links.pop(key, None)
+            self.children.pop(directory, None)
+
+        if not top.is_dir():
+            return
+        relative = top.relative_to(self.root)
+        lineage = [self.root / parent for parent in reversed(relative.parents)] + [top]
+        ancestors = tuple((stat.st_dev, stat.st_ino) for stat in (directory.stat() for directory in lineage))
+        linked = any(directory.is_symlink() for directory in lineage[1:])
+        self._scan_tree(top, linked, ancestors)
+
+    def list_directory(self, directory: Path) -> List[DirectoryEntry]:
+        """Returns a directory's children sorted case-insensitively by name."""
+        return self.children.get(directory, [])
+
+    def walk(self, top: Path) -> Iterator[Tuple[Path, List[str]]]:
+        """
+        Yields (directory, file names) for `top` and every directory below it,
+        parents before children, like `os.walk`.
+        """
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            entries = self.list_directory(directory)
+            yield directory, [entry.path.name for entry in entries if entry.is_file]
+            # Reversed, so the first subdirectory is walked next.
+            pending.extend(entry.path for entry in reversed(entries) if entry.is_dir)
+
+    def find_readme(self, directory: Path) -> Optional[Path]:
+        """Returns the directory's README, matched case-insensitively, if any."""
+        for entry in self.list_directory(directory):
+            if entry.is_file and entry.path.name.lower() == README_NAME.lower():
+                return entry.path
+        return None
+
+    def locate_file(self, candidate: Path) -> Optional[Path]:
+        """
+        Looks up a candidate path in the index.
+
+        Args:
+            candidate: An absolute path, possibly containing '..' segments.
+
+        Returns:
+            The normalised candidate (or, if it was reached through a symbolic
+            link, its resolved target) when it names an indexed file,
+            otherwise None.
+        """
+        normalised = Path(os.path.normpath(candidate))
+        key = self._key(normalised)
+        if key not in self._files:
+            return None
+        return self._links.get(key, normalised)
+
+    def record_unresolved(self, source: Path, references: List[str]) -> None:
+        """Replaces the list of references made by `source` that did not resolve."""
+        note = source.relative_to(self.root).as_posix()
+        if references:
+            self.unresolved[note] = sorted(set(references))
+        else:
+            self.unresolved.pop(note, None)
+
+    def unresolved_report(self) -> List[str]:
+        """Returns one 'note: reference' line per unresolved reference, sorted."""
+        return [
+            f"{note}: {reference}"
+            for note in sorted(self.unresolved)
+            for reference in self.unresolved[note]
+        ]
+
+    def _scan_tree(self, top: Path, linked: bool, ancestors: Tuple[Tuple[int, int], ...]) -> None:
+        """
+        Indexes `top` and everything beneath it.
+
+        Args:
+            top: The directory to start from.
+            linked: Whether `top` was reached through a symbolic link.
+            ancestors: (device, inode) pairs of `top` and the directories
+                above it, used to avoid entering symbolic link loops.
+        """
+        stack: List[Tuple[Path, bool, Tuple[Tuple[int, int], ...]]] = [(top, linked, ancestors)]
+        while stack:
+            directory, linked, ancestors = stack.pop()
+            entries: List[DirectoryEntry] = []
+            try:
+                scanned = list(os.scandir(directory))
+            except OSError:
+                scanned = []
+            for entry in scanned:
+                path = directory / entry.name
+                try:
+                    is_dir = entry.is_dir()
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                entries.append(DirectoryEntry(path=path, is_dir=is_dir, is_file=is_file))
+                through_link = linked or entry.is_symlink()
+                if is_dir:
+                    stat = entry.stat()
+                    identity = (stat.st_dev, stat.st_ino)
+                    if identity not in ancestors:
+                        stack.append((path, through_link, ancestors + (identity,)))
+                elif is_file:
+                    key = self._key(path)
+                    self._files.add(key)
+                    if through_link:
+                        self._links[key] = path.resolve()
+            entries.sort(key=lambda item: item.path.name.lower())
+            self.children[directory] = entries
+
+    def _key(self, path: Path) -> str:
+        return self._fold(str(path))
+
+    def _fold(self, value: str) -> str:
+        return value if self.case_sensitive else value.lower()
+
+
+def _is_case_sensitive(root: Path) -> bool:
+    """
+    Probes whether the file system holding `root` distinguishes letter case.
+
+    The check flips the case of the root's own path; if the flipped path is
+    the same directory, lookups must ignore case.
+    """
+    flipped = Path(str(root).swapcase())
+    if flipped == root:
+        return True
+    try:
+        return not os.path.samefile(root, flipped)
+    except OSError:
+        return True
@@ -0,0 +1,194 @@
+"""
+This file resolves wikilinks between notes and assembles the link graph.
+
+Before anything is rendered, `LinkIndex.scan` walks the vault index once and
+records every note the manifest will contain (the README and Markdown files
+of each directory `build_directory` includes) under its lower-cased file
+name, together with its slug path. A `[[Note Name]]` link then resolves with
+a dictionary lookup, and the renderer turns it into an anchor to the note's
+route, which the SPA router handles like any other internal link.
+
+As in Obsidian, a link names a note by file name (with or without `.md`) or
+by path, and may carry a `#heading` and an `|alias`. When several notes share
+a name, the one in the linking note's directory wins, and otherwise the one
+with the shortest path.
+
+Each note's resolved links are recorded when it is rendered, or carried over
+from the build state when it is reused. `attach_link_graph` then stores every
+manifest node's outgoing links, backlinks and unresolved links on the node,
+so the client never has to scan fragments to find related notes.
+"""
+
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .constants import GRAPHICS_DIR_NAME, MARKDOWN_SUFFIX, NOTES_ROUTE, README_NAME
+from .file_system import find_readme, list_directory
+from .models import BuildContext
+from .utils import posix_path, slugify
+
+# A wikilink that is not an embed: [[target]], [[target#heading]], [[target|alias]].
+WIKILINK_PATTERN = re.compile(r"(?<!!)\[\[([^\[\]]+?)\]\]")
+
+Links = Dict[str, Optional[str]]
+
+
+class LinkIndex:
+    """
+    The notes wikilinks can point to, and the links found so far.
+
+    `notes` maps a lower-cased file stem to the source keys (vault-relative
+    POSIX paths) of the notes with that stem, `slug_paths` maps a note's
+    source key to its slug path, and `readmes` maps each included
+    directory's vault-relative path to its README's source key. `outgoing`
+    maps a rendered note's source key to its links: each raw target mapped
+    to the source key it resolved to, or None.
+    """
+
+    def __init__(self) -> None:
+        self.notes: Dict[str, List[str]] = {}
+        self.slug_paths: Dict[str, str] = {}
+        self.readmes: Dict[str, str] = {}
+        self.outgoing: Dict[str, Links] = {}
+
+    @classmethod
+    def scan(cls, ctx: BuildContext) -> "LinkIndex":
+        """
+        Lists every note that will be in the manifest.
+
+        Args:
+            ctx: The build context, whose vault index is walked.
+
+        Returns:
+            The populated index.
+        """
+        index = cls()
+        index.rescan(ctx)
+        return index
+
+    def rescan(self, ctx: BuildContext) -> None:
+        """Lists the notes again, keeping the links recorded so far."""
+        self.notes, self.slug_paths, self.readmes = {}, {}, {}
+        pending: List[Tuple[Path, Tuple[str, ...]]] = [(ctx.source_root, ())]
+        while pending:
+            directory, segments = pending.pop()
+            readme = find_readme(directory, ctx.index)
+            if readme is None:
+                continue
+            readme_key = posix_path(readme.relative_to(ctx.source_root))
+            self.readmes[posixpath.dirname(readme_key)] = readme_key
+            self._add(readme_key, "/".join(segments))
+            for entry in list_directory(ctx, directory):
+                name = entry.path.name
+                if entry.is_dir:
+                    # 'graphics' directories are copied, not traversed.
+                    if name.lower() != GRAPHICS_DIR_NAME:
+                        pending.append((entry.path, (*segments, slugify(name))))
+                elif (entry.is_file and entry.path.suffix.lower() == MARKDOWN_SUFFIX
+                      and name.lower() != README_NAME.lower()):
+                    self._add(posix_path(entry.path.relative_to(ctx.source_root)),
+                              "/".join((*segments, slugify(entry.path.stem))))
+
+    def resolve(self, note_key: str, target: str) -> Optional[str]:
+        """
+        Resolves the target of a wikilink.
+
+        Args:
+            note_key: The source key of the note containing the link.
+            target: The link target, without heading or alias.
+
+        Returns:
+            The source key of the linked note, or None if no note matches.
+        """
+        name = target.strip().lstrip("/").lower()
+        if name.endswith(MARKDOWN_SUFFIX):
+            name = name[:-len(MARKDOWN_SUFFIX)]
+        if not name:
+            return None
+        directory = posixpath.dirname(note_key)
+        candidates = self.notes.get(posixpath.basename(name), [])
+        if "/" in name:
+            # A path is tried relative to the linking note, then as a path
+            # suffix anywhere in the vault.
+            relative = posixpath.normpath(posixpath.join(directory.lower(), name)) + MARKDOWN_SUFFIX
+            for key in candidates:
+                if key.lower() == relative:
+                    return key
+            suffix = f"/{name}{MARKDOWN_SUFFIX}"
+            candidates = [key for key in candidates if f"/{key.lower()}".endswith(suffix)]
+        if not candidates:
+            return None
+        for key in candidates:
+            if posixpath.dirname(key) == directory:
+                return key
+        return min(candidates, key=lambda key: (key.count("/"), key))
+
+    def record(self, ctx: BuildContext, source: Path, links: Links) -> None:
+        """Replaces the links made by a note."""
+        self.outgoing[posix_path(source.relative_to(ctx.source_root))] = links
+
+    def unresolved_report(self) -> List[str]:
+        """Returns one 'note: target' line per unresolved wikilink, sorted."""
+        return [
+            f"{note}: {target}"
+            for note in sorted(self.outgoing)
+            for target, resolved in sorted(self.outgoing[note].items())
+            if resolved is None
+        ]
+
+    def _add(self, key: str, slug_path: str) -> None:
+        stem = posixpath.basename(key)[:-len(MARKDOWN_SUFFIX)]
+        self.notes.setdefault(stem.lower(), []).append(key)
+        self.slug_paths[key] = slug_path
+
+
+def notes_href(slug_path: str) -> str:
+    """Returns the SPA route of a note or directory, like the client's `toNotesHref`."""
+    return f"{NOTES_ROUTE}/{slug_path}" if slug_path else NOTES_ROUTE
+
+
+def attach_link_graph(ctx: BuildContext, manifest_root: Dict) -> None:
+    """
+    Stores the link graph on the nodes of a manifest tree.
+
+    Every node whose note makes or receives links gets, as lists of slug
+    paths, `links` (the notes it links to) and `backlinks` (the notes linking
+    to it), plus `unresolvedLinks` (targets that matched no note). A
+    directory node stands for its README. Keys are left out when empty, and
+    recomputed on every call, so the tree can be re-attached after an update.
+
+    Args:
+        ctx: The build context, with a link index attached.
+        manifest_root: The version 1 manifest node of the vault root.
+    """
+    nodes: Dict[str, Dict] = {}
+    pending = [manifest_root]
+    while pending:
+        node = pending.pop()
+        readme_key = ctx.links.readmes.get(posixpath.dirname(node["readme"]["source"]))
+        if readme_key is not None:
+            nodes[readme_key] = node
+        for file in node["files"]:
+            nodes[file["source"]] = file
+        pending.extend(node["directories"])
+
+    backlinks: Dict[str, Set[str]] = {}
+    for key, node in nodes.items():
+        links = ctx.links.outgoing.get(key, {})
+        targets = {target for target in links.values() if target in nodes}
+        for target in targets:
+            if target != key:
+                backlinks.setdefault(target, set()).add(node["slugPath"])
+        _set_list(node, "links", {nodes[target]["slugPath"] for target in targets})
+        _set_list(node, "unresolvedLinks", {target for target, resolved in links.items() if resolved is None})
+    for key, node in nodes.items():
+        _set_list(node, "backlinks", backlinks.get(key, set()))
+
+
+def _set_list(node: Dict, key: str, values: Set[str]) -> None:
+    if values:
+        node[key] = sorted(values)
+    else:
+        node.pop(key, None)
@@ -8,23 +8,41 @@ conversion, and asset resolution, ultimately producing a structured dictionary
 that represents the entire navigable content of the "Notes" section.
 """
 
+import itertools
+import json
+import os
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .constants import GRAPHICS_DIR_NAME, MARKDOWN_SUFFIX, README_NAME
-from .file_system import copy_file, copy_graphics_directory, find_readme
+from .compress import minify_html
+from .constants import (
+    GRAPHICS_DIR_NAME,
+    MANIFEST_FILENAME,
+    MARKDOWN_SUFFIX,
+    README_NAME,
+    SEARCH_DIR_NAME,
+    SEARCH_INDEX_FILENAME,
+)
+from .file_system import copy_file, copy_graphics_directory, find_readme, list_directory
+from .deltas import attach_fragment_hashes
+from .links import Links, attach_link_graph
 from .markdown import render_markdown
 from .models import BuildContext
+from .previews import Preview, attach_previews, finish_preview, new_preview
+from .profile import RENDER, profiled
+from .search import Postings
 from .utils import derive_title, posix_path, slugify
 
 
 def build_directory(ctx: BuildContext, directory: Path, slug_segments: List[str], ancestor_chain: List[Dict[str, str]]) -> Optional[Dict]:
     """
-    Recursively processes a directory to build a node for the manifest.
+    Processes a directory and everything beneath it into a manifest node.
 
     A directory is processed only if it contains a README.md. This function
-    builds the manifest entry for the directory, its files, and recursively
-    for its subdirectories.
+    builds the manifest entry for the directory, its files, and those of all
+    its eligible subdirectories, by attaching each node that
+    `iter_directory_nodes` yields to its parent.
 
     Args:
         ctx: The build context.
@@ -36,90 +54,136 @@ def build_directory(ctx: BuildContext, directory: Path, slug_segments: List[str]
         A dictionary representing the manifest node for this directory, or None
         if the directory is not eligible for inclusion.
     """
-    relative_dir = directory.relative_to(ctx.source_root)
-    is_root = not slug_segments
-
-    # Special handling for 'graphics' directories, which are just copied.
-    if directory.name.lower() == GRAPHICS_DIR_NAME:
-        copy_graphics_directory(ctx, directory, relative_dir)
-        return None
-
-    readme_path = find_readme(directory)
-    if readme_path is None:
-        # A directory without a README is not included, unless it's the root.
-        # The root *must* have a README to start the build.
-        return None
-
-    output_dir = ctx.output_root / relative_dir
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Process the README file for this directory.
-    copy_file(readme_path, ctx, relative_dir)
-    readme_html_rel_path = convert_markdown_file(ctx, readme_path)
-
-    title = derive_title(directory.name if not is_root else "Notes")
-    slug_path = "/".join(slug_segments)
-
-    current_crumb = {"title": title, "slugPath": slug_path}
-    breadcrumbs = build_breadcrumbs(ancestor_chain)
-
-    directory_children: List[Dict] = []
-    file_children: List[Dict] = []
-
-    # Iterate over children to process subdirectories and files.
-    for child in sorted(directory.iterdir(), key=lambda p: p.name.lower()):
-        if child.is_dir():
-            child_slug_segments = slug_segments + [slugify(child.name)]
-            child_manifest = build_directory(
-                ctx,
-                directory=child,
-                slug_segments=child_slug_segments,
-                ancestor_chain=ancestor_chain + [current_crumb]
-            )
-            if child_manifest:
-                directory_children.append(child_manifest)
-        elif child.is_file():
-            if child.name.lower() == README_NAME.lower():
-                continue  # README is handled separately.
-
-            if child.suffix.lower() == MARKDOWN_SUFFIX:
-                copy_file(child, ctx, relative_dir)
-                html_rel_path = convert_markdown_file(ctx, child)
-                file_slug_segments = slug_segments + [slugify(child.stem)]
-                file_children.append({
-                    "type": "file",
-                    "name": child.name,
-                    "title": derive_title(child.stem),
-                    "slug": slugify(child.stem),
-                    "slugPath": "/".join(file_slug_segments),
-                    "source": posix_path(relative_dir / child.name),
-                    "html": html_rel_path,
-                    "breadcrumbs": build_breadcrumbs(ancestor_chain + [current_crumb]),
-                })
-            else:
-                # Copy other files (e.g., non-markdown attachments) directly.
+    top: Optional[Dict] = None
+    for node, parent in iter_directory_nodes(ctx, directory, slug_segments, ancestor_chain):
+        if parent is None:
+            top = node
+        else:
+            parent["directories"].append(node)
+    return top
+
+
+def iter_directory_nodes(ctx: BuildContext, directory: Path, slug_segments: List[str],
+                         ancestor_chain: List[Dict[str, str]]) -> Iterator[Tuple[Dict, Optional[Dict]]]:
+    """
+    Walks a directory tree and yields the manifest node of every eligible
+    directory, with the node of its parent directory (None for `directory`).
+
+    The tree is walked depth first with an explicit stack, so its depth is not
+    bounded by Python's recursion limit, and subdirectories are yielded in
+    listing order after their parent. Each directory's README and files are
+    converted (or queued on the build plan) when its node is built; the
+    node's `directories` list is left for the caller to fill. The files of a
+    directory and its subdirectories' nodes share one breadcrumb list.
+
+    Directories reached again through a symbolic link to one of their own
+    ancestors are skipped. (A vault index never lists their contents in the
+    first place.)
+
+    Args:
+        ctx: The build context.
+        directory: The absolute path of the directory to start from.
+        slug_segments: The URL slugs of the path to that directory.
+        ancestor_chain: The breadcrumb nodes of its parent directories.
+
+    Yields:
+        (node, parent node) pairs.
+    """
+    # Each frame: directory, slug segments, breadcrumbs, parent node and the
+    # (device, inode) pairs of the directories above it.
+    stack: List[Tuple[Path, Tuple[str, ...], List[Dict[str, str]], Optional[Dict], Tuple[Tuple[int, int], ...]]] = [
+        (directory, tuple(slug_segments), build_breadcrumbs(ancestor_chain), None, ())
+    ]
+    while stack:
+        directory, segments, breadcrumbs, parent, ancestors = stack.pop()
+        relative_dir = directory.relative_to(ctx.source_root)
+        is_root = not segments
+        slug_path = "/".join(segments)
+
+        # Special handling for 'graphics' directories, which are just copied.
+        if directory.name.lower() == GRAPHICS_DIR_NAME:
+            copy_graphics_directory(ctx, directory, relative_dir)
+            continue
+
+        if ctx.index is None:
+            stat = directory.stat()
+            identity = (stat.st_dev, stat.st_ino)
+            if identity in ancestors:
+                continue
+            ancestors += (identity,)
+
+        readme_path = find_readme(directory, ctx.index)
+        if readme_path is None:
+            # A directory without a README is not included, unless it's the root.
+            # The root *must* have a README to start the build.
+            continue
+
+        output_dir = ctx.output_root / relative_dir
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Process the README file for this directory.
+        copy_file(readme_path, ctx, relative_dir)
+        readme_html_rel_path = convert_markdown_file(ctx, readme_path)
+
+        title = derive_title(directory.name if not is_root else "Notes")
+        trail = breadcrumbs + build_breadcrumbs([{"title": title, "slugPath": slug_path}])
+
+        subdirectories: List[Path] = []
+        file_children: List[Dict] = []
+        for entry in list_directory(ctx, directory):
+            child = entry.path
+            if entry.is_dir:
+                subdirectories.append(child)
+            elif entry.is_file:
+                if child.name.lower() == README_NAME.lower():
+                    continue  # README is handled separately.
+
                 copy_file(child, ctx, relative_dir)
+                if child.suffix.lower() == MARKDOWN_SUFFIX:
+                    html_rel_path = convert_markdown_file(ctx, child)
+                    slug = slugify(child.stem)
+                    file_children.append({
+                        "type": "file",
+                        "name": child.name,
+                        "title": derive_title(child.stem),
+                        "slug": slug,
+                        "slugPath": "/".join((*segments, slug)),
+                        "source": posix_path(relative_dir / child.name),
+                        "html": html_rel_path,
+                        "breadcrumbs": trail,
+                    })
 
-    return {
-        "type": "directory",
-        "name": directory.name,
-        "title": title,
-        "slug": slugify(directory.name) if not is_root else "",
-        "slugPath": slug_path,
-        "readme": {
-            "source": posix_path(relative_dir / README_NAME),
-            "html": readme_html_rel_path,
-        },
-        "breadcrumbs": breadcrumbs,
-        "directories": directory_children,
-        "files": file_children,
-    }
+        node = {
+            "type": "directory",
+            "name": directory.name,
+            "title": title,
+            "slug": slugify(directory.name) if not is_root else "",
+            "slugPath": slug_path,
+            "readme": {
+                "source": posix_path(relative_dir / README_NAME),
+                "html": readme_html_rel_path,
+            },
+            "breadcrumbs": breadcrumbs,
+            "directories": [],
+            "files": file_children,
+        }
+        yield node, parent
+
+        # Reversed, so subdirectories are popped in listing order.
+        for child in reversed(subdirectories):
+            stack.append((child, (*segments, slugify(child.name)), trail, node, ancestors))
 
 
 def convert_markdown_file(ctx: BuildContext, source: Path) -> str:
     """
     Reads a Markdown file, renders it to HTML, and saves the output.
 
+    If the build state shows that neither the note nor any asset it references
+    has changed since the previous build, the existing fragment is kept (unless
+    a search index is attached and has no postings for the note's current
+    text). With a build plan attached, the render is queued on the plan and
+    only the fragment's path is computed.
+
     Args:
         ctx: The build context.
         source: The path to the source Markdown file.
@@ -129,9 +193,311 @@ def convert_markdown_file(ctx: BuildContext, source: Path) -> str:
     """
     relative_dir = source.parent.relative_to(ctx.source_root)
     destination = ctx.output_root / relative_dir / f"{source.stem}.html"
-    html_content = render_markdown(ctx, source, source.read_text(encoding="utf-8"))
-    destination.write_text(html_content, encoding="utf-8")
-    return posix_path(destination.relative_to(ctx.output_root))
+    fragment = posix_path(destination.relative_to(ctx.output_root))
+
+    if (ctx.state is not None and ctx.state.note_is_fresh(ctx, source, destination)
+            and (ctx.search is None or ctx.search.has(fragment, ctx.state.fingerprint(ctx, source).digest))):
+        ctx.state.record_output(ctx, source, destination)
+        references = ctx.state.carry_references(ctx, source)
+        links = ctx.state.carry_links(ctx, source)
+        ctx.state.carry_fragment(ctx, source)
+        ctx.state.carry_preview(ctx, source)
+        ctx.state.reused += 1
+        report_unresolved(ctx, source, references)
+        if ctx.links is not None:
+            ctx.links.record(ctx, source, links)
+        return fragment
+
+    if ctx.plan is not None:
+        ctx.plan.notes.append((source, destination))
+        return fragment
+
+    terms: Optional[Postings] = {} if ctx.search is not None else None
+    links: Links = {}
+    preview: Optional[Preview] = new_preview() if ctx.previews else None
+    references = write_markdown_fragment(ctx, source, destination, terms, links, preview)
+    record_rendered_note(ctx, source, destination, references, terms, links, preview)
+    return fragment
+
+
+def write_markdown_fragment(ctx: BuildContext, source: Path, destination: Path, terms: Optional[Postings] = None,
+                            links: Optional[Links] = None, preview: Optional[Preview] = None) -> Dict[str, Optional[Path]]:
+    """
+    Renders a Markdown file and writes the HTML fragment, minified if the
+    context asks for it, to its destination.
+
+    This is the part of a note conversion that touches no shared build state,
+    so it can run in a worker process.
+
+    Args:
+        ctx: The build context.
+        source: The path to the source Markdown file.
+        destination: The path of the HTML fragment to write.
+        terms: If given, the note's terms are collected here for the search
+            index.
+        links: If given, the note's wikilinks are collected here.
+        preview: If given, the note's preview, with its fragment's content
+            hash, is collected here.
+
+    Returns:
+        The asset references the note made, mapped to their resolved paths.
+    """
+    references: Dict[str, Optional[Path]] = {}
+    with profiled(ctx, posix_path(source.relative_to(ctx.source_root)), RENDER) as span:
+        markdown_text = source.read_text(encoding="utf-8")
+        html_content = render_markdown(ctx, source, markdown_text, references, terms, links, preview)
+        if ctx.minify:
+            html_content = minify_html(html_content)
+        destination.write_text(html_content, encoding="utf-8")
+        if preview is not None:
+            finish_preview(preview, html_content)
+        if span is not None:
+            span.update(bytes_read=len(markdown_text.encode("utf-8")), bytes_written=len(html_content.encode("utf-8")))
+    return references
+
+
+def record_rendered_note(ctx: BuildContext, source: Path, destination: Path, references: Dict[str, Optional[Path]],
+                         terms: Optional[Postings] = None, links: Optional[Links] = None,
+                         preview: Optional[Preview] = None) -> None:
+    """
+    Records a freshly rendered note, and its preview, in the build state, its
+    unresolved references in the vault index, its terms in the search index
+    and its wikilinks in the link index, where those are attached.
+
+    Args:
+        ctx: The build context.
+        source: The path to the source Markdown file.
+        destination: The path of the HTML fragment that was written.
+        references: The note's asset references and their resolved paths.
+        terms: The note's terms, if they were collected.
+        links: The note's wikilinks and the notes they resolved to.
+        preview: The note's preview, if it was collected.
+    """
+    links = links if links is not None else {}
+    report_unresolved(ctx, source, references)
+    if ctx.links is not None:
+        ctx.links.record(ctx, source, links)
+    if ctx.search is not None and terms is not None:
+        digest = ctx.state.fingerprint(ctx, source).digest if ctx.state is not None else ""
+        ctx.search.record(posix_path(destination.relative_to(ctx.output_root)), digest, terms)
+    if ctx.state is None:
+        return
+    ctx.state.record_output(ctx, source, destination)
+    ctx.state.record_references(ctx, source, references)
+    ctx.state.record_links(ctx, source, links)
+    if preview is not None:
+        ctx.state.record_preview(ctx, source, preview)
+    ctx.state.rendered += 1
+
+
+def report_unresolved(ctx: BuildContext, source: Path, references: Dict[str, Any]) -> None:
+    """
+    Passes a note's unresolved asset references on to the vault index.
+
+    Args:
+        ctx: The build context.
+        source: The path to the source Markdown file.
+        references: Raw references mapped to what they resolved to, or None.
+    """
+    if ctx.index is None:
+        return
+    ctx.index.record_unresolved(source, [reference for reference, resolved in references.items() if resolved is None])
+
+
+def write_manifest(ctx: BuildContext, manifest_root: Dict) -> Path:
+    """
+    Assembles the manifest object and writes it to the output directory.
+
+    Version 1 is the tree exactly as `build_directory` returns it, pretty
+    printed. Version 2 (see `to_manifest_v2`) adds a flat slug index, drops
+    the per-file breadcrumb copies and is written as compact JSON. With an
+    asset store attached, either version gets an "assets" map from vault
+    paths to blob paths. With a link index attached, the link graph is
+    stored on the tree's nodes first (see `links.attach_link_graph`). With
+    manifest deltas attached, nodes get fragment hashes, the manifest gets a
+    content `hash`, and the deltas are published once the manifest is in
+    place (see deltas.py). With previews collected, notes' nodes get their
+    previews (see previews.py). With fragment packs attached, each
+    directory's fragments are packed and the nodes say where (see packs.py).
+    With a search index attached, the manifest's `search` names the index
+    file the client loads (see search.py).
+
+    The JSON is streamed to a temporary file (see `iter_manifest_json`) and
+    then renamed over `manifest.json`, so a client never reads a
+    half-written manifest.
+
+    Args:
+        ctx: The build context.
+        manifest_root: The manifest node of the vault root.
+
+    Returns:
+        The path of the written manifest.
+    """
+    if ctx.links is not None:
+        attach_link_graph(ctx, manifest_root)
+    if ctx.deltas is not None:
+        attach_fragment_hashes(ctx, manifest_root)
+    if ctx.previews:
+        attach_previews(ctx, manifest_root)
+    if ctx.packs is not None:
+        with profiled(ctx, "write fragment packs"):
+            ctx.packs.attach(ctx, manifest_root)
+    manifest = {
+        "source": str(ctx.source_root),
+        "output": str(ctx.output_root),
+        "publicPath": f"/{ctx.output_root.name}",
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "version": ctx.manifest_version,
+    }
+    if ctx.manifest_version == 1:
+        manifest["root"] = manifest_root
+        indent: Optional[int] = 2
+    else:
+        manifest["root"], manifest["index"] = to_manifest_v2(manifest_root)
+        indent = None
+    if ctx.assets is not None:
+        manifest["assets"] = ctx.assets.asset_map(ctx)
+    if ctx.search is not None:
+        manifest["search"] = f"{SEARCH_DIR_NAME}/{SEARCH_INDEX_FILENAME}"
+    snapshot = None
+    if ctx.deltas is not None:
+        snapshot = ctx.deltas.snapshot(manifest)
+        manifest["hash"] = snapshot.hash
+
+    manifest_path = ctx.output_root / MANIFEST_FILENAME
+    temporary_path = manifest_path.with_name(f".{MANIFEST_FILENAME}.tmp")
+    with profiled(ctx, "serialize manifest") as span:
+        with temporary_path.open("w", encoding="utf-8") as handle:
+            for chunk in iter_manifest_json(manifest, indent):
+                handle.write(chunk)
+            if span is not None:
+                span["bytes_written"] = handle.tell()
+    os.replace(temporary_path, manifest_path)
+    if snapshot is not None:
+        with profiled(ctx, "publish manifest deltas"):
+            ctx.deltas.publish(ctx, manifest, snapshot)
+    return manifest_path
+
+
+def to_manifest_v2(manifest_root: Dict) -> Tuple[Dict, Dict[str, int]]:
+    """
+    Converts a version 1 manifest tree into the version 2 layout.
+
+    Every node gets a numeric `id`. File nodes lose their `breadcrumbs` and
+    gain `parent`, the id of their directory: a file's breadcrumbs are its
+    directory's breadcrumbs followed by the directory itself, so each chain
+    is stored once per directory. The returned index maps every `slugPath`
+    to a node id, so clients resolve a URL with one lookup. Where two nodes
+    share a slug path, the one a level-by-level walk would reach first (the
+    directory, then the earlier sibling) wins.
+
+    Args:
+        manifest_root: The version 1 root node; it is not modified.
+
+    Returns:
+        The version 2 root node and the slug path index.
+    """
+    ids = itertools.count()
+
+    def convert_directory(node: Dict) -> Dict:
+        converted = {key: value for key, value in node.items() if key not in ("directories", "files")}
+        converted["id"] = next(ids)
+        converted["directories"] = []
+        return converted
+
+    # Subdirectories are numbered depth first, and a directory's files after
+    # all of its subdirectories, so ids follow the order of the version 1 tree.
+    root = convert_directory(manifest_root)
+    stack = [(manifest_root, root, iter(manifest_root["directories"]))]
+    while stack:
+        node, converted, children = stack[-1]
+        child = next(children, None)
+        if child is not None:
+            converted_child = convert_directory(child)
+            converted["directories"].append(converted_child)
+            stack.append((child, converted_child, iter(child["directories"])))
+            continue
+        stack.pop()
+        converted["files"] = [
+            {**{key: value for key, value in file.items() if key != "breadcrumbs"}, "id": next(ids), "parent": converted["id"]}
+            for file in node["files"]
+        ]
+
+    # Register each directory's subdirectories before its files, and a
+    # directory's children before its later siblings' children.
+    index: Dict[str, int] = {root["slugPath"]: root["id"]}
+    pending = [root]
+    while pending:
+        node = pending.pop(0)
+        for child in node["directories"] + node["files"]:
+            index.setdefault(child["slugPath"], child["id"])
+        pending.extend(node["directories"])
+    return root, index
+
+
+def iter_manifest_json(manifest: Dict, indent: Optional[int] = None) -> Iterator[str]:
+    """
+    Yields the JSON text of a manifest in pieces.
+
+    The text is exactly what `json.dumps(manifest, indent=indent)` returns
+    (with compact separators when `indent` is None), but the manifest object
+    and the directory nodes are written one member at a time, walking the
+    tree with an explicit stack. Every other value, such as a file node or
+    the slug index, is encoded in one call. The full text of a large
+    manifest is therefore never held in memory, and deep trees cannot
+    exhaust the recursion limit.
+
+    Args:
+        manifest: The manifest object.
+        indent: The indentation width, or None for compact output.
+
+    Yields:
+        Consecutive pieces of the JSON text.
+    """
+    item_separator, key_separator = (",", ": ") if indent is not None else (",", ":")
+
+    def newline(depth: int) -> str:
+        return "\n" + " " * (indent * depth) if indent is not None else ""
+
+    def is_streamed(value: Any) -> bool:
+        # The manifest object, directory nodes and lists of nodes.
+        if isinstance(value, dict):
+            return "root" in value or "directories" in value
+        return isinstance(value, list) and bool(value) and isinstance(value[0], dict) and "type" in value[0]
+
+    # One frame per open container: its remaining members, whether it is an
+    # object, the depth of its members and whether one was written yet.
+    stack: List[List[Any]] = []
+    value: Any = manifest
+    depth = 0
+    while True:
+        if is_streamed(value):
+            yield "{" if isinstance(value, dict) else "["
+            stack.append([iter(value.items()) if isinstance(value, dict) else iter(value), isinstance(value, dict), depth + 1, False])
+        else:
+            text = json.dumps(value, indent=indent, separators=(item_separator, key_separator))
+            # JSON strings cannot contain raw newlines, so this only re-indents.
+            yield text.replace("\n", newline(depth)) if indent is not None and depth else text
+
+        # Close finished containers, then move on to the next member.
+        while stack:
+            frame = stack[-1]
+            members, is_object, depth, started = frame
+            member = next(members, frame)
+            if member is not frame:
+                break
+            stack.pop()
+            yield newline(depth - 1) + ("}" if is_object else "]")
+        else:
+            return
+        frame[3] = True
+        prefix = (item_separator if started else "") + newline(depth)
+        if is_object:
+            key, value = member
+            yield prefix + json.dumps(key) + key_separator
+        else:
+            value = member
+            yield prefix
 
 
 def build_breadcrumbs(chain: List[Dict[str, str]]) -> List[Dict[str, str]]:
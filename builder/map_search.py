@@ -0,0 +1,170 @@
+"""
+This file builds the attribute search index of a preprocessed map layer.
+
+The attribute table matches a query, lower-cased, as a substring of each
+searchable column's value. Instead of lower-casing and concatenating every
+row in the browser when the table opens, `write_search_index` does that work
+once, ahead of time, and writes:
+
+- `search.json`, describing each column: its distinct values (lower-cased,
+  formatted as the browser's `String()` would) as a dictionary, whether the
+  column is categorical (at most `CATEGORICAL_LIMIT` distinct values), the
+  minimum and maximum of numeric columns, and where the column's arrays are
+  in the binary file;
+- `search.bin`, holding little-endian typed arrays, each aligned to its item
+  size so the browser can view it in place: every column's per-row codes
+  into its dictionary, and for non-categorical columns, n-gram postings. For
+  each gram length in `GRAM_LENGTHS`, the distinct grams of the column's
+  values are listed (sorted) in `search.json`, and the binary file holds a
+  CSR table: `offsets[i]:offsets[i + 1]` slices `values` to the sorted
+  dictionary entries containing gram `i`.
+
+A query is then answered per column: a categorical column's dictionary is
+scanned directly, otherwise the postings of the query's grams are intersected
+and the few candidates checked. Matching rows are found by comparing codes,
+with no string work per row.
+"""
+
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .constants import MAP_SEARCH_DATA_FILENAME, MAP_SEARCH_INDEX_FILENAME
+
+try:
+    import numpy as np
+except ImportError:  # Preprocessing is unavailable without NumPy.
+    np = None
+
+SEARCH_FORMAT = 1
+GRAM_LENGTHS = (2, 3)
+CATEGORICAL_LIMIT = 256
+TYPED_ARRAYS = {"u1": "Uint8", "u2": "Uint16", "u4": "Uint32"}
+
+
+def js_string(value) -> str:
+    """
+    Formats a property value like the browser's `String()`, with null and
+    missing values as the empty string.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "Infinity" if value > 0 else "-Infinity"
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        text = repr(value)
+        # Python switches to exponents below 1e-4, JavaScript below 1e-6.
+        if "e" in text and abs(value) >= 1e-6 and abs(value) < 1e21:
+            return format(Decimal(text), "f")
+        return text.replace("e-0", "e-").replace("e+0", "e+")
+    if isinstance(value, (dict, list)):
+        return "[object Object]" if isinstance(value, dict) else ",".join(js_string(item) for item in value)
+    return str(value)
+
+
+class _Writer:
+    """Appends aligned arrays to the binary file and describes them."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, array: "np.ndarray") -> Dict:
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        padding = -self.size % array.dtype.itemsize
+        if padding:
+            self.chunks.append(bytes(padding))
+            self.size += padding
+        entry = {"type": TYPED_ARRAYS[array.dtype.str[1:]], "offset": self.size, "length": len(array)}
+        self.chunks.append(array.tobytes())
+        self.size += array.nbytes
+        return entry
+
+
+def code_dtype(size: int) -> "np.dtype":
+    """Returns the smallest unsigned type that can index `size` values."""
+    return np.dtype("u1" if size <= 1 << 8 else "u2" if size <= 1 << 16 else "u4")
+
+
+def write_search_index(output: Path, rows: List[Dict], columns: Optional[Sequence[str]] = None) -> int:
+    """
+    Writes the search index of a layer's properties.
+
+    Args:
+        output: The layer's output directory.
+        rows: Each feature's properties, in feature id order.
+        columns: The columns to index; all of them by default.
+
+    Returns:
+        The number of bytes written.
+    """
+    if columns is None:
+        names: Dict[str, None] = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        columns = list(names)
+
+    writer = _Writer()
+    described = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        texts = [js_string(value).lower() for value in values]
+        dictionary = sorted(set(texts))
+        position = {text: number for number, text in enumerate(dictionary)}
+        dtype = code_dtype(len(dictionary))
+        column = {
+            "dictionary": dictionary,
+            "categorical": len(dictionary) <= CATEGORICAL_LIMIT,
+            "codes": writer.add(np.fromiter((position[text] for text in texts), dtype=dtype, count=len(texts))),
+        }
+        numbers = [value for value in values if value is not None]
+        if numbers and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in numbers):
+            column["stats"] = {"min": min(numbers), "max": max(numbers), "count": len(numbers)}
+        if not column["categorical"]:
+            column["grams"] = {
+                str(length): describe_postings(writer, gram_postings(dictionary, length), dtype)
+                for length in GRAM_LENGTHS
+            }
+        described[name] = column
+
+    index = {
+        "format": SEARCH_FORMAT,
+        "count": len(rows),
+        "data": MAP_SEARCH_DATA_FILENAME,
+        "grams": list(GRAM_LENGTHS),
+        "columns": described,
+    }
+    data = b"".join(writer.chunks)
+    (output / MAP_SEARCH_DATA_FILENAME).write_bytes(data)
+    text = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    (output / MAP_SEARCH_INDEX_FILENAME).write_bytes(text)
+    return len(data) + len(text)
+
+
+def gram_postings(dictionary: List[str], length: int) -> Dict[str, List[int]]:
+    """Maps each gram of the given length to the (ascending) numbers of the values containing it."""
+    postings: Dict[str, List[int]] = {}
+    for number, text in enumerate(dictionary):
+        for gram in {text[start:start + length] for start in range(len(text) - length + 1)}:
+            postings.setdefault(gram, []).append(number)
+    return postings
+
+
+def describe_postings(writer: _Writer, postings: Dict[str, List[int]], dtype: "np.dtype") -> Dict:
+    """Writes postings as a CSR table and returns their description."""
+    keys = sorted(postings)
+    lengths = np.fromiter((len(postings[key]) for key in keys), dtype=np.int64, count=len(keys))
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.uint32)
+    flat: List[int] = [number for key in keys for number in postings[key]]
+    return {
+        "keys": keys,
+        "offsets": writer.add(offsets),
+        "values": writer.add(np.array(flat, dtype=dtype)),
+    }
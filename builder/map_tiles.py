@@ -0,0 +1,525 @@
+"""
+This file preprocesses a GeoJSON layer for the modular_map viewer.
+
+A large FeatureCollection is slow to draw all at once: the browser has to
+download and parse every vertex before anything appears, and the attribute
+table parses the same file again just to read the properties. `prepare_layer`
+splits it into:
+
+- one geometry level per zoom in `zooms`. Each level is simplified with
+  Douglas-Peucker to `pixels` screen pixels at its zoom, measured in Web
+  Mercator, and its coordinates are rounded to match. The last level keeps
+  every vertex, so zooming in past it never shows simplified lines. The
+  simplification runs once for all levels: every vertex gets the distance at
+  which Douglas-Peucker would drop it, computed for all lines at once with
+  NumPy, one recursion depth per pass, and each level keeps the vertices
+  above its tolerance;
+- spatial tiles for each level, written to `tiles/<zoom>/<x>-<y>.json` on the
+  Web Mercator grid a few zoom levels coarser than the level. A feature goes
+  into every tile its bounding box touches, so the client deduplicates by
+  feature id. Each tile holds the ids and geometries of its features;
+- `properties.json`, every feature's properties stored column by column
+  (with repeated values dictionary-encoded) plus each feature's bounding
+  box, so the attribute table never downloads geometry;
+- `search.json` and `search.bin`, the attribute table's search index (see
+  `map_search.py`);
+- `index.json`, listing the levels and, for each tile, the bounding box of
+  its content, so the client can pick the tiles that intersect the viewport
+  without any tile math.
+
+Feature ids are positions in the source file. NumPy is required.
+"""
+
+import json
+import math
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .constants import (
+    MAP_COORDINATE_DECIMALS,
+    MAP_INDEX_FILENAME,
+    MAP_PROPERTIES_FILENAME,
+    MAP_SEARCH_INDEX_FILENAME,
+    MAP_TILE_ZOOM_OFFSET,
+    MAP_TILES_DIR_NAME,
+    MAX_MAP_TILE_ZOOM,
+)
+from .map_search import write_search_index
+
+try:
+    import numpy as np
+except ImportError:  # Preprocessing is unavailable without NumPy.
+    np = None
+
+INDEX_FORMAT = 1
+TILE_SIZE = 256
+# Web Mercator is undefined at the poles; latitudes are clamped to its square.
+MAX_LATITUDE = 85.0511287798
+
+# Part kinds: points are never simplified, lines keep two vertices and
+# rings four.
+POINTS, LINE, RING = 0, 1, 2
+MIN_VERTICES = {POINTS: 1, LINE: 2, RING: 4}
+
+
+@dataclass
+class FlatLayer:
+    """
+    Every coordinate of a FeatureCollection, in one array.
+
+    `lonlat` holds the vertices of all parts (points, lines and rings) back
+    to back; part `i` spans `starts[i]:ends[i]` and has kind `kinds[i]`.
+    A feature's parts are contiguous, and row `i` of `spans` holds the
+    (start, end) range of feature `i`'s vertices. `shapes` holds each
+    feature's geometry type and its parts, nested like the GeoJSON
+    coordinates, or None for a feature without geometry; `verbatim` holds
+    geometries that are copied unchanged (collections).
+    """
+    lonlat: "np.ndarray"
+    starts: "np.ndarray"
+    ends: "np.ndarray"
+    kinds: "np.ndarray"
+    spans: "np.ndarray"
+    shapes: List[Optional[Tuple[str, object]]]
+    verbatim: Dict[int, Dict] = field(default_factory=dict)
+
+
+@dataclass
+class LevelStats:
+    """What was written for one zoom level."""
+    zoom: int
+    tile_zoom: int
+    tolerance: float
+    features: int = 0
+    vertices: int = 0
+    tiles: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class LayerReport:
+    """What `prepare_layer` wrote, and how long each stage took."""
+    features: int
+    vertices: int
+    input_bytes: int
+    properties_bytes: int = 0
+    search_bytes: int = 0
+    index_bytes: int = 0
+    levels: List[LevelStats] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def output_bytes(self) -> int:
+        return self.properties_bytes + self.search_bytes + self.index_bytes + sum(level.bytes for level in self.levels)
+
+
+def prepare_layer(source: Path, output: Path, zooms: Sequence[int], pixels: float,
+                  search_columns: Optional[Sequence[str]] = None) -> LayerReport:
+    """
+    Splits a GeoJSON FeatureCollection into simplified tiles and columnar
+    properties.
+
+    Args:
+        source: The GeoJSON file.
+        output: The directory to write to. Its tiles are replaced.
+        zooms: The zoom levels to write, in increasing order.
+        pixels: The simplification tolerance, in screen pixels at each level's zoom.
+        search_columns: The properties to index for search; all of them by default.
+
+    Returns:
+        The sizes written per level and the time taken per stage.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    collection = json.loads(source.read_text(encoding="utf-8"))
+    if collection.get("type") != "FeatureCollection":
+        raise ValueError(f"{source} is not a GeoJSON FeatureCollection")
+    features = collection.get("features") or []
+    timings["read"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    layer = flatten(features)
+    world = project(layer.lonlat)
+    tolerances = [pixels / (TILE_SIZE * 2 ** zoom) for zoom in zooms[:-1]] + [0.0]
+    simplified = layer.kinds != POINTS
+    significance = vertex_significance(world, layer.starts[simplified], layer.ends[simplified] - 1,
+                                       min(tolerances[:-1], default=0.0))
+    # Point vertices are always kept, whatever their part's length.
+    significance[np.repeat(~simplified, layer.ends - layer.starts)] = np.inf
+    timings["simplify"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bounds = feature_bounds(layer, world)
+    if output.exists():
+        shutil.rmtree(output / MAP_TILES_DIR_NAME, ignore_errors=True)
+    output.mkdir(parents=True, exist_ok=True)
+    report = LayerReport(features=len(features), vertices=len(layer.lonlat), input_bytes=source.stat().st_size)
+    levels = []
+    for zoom, tolerance in zip(zooms, tolerances):
+        stats, tiles = write_level(output, layer, significance, bounds, zoom, tolerance)
+        report.levels.append(stats)
+        levels.append({
+            "zoom": zoom,
+            "tileZoom": stats.tile_zoom,
+            "tolerance": pixels if tolerance else 0,
+            "tiles": tiles,
+        })
+    timings["tiles"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = [feature.get("properties") or {} for feature in features]
+    report.search_bytes = write_search_index(output, rows, search_columns)
+    timings["search index"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    properties = columnar_properties(rows, bounds)
+    report.properties_bytes = write_json(output / MAP_PROPERTIES_FILENAME, properties)
+    lonlat_bounds = bounds["lonlat"][bounds["present"]]
+    index = {
+        "format": INDEX_FORMAT,
+        "source": source.name,
+        "features": len(features),
+        "bbox": [
+            *np.round(lonlat_bounds[:, :2].min(axis=0), MAP_COORDINATE_DECIMALS).tolist(),
+            *np.round(lonlat_bounds[:, 2:].max(axis=0), MAP_COORDINATE_DECIMALS).tolist(),
+        ] if len(lonlat_bounds) else None,
+        "properties": MAP_PROPERTIES_FILENAME,
+        "search": MAP_SEARCH_INDEX_FILENAME,
+        "columns": list(properties["columns"]),
+        "levels": levels,
+    }
+    report.index_bytes = write_json(output / MAP_INDEX_FILENAME, index)
+    timings["properties and index"] = time.perf_counter() - started
+    report.timings = timings
+    return report
+
+
+def flatten(features: List[Dict]) -> FlatLayer:
+    """
+    Collects the coordinates of every feature into one array.
+
+    Args:
+        features: The GeoJSON features.
+
+    Returns:
+        The flattened layer.
+    """
+    coordinates: List[List[float]] = []
+    starts: List[int] = []
+    kinds: List[int] = []
+    spans: List[Tuple[int, int]] = []
+    shapes: List[Optional[Tuple[str, object]]] = []
+    verbatim: Dict[int, Dict] = {}
+
+    def part(points: List, kind: int) -> int:
+        starts.append(len(coordinates))
+        kinds.append(kind)
+        coordinates.extend(point[:2] for point in points)
+        return len(starts) - 1
+
+    for number, feature in enumerate(features):
+        first = len(coordinates)
+        geometry = feature.get("geometry")
+        kind = geometry.get("type") if geometry else None
+        if kind == "Point":
+            shapes.append((kind, part([geometry["coordinates"]], POINTS)))
+        elif kind == "MultiPoint":
+            shapes.append((kind, part(geometry["coordinates"], POINTS)))
+        elif kind == "LineString":
+            shapes.append((kind, part(geometry["coordinates"], LINE)))
+        elif kind == "MultiLineString":
+            shapes.append((kind, [part(line, LINE) for line in geometry["coordinates"]]))
+        elif kind == "Polygon":
+            shapes.append((kind, [part(ring, RING) for ring in geometry["coordinates"]]))
+        elif kind == "MultiPolygon":
+            shapes.append((kind, [[part(ring, RING) for ring in polygon] for polygon in geometry["coordinates"]]))
+        else:
+            shapes.append(None)
+            if geometry:
+                verbatim[number] = geometry
+        spans.append((first, len(coordinates)))
+
+    starts_array = np.array(starts, dtype=np.int64)
+    return FlatLayer(
+        lonlat=np.array(coordinates, dtype=np.float64).reshape(-1, 2),
+        starts=starts_array,
+        ends=np.append(starts_array[1:], len(coordinates)).astype(np.int64),
+        kinds=np.array(kinds, dtype=np.int8),
+        spans=np.array(spans, dtype=np.int64).reshape(-1, 2),
+        shapes=shapes,
+        verbatim=verbatim,
+    )
+
+
+def project(lonlat: "np.ndarray") -> "np.ndarray":
+    """Projects longitude/latitude pairs to Web Mercator world coordinates in [0, 1], y pointing south."""
+    latitude = np.radians(np.clip(lonlat[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    x = lonlat[:, 0] / 360 + 0.5
+    y = 0.5 - np.log(np.tan(np.pi / 4 + latitude / 2)) / (2 * np.pi)
+    return np.column_stack((x, y))
+
+
+def vertex_significance(points: "np.ndarray", firsts: "np.ndarray", lasts: "np.ndarray",
+                        tolerance: float) -> "np.ndarray":
+    """
+    Ranks the vertices of many polylines for Douglas-Peucker simplification.
+
+    Douglas-Peucker keeps a vertex at tolerance `t` if its distance from the
+    chord of the interval being split is the interval's largest and exceeds
+    `t`, and every split that led to that interval exceeded `t` as well. So a
+    vertex's significance is the smallest of those distances along its chain
+    of splits, and simplifying at `t` keeps exactly the vertices whose
+    significance exceeds `t`. Each pass splits every open interval of every
+    line at once.
+
+    Args:
+        points: All vertices, projected.
+        firsts: The index of each line's first vertex.
+        lasts: The index of each line's last vertex.
+        tolerance: The smallest tolerance that will be asked for; intervals
+            within it are not split further.
+
+    Returns:
+        Each vertex's significance: infinite for end points, zero for
+        vertices dropped at every tolerance down to `tolerance`.
+    """
+    significance = np.zeros(len(points))
+    significance[firsts] = np.inf
+    significance[lasts] = np.inf
+    start, end = firsts, lasts
+    bound = np.full(len(start), np.inf)
+    while len(start):
+        lengths = end - start - 1
+        open_ = lengths > 0
+        start, end, bound, lengths = start[open_], end[open_], bound[open_], lengths[open_]
+        if not len(start):
+            break
+        # The interior vertices of every interval, back to back.
+        offsets = np.cumsum(lengths) - lengths
+        owner = np.repeat(np.arange(len(start)), lengths)
+        index = np.arange(len(owner)) - offsets[owner] + start[owner] + 1
+        a, b, p = points[start[owner]], points[end[owner]], points[index]
+        chord = b - a
+        norm = np.hypot(chord[:, 0], chord[:, 1])
+        across = np.abs(chord[:, 0] * (p[:, 1] - a[:, 1]) - chord[:, 1] * (p[:, 0] - a[:, 0]))
+        # A closed ring's chord has no length; distances are then to its end point.
+        distance = np.where(norm > 0, across / np.where(norm > 0, norm, 1), np.hypot(p[:, 0] - a[:, 0], p[:, 1] - a[:, 1]))
+
+        largest = np.maximum.reduceat(distance, offsets)
+        hits = np.flatnonzero(distance == largest[owner])
+        split = index[hits[np.unique(owner[hits], return_index=True)[1]]]
+        value = np.minimum(largest, bound)
+        deeper = largest > tolerance
+        significance[split[deeper]] = value[deeper]
+        start, end, bound = (
+            np.concatenate((start[deeper], split[deeper])),
+            np.concatenate((split[deeper], end[deeper])),
+            np.concatenate((value[deeper], value[deeper])),
+        )
+    return significance
+
+
+def feature_bounds(layer: FlatLayer, world: "np.ndarray") -> Dict[str, "np.ndarray"]:
+    """
+    Computes every feature's bounding box.
+
+    Returns:
+        `lonlat` and `world` boxes as (west, south, east, north) and
+        (min x, min y, max x, max y) rows, and `present`, which is False for
+        features without coordinates (their rows are NaN).
+    """
+    count = len(layer.shapes)
+    lonlat = np.full((count, 4), np.nan)
+    projected = np.full((count, 4), np.nan)
+    numbers = np.flatnonzero(layer.spans[:, 1] > layer.spans[:, 0])
+    if len(numbers):
+        # Features without vertices take none of the array, so each reduction
+        # runs from a feature's first vertex to the next one's.
+        first = layer.spans[numbers, 0]
+        for target, values in ((lonlat, layer.lonlat), (projected, world)):
+            target[numbers, :2] = np.minimum.reduceat(values, first)
+            target[numbers, 2:] = np.maximum.reduceat(values, first)
+    for number, geometry in layer.verbatim.items():
+        points = np.array(list(_walk_coordinates(geometry)), dtype=np.float64).reshape(-1, 2)
+        if len(points):
+            lonlat[number] = [*points.min(axis=0), *points.max(axis=0)]
+            world_points = project(points)
+            projected[number] = [*world_points.min(axis=0), *world_points.max(axis=0)]
+    return {"lonlat": lonlat, "world": projected, "present": ~np.isnan(lonlat[:, 0])}
+
+
+def write_level(output: Path, layer: FlatLayer, significance: "np.ndarray", bounds: Dict[str, "np.ndarray"],
+                zoom: int, tolerance: float) -> Tuple[LevelStats, List[Dict]]:
+    """
+    Writes the tiles of one zoom level.
+
+    Args:
+        output: The layer's output directory.
+        layer: The flattened layer.
+        significance: Each vertex's significance (see `vertex_significance`).
+        bounds: Each feature's bounding boxes (see `feature_bounds`).
+        zoom: The level's zoom.
+        tolerance: The level's tolerance in world units; zero keeps every vertex.
+
+    Returns:
+        The level's stats, and its tile index: one entry per tile with its
+        key and the bounding box and number of its features.
+    """
+    stats = LevelStats(zoom=zoom, tile_zoom=min(max(zoom - MAP_TILE_ZOOM_OFFSET, 0), MAX_MAP_TILE_ZOOM), tolerance=tolerance)
+    geometries = level_geometries(layer, significance, zoom, tolerance)
+    grid = 2 ** stats.tile_zoom
+    world = bounds["world"]
+    cells = np.clip(np.floor(np.nan_to_num(world) * grid), 0, grid - 1).astype(np.int64)
+
+    tiles: Dict[Tuple[int, int], List[int]] = {}
+    for number, geometry in geometries.items():
+        x0, y0, x1, y1 = cells[number]
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tiles.setdefault((x, y), []).append(number)
+
+    directory = output / MAP_TILES_DIR_NAME / str(zoom)
+    directory.mkdir(parents=True, exist_ok=True)
+    index = []
+    for (x, y), numbers in sorted(tiles.items()):
+        key = f"{x}-{y}"
+        text = f'{{"ids":{json.dumps(numbers, separators=(",", ":"))},"geometries":[{",".join(geometries[n] for n in numbers)}]}}'
+        data = text.encode("utf-8")
+        (directory / f"{key}.json").write_bytes(data)
+        box = bounds["lonlat"][numbers]
+        index.append({
+            "key": key,
+            "bbox": [
+                *np.round(box[:, :2].min(axis=0), MAP_COORDINATE_DECIMALS).tolist(),
+                *np.round(box[:, 2:].max(axis=0), MAP_COORDINATE_DECIMALS).tolist(),
+            ],
+            "features": len(numbers),
+        })
+        stats.bytes += len(data)
+    stats.tiles = len(tiles)
+    stats.features = len(geometries)
+    stats.vertices = int(np.count_nonzero(significance > tolerance)) if tolerance else len(significance)
+    return stats, index
+
+
+def level_geometries(layer: FlatLayer, significance: "np.ndarray", zoom: int, tolerance: float) -> Dict[int, str]:
+    """
+    Simplifies every feature for one level.
+
+    Returns:
+        Each feature's id mapped to its simplified geometry, serialized.
+        Features whose lines or rings all collapse are left out.
+    """
+    decimals = MAP_COORDINATE_DECIMALS
+    if tolerance:
+        # Rounding stays well below the tolerance (one pixel spans fewer
+        # degrees of latitude than of longitude).
+        decimals = min(decimals, math.ceil(-math.log10(tolerance * 360)) + 1)
+    kept = significance > tolerance
+    points = np.round(layer.lonlat[kept], decimals)
+    part_of = np.repeat(np.arange(len(layer.starts)), layer.ends - layer.starts)[kept]
+    # Rounding can make neighbouring vertices equal; keep the first of each run.
+    fresh = np.ones(len(points), dtype=bool)
+    fresh[1:] = (part_of[1:] != part_of[:-1]) | np.any(points[1:] != points[:-1], axis=1)
+    points, part_of = points[fresh], part_of[fresh]
+    counts = np.bincount(part_of, minlength=len(layer.starts))
+    offsets = np.cumsum(counts) - counts
+    coordinates = points.tolist()
+    kinds = layer.kinds.tolist()
+    counts_list, offsets_list = counts.tolist(), offsets.tolist()
+
+    def part(number: int) -> Optional[List]:
+        count = counts_list[number]
+        if count < MIN_VERTICES[kinds[number]]:
+            return None
+        return coordinates[offsets_list[number]:offsets_list[number] + count]
+
+    def polygon(rings: List[int]) -> Optional[List]:
+        exterior = part(rings[0]) if rings else None
+        if exterior is None:
+            return None
+        return [exterior, *(ring for ring in map(part, rings[1:]) if ring is not None)]
+
+    geometries: Dict[int, str] = {}
+    for number, shape in enumerate(layer.shapes):
+        if shape is None:
+            if number in layer.verbatim:
+                geometries[number] = json.dumps(layer.verbatim[number], separators=(",", ":"))
+            continue
+        kind, parts = shape
+        if kind == "Point":
+            value = part(parts)
+            value = value[0] if value else None
+        elif kind in ("MultiPoint", "LineString"):
+            value = part(parts)
+        elif kind == "Polygon":
+            value = polygon(parts)
+        else:
+            build = part if kind == "MultiLineString" else polygon
+            value = [item for item in map(build, parts) if item is not None] or None
+        if value is not None:
+            geometries[number] = json.dumps({"type": kind, "coordinates": value}, separators=(",", ":"))
+    return geometries
+
+
+def columnar_properties(rows: List[Dict], bounds: Dict[str, "np.ndarray"]) -> Dict:
+    """
+    Stores feature properties column by column.
+
+    A column is `{"values": [...]}`, or `{"dictionary": [...], "codes": [...]}`
+    when it has fewer distinct values than half its length. Missing values
+    are null.
+
+    Args:
+        rows: Each feature's properties.
+        bounds: Each feature's bounding boxes (see `feature_bounds`).
+
+    Returns:
+        The properties object, whose `bbox` lists four numbers per feature
+        (null for features without geometry).
+    """
+    names: Dict[str, None] = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        codes: Dict[str, int] = {}
+        encoded = []
+        for value in values:
+            # Keys are serialized so that 1, 1.0 and True stay distinct.
+            encoded.append(codes.setdefault(json.dumps(value), len(codes)))
+            if len(codes) * 2 >= len(values):
+                break
+        if len(codes) * 2 < len(values):
+            columns[name] = {"dictionary": [json.loads(key) for key in codes], "codes": encoded}
+        else:
+            columns[name] = {"values": values}
+    boxes = np.round(bounds["lonlat"], MAP_COORDINATE_DECIMALS).astype(object)
+    boxes[~bounds["present"]] = None
+    return {"format": INDEX_FORMAT, "count": len(rows), "columns": columns, "bbox": boxes.ravel().tolist()}
+
+
+def write_json(path: Path, value: Dict) -> int:
+    """Writes compact JSON and returns its size in bytes."""
+    data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    path.write_bytes(data)
+    return len(data)
+
+
+def _walk_coordinates(geometry: Dict):
+    """Yields every position of a geometry, including inside collections."""
+    if geometry.get("type") == "GeometryCollection":
+        for member in geometry.get("geometries") or []:
+            yield from _walk_coordinates(member)
+        return
+    pending = [geometry.get("coordinates")]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, list) and value and isinstance(value[0], (int, float)):
+            yield value[:2]
+        elif isinstance(value, list):
+            pending.extend(value)
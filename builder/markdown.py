@@ -2,21 +2,258 @@
 This file is dedicated to converting Markdown text into HTML fragments.
 
 It implements a lightweight parser that specifically targets the required
-subset of Markdown for this project: H1-H5 headings, standard and Obsidian-style
-image links, and paragraphs. All other Markdown is ignored, and text is
-HTML-escaped to be displayed as-is. This ensures a consistent and predictable
-output for the SPA to consume.
+subset of Markdown for this project: H1-H5 headings, standard and
+Obsidian-style image links, paragraphs and, within paragraphs, wikilinks to
+other notes. All other Markdown is ignored, and text is HTML-escaped to be
+displayed as-is. This ensures a consistent and predictable output for the SPA
+to consume.
+
+Each line is classified exactly once, in order, against a small set of rules
+whose patterns are compiled when the module loads. Everything that only
+depends on the note being rendered, such as its directory relative to the
+vault and the resolution of its asset references, is computed once per note
+by a `NoteRenderer`, which also resolves each distinct wikilink target once
+against the context's link index. When asked to, the renderer also collects
+the terms of the note's headings and paragraphs for the search index, and the
+note's preview for the manifest.
 """
 
+import hashlib
 import re
 from pathlib import Path
-from typing import List
-from .assets import normalise_image_src
+from typing import Dict, List, Optional, Tuple
+
+from .assets import normalise_image_src, resolve_asset_reference
+from .constants import IMAGE_SIZES, IMAGES_DIR_NAME
+from .excalidraw import excalidraw_preview
+from .links import WIKILINK_PATTERN, Links, notes_href
 from .models import BuildContext
-from .utils import escape_html
+from .previews import Preview, add_heading, add_image, add_paragraph
+from .search import Postings, add_terms
+from .utils import escape_html, posix_path, posix_relpath
+
+HEADING_PATTERN = re.compile(r"^(#{1,5})\s+(.*)$")
+IMAGE_PATTERN = re.compile(r"!\[\[(.+?)\]\]|!\[(.*?)\]\((.+?)\)")
+
+EXCALIDRAW_SUFFIX = ".excalidraw"
+EXCALIDRAW_MARKDOWN_SUFFIX = ".excalidraw.md"
+
 
+class NoteRenderer:
+    """
+    Renders the lines of a single note.
 
-def render_markdown(ctx: BuildContext, source_file: Path, markdown_text: str) -> str:
+    Asset references are resolved, and their fragment-relative paths
+    computed, at most once per distinct reference string. Every resolution is
+    recorded in `references` so incremental builds can tell when the note's
+    assets change. Wikilink targets are resolved once each too, and recorded
+    in `links`. If `terms` is given, the text of headings and paragraphs is
+    tokenized into it. If `preview` is given, the note's excerpt, outline,
+    word count and first image are collected in it.
+    """
+
+    def __init__(self, ctx: BuildContext, source_file: Path, references: Optional[Dict[str, Optional[Path]]] = None,
+                 terms: Optional[Postings] = None, links: Optional[Links] = None, preview: Optional[Preview] = None) -> None:
+        self.ctx = ctx
+        self.source_dir = source_file.parent
+        self.relative_dir = self.source_dir.relative_to(ctx.source_root)
+        self.note_key = posix_path(source_file.relative_to(ctx.source_root))
+        self.references: Dict[str, Optional[Path]] = references if references is not None else {}
+        self.terms = terms
+        self.links: Links = links if links is not None else {}
+        self.preview = preview
+        self._asset_srcs: Dict[str, str] = {}
+
+    def resolve(self, reference: str) -> Optional[Path]:
+        """Resolves an asset reference relative to this note, with caching."""
+        if reference in self.references:
+            return self.references[reference]
+        resolved = resolve_asset_reference(self.ctx, self.source_dir, reference)
+        self.references[reference] = resolved
+        return resolved
+
+    def asset_src(self, reference: str) -> str:
+        """Returns the fragment-relative src for an asset reference, with caching."""
+        src = self._asset_srcs.get(reference)
+        if src is None:
+            src = normalise_image_src(self.ctx, self.source_dir, self.relative_dir, reference, self.resolve)
+            self._asset_srcs[reference] = src
+        return src
+
+    def render(self, markdown_text: str) -> str:
+        """
+        Converts the note's Markdown text into an HTML fragment.
+
+        Lines are stripped and blank lines dropped. A line is then a heading
+        if it starts with one to five '#' and a space, an image line if it
+        contains at least one image embed (only the embeds are kept), and a
+        paragraph otherwise. Wikilinks in paragraphs become anchors when a
+        link index is attached.
+
+        Args:
+            markdown_text: The raw text content of the Markdown file.
+
+        Returns:
+            A string containing the generated HTML fragment.
+        """
+        html_lines: List[str] = []
+        append = html_lines.append
+        # The same embed always renders the same way within a note.
+        embeds: Dict[Tuple[str, str], str] = {}
+        # Text for the search index, tokenized in one go at the end.
+        indexed_text: Optional[List[str]] = [] if self.terms is not None else None
+
+        for raw_line in markdown_text.splitlines():
+            line = raw_line.strip()
+            if not line:
+                continue
+
+            # Markdown processing:
+            ## artifacts that occurs to the whole line VERSUS to an element within the line
+            # - Source ParsingRules.md
+
+            # Is Heading
+            if line[0] == "#":
+                heading_match = HEADING_PATTERN.match(line)
+                if heading_match:
+                    level = len(heading_match.group(1))
+                    text = heading_match.group(2).strip()
+                    append(f"<h{level}>{escape_html(text)}</h{level}>")
+                    if indexed_text is not None:
+                        indexed_text.append(text)
+                    if self.preview is not None:
+                        add_heading(self.preview, level, text)
+                    continue
+
+            # Is Img
+            if "![" in line:
+                img_matches = IMAGE_PATTERN.findall(line)
+                if img_matches:
+                    for obsidian_style_src, markdown_style_alt, markdown_style_src in img_matches:
+                        embed = (obsidian_style_src or markdown_style_src, markdown_style_alt)
+                        embed_html = embeds.get(embed)
+                        if embed_html is None:
+                            embed_html = embeds[embed] = self.render_image(*embed)
+                        append(embed_html)
+                        if self.preview is not None and "image" not in self.preview and not self.is_excalidraw(embed[0]):
+                            add_image(self.preview, self.asset_src(embed[0]), posix_path(self.relative_dir))
+                    continue
+
+            # Is Paragraph
+            # catch all is paragraph
+            if "[[" in line and self.ctx.links is not None:
+                append(f"<p>{WIKILINK_PATTERN.sub(self.render_link, line)}</p>")
+            else:
+                append(f"<p>{line}</p>")
+            if indexed_text is not None:
+                indexed_text.append(line)
+            if self.preview is not None:
+                add_paragraph(self.preview, line)
+
+        if indexed_text is not None:
+            add_terms(self.terms, "\n".join(indexed_text))
+        return "\n".join(html_lines)
+
+    def render_link(self, match: "re.Match[str]") -> str:
+        """
+        Renders one wikilink as an anchor to the linked note's route.
+
+        The label is the alias if there is one, otherwise the target with any
+        heading shown as "Note > Heading". A link that matches no note is
+        kept as marked-up text.
+
+        Args:
+            match: A WIKILINK_PATTERN match.
+
+        Returns:
+            The HTML for the link.
+        """
+        target, _, alias = match.group(1).partition("|")
+        page, _, heading = target.partition("#")
+        page, heading = page.strip(), heading.strip()
+        label = escape_html(alias.strip() or (f"{page} > {heading}" if page and heading else page or heading))
+        if not page:
+            return label
+        if page not in self.links:
+            self.links[page] = self.ctx.links.resolve(self.note_key, page)
+        resolved = self.links[page]
+        if resolved is None:
+            return f'<span class="wikilink wikilink--unresolved">{label}</span>'
+        return f'<a class="wikilink" href="{notes_href(self.ctx.links.slug_paths[resolved])}">{label}</a>'
+
+    def is_excalidraw(self, src: str) -> bool:
+        """Checks whether an embed is an Excalidraw scene, by the extension of its reference or of the file it resolves to."""
+        lowered = src.lower()
+        resolved_path = self.resolve(src)
+        return (lowered.endswith(EXCALIDRAW_SUFFIX) or
+                lowered.endswith(EXCALIDRAW_MARKDOWN_SUFFIX) or
+                (resolved_path is not None and resolved_path.suffix.lower() == EXCALIDRAW_SUFFIX))
+
+    def render_image(self, src: str, alt: str) -> str:
+        """
+        Renders one image embed as an `<img>` tag or an Excalidraw placeholder.
+
+        An image with derivatives in the context's image pipeline also gets
+        `srcset`, `sizes`, its intrinsic `width` and `height`, and lazy loading.
+        An Excalidraw placeholder shows the scene pre-rendered to SVG.
+
+        Args:
+            src: The embed's raw reference.
+            alt: The embed's alt text (empty for Obsidian-style embeds).
+
+        Returns:
+            The HTML for the embed.
+        """
+        # First resolve the asset to get the actual file path
+        resolved_path = self.resolve(src)
+
+        if not self.is_excalidraw(src):
+            # Handle regular images
+            info = self.ctx.images.get(resolved_path) if self.ctx.images is not None and resolved_path is not None else None
+            if info is not None:
+                srcset = ", ".join(
+                    f"{posix_relpath(Path(IMAGES_DIR_NAME) / name, self.relative_dir)} {width}w"
+                    for name, width in info.variants
+                )
+                return (f'<img src="{self.asset_src(src)}" srcset="{srcset}" sizes="{IMAGE_SIZES}" '
+                        f'width="{info.width}" height="{info.height}" loading="lazy" decoding="async" alt="{escape_html(alt)}"/>')
+            return f'<img src="{self.asset_src(src)}" alt="{escape_html(alt)}"/>'
+
+        # Handle Excalidraw files specifically
+        # Use the resolved path's name to ensure we have the correct extension
+        if resolved_path is not None:
+            excalidraw_src = resolved_path.name
+        elif src.endswith(EXCALIDRAW_MARKDOWN_SUFFIX):
+            # Fallback: strip .md if present
+            excalidraw_src = src.replace(EXCALIDRAW_MARKDOWN_SUFFIX, EXCALIDRAW_SUFFIX)
+        else:
+            excalidraw_src = src
+
+        asset_path = self.asset_src(excalidraw_src)
+
+        # Generate a unique ID for this Excalidraw instance
+        unique_id = hashlib.md5(asset_path.encode()).hexdigest()[:8]
+
+        # Show the pre-rendered SVG; the client-side JS swaps in the
+        # interactive viewer when it is clicked.
+        preview = None
+        if resolved_path is not None and resolved_path.suffix.lower() == EXCALIDRAW_SUFFIX:
+            preview = excalidraw_preview(self.ctx, resolved_path)
+        if preview is not None:
+            svg_path, width, height = preview
+            placeholder = (f'<img class="excalidraw-preview" src="{posix_relpath(Path(svg_path), self.relative_dir)}" '
+                           f'width="{width}" height="{height}" loading="lazy" decoding="async" alt="{escape_html(alt or "Excalidraw diagram")}"/>')
+        else:
+            placeholder = '<div class="excalidraw-loading">Loading Excalidraw diagram...</div>'
+
+        # Create a container div with data attributes that will be picked up by the client-side JS
+        return f'''<div class="excalidraw-embed" data-excalidraw-src="{asset_path}" id="excalidraw-{unique_id}">
+    {placeholder}
+</div>'''
+
+
+def render_markdown(ctx: BuildContext, source_file: Path, markdown_text: str, references: Optional[Dict[str, Optional[Path]]] = None,
+                    terms: Optional[Postings] = None, links: Optional[Links] = None, preview: Optional[Preview] = None) -> str:
     """
     Converts a string of Markdown into an HTML fragment.
 
@@ -29,78 +266,17 @@ def render_markdown(ctx: BuildContext, source_file: Path, markdown_text: str) ->
         ctx: The build context, needed for resolving image paths.
         source_file: The path to the Markdown file being rendered.
         markdown_text: The raw text content of the Markdown file.
+        references: If given, every asset reference that was resolved is
+            recorded here with its resolved path (or None), so incremental
+            builds can tell when a note's assets change.
+        terms: If given, the terms of the note's headings and paragraphs are
+            counted here, for the search index.
+        links: If given, every wikilink target is recorded here with the
+            source key of the note it resolved to (or None).
+        preview: If given, the note's preview is collected here (see
+            previews.py).
 
     Returns:
         A string containing the generated HTML fragment.
     """
-    html_lines: List[str] = []
-
-    x = markdown_text.splitlines()
-    for raw_line in x:
-        line = raw_line.strip() # Strip leading/trailing whitespace
-        if not line.strip(): # if line empty
-            continue
-
-        # Markdown processing:
-        ## artifacts that occurs to the whole line VERSUS to an element within the line
-        # - Source ParsingRules.md
-
-        # Is Heading
-        heading_match = re.match(r"^(#{1,5})\s+(.*)$", line)
-        if heading_match:
-            level = len(heading_match.group(1))
-            content = escape_html(heading_match.group(2).strip())
-            html_lines.append(f"<h{level}>{content}</h{level}>")
-            continue
-
-        # Is Img
-        image_pattern = re.compile(r"!\[\[(.+?)\]\]|!\[(.*?)\]\((.+?)\)")
-        img_matches = image_pattern.findall(line)
-        if img_matches:
-            for img_match in img_matches:
-                obsidian_style_match = img_match[0]
-                markdown_style_alt = img_match[1]
-                markdown_style_src = img_match[2]
-
-                src = obsidian_style_match or markdown_style_src
-                alt = markdown_style_alt
-
-                # First resolve the asset to get the actual file path
-                from .assets import resolve_asset_reference
-                resolved_path = resolve_asset_reference(ctx, source_file.parent, src)
-                
-                # Check if this is an Excalidraw file (either by extension in src or resolved path)
-                is_excalidraw = (src.lower().endswith('.excalidraw') or 
-                               src.lower().endswith('.excalidraw.md') or
-                               (resolved_path and resolved_path.suffix.lower() == '.excalidraw'))
-                
-                if is_excalidraw:
-                    # Handle Excalidraw files specifically
-                    # Use the resolved path's name to ensure we have the correct extension
-                    if resolved_path:
-                        excalidraw_src = resolved_path.name
-                    else:
-                        # Fallback: strip .md if present
-                        excalidraw_src = src.replace('.excalidraw.md', '.excalidraw') if src.endswith('.excalidraw.md') else src
-                    
-                    asset_path = normalise_image_src(ctx, source_file.parent, source_file.parent.relative_to(ctx.source_root), excalidraw_src)
-                    
-                    # Generate a unique ID for this Excalidraw instance
-                    import hashlib
-                    unique_id = hashlib.md5(asset_path.encode()).hexdigest()[:8]
-                    
-                    # Create a container div with data attributes that will be picked up by the client-side JS
-                    excalidraw_html = f'''<div class="excalidraw-embed" data-excalidraw-src="{asset_path}" id="excalidraw-{unique_id}">
-    <div class="excalidraw-loading">Loading Excalidraw diagram...</div>
-</div>'''
-                    html_lines.append(excalidraw_html)
-                else:
-                    # Handle regular images
-                    asset_path = normalise_image_src(ctx, source_file.parent, source_file.parent.relative_to(ctx.source_root), src)
-                    html_lines.append(f'<img src="{asset_path}" alt="{escape_html(alt)}"/>')
-            continue
-        # Is Paragraph
-        # catch all is paragraph
-        html_lines.append(f"<p>{line}</p>")
-
-    return "\n".join(html_lines)
+    return NoteRenderer(ctx, source_file, references, terms, links, preview).render(markdown_text)
@@ -7,8 +7,22 @@ such as file paths. The BuildContext class encapsulates the essential paths
 needed for various modules to perform their tasks.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from .constants import COPY_MODE_COPY, DEFAULT_MANIFEST_VERSION
+
+if TYPE_CHECKING:
+    from .asset_store import AssetStore
+    from .deltas import ManifestDeltas
+    from .images import ImagePipeline
+    from .index import VaultIndex
+    from .links import LinkIndex
+    from .packs import FragmentPacks
+    from .profile import Profiler
+    from .search import SearchIndex
+    from .state import BuildState
 
 
 @dataclass
@@ -16,8 +30,83 @@ class BuildContext:
     """
     A container for all contextual information required for the build.
 
-    This includes the absolute paths to the source vault and the output
-    directory, which are fundamental for resolving, reading, and writing files.
+    `source_root` and `output_root` are the absolute paths to the source vault
+    and the output directory, which are fundamental for resolving, reading,
+    and writing files. The other fields configure the rest of the build; an
+    attachment left as None, or a switch left off, disables its part:
+
+    - `state`: unchanged sources are skipped and their outputs reused.
+    - `plan`: file copies and note renders are queued instead of performed.
+    - `index`: directory listings and asset lookups are answered from memory.
+    - `copy_mode`: how attachments are written; `copy_stats` tallies the cost.
+    - `manifest_version`: the format `write_manifest` emits.
+    - `search`: rendered notes are tokenized into the search index.
+    - `images`: images with derivatives render responsively.
+    - `profiler`: phases and per-file work are timed.
+    - `assets`: attachments are written once per distinct content under
+      hashed names, and fragments reference those.
+    - `links`: wikilinks render as links to the notes they name.
+    - `deltas`: the manifest is hashed and deltas from earlier manifests are
+      published alongside it.
+    - `slim_scenes`: Excalidraw scenes are written in minimal form, their
+      embedded images moved out to hashed assets.
+    - `packs`: each directory's fragments are also bundled into packs.
+    - `previews`: notes' previews are collected while they render and stored
+      on their manifest nodes.
+    - `minify`: fragments are minified before they are written.
     """
     source_root: Path
     output_root: Path
+    state: Optional["BuildState"] = None
+    plan: Optional["BuildPlan"] = None
+    index: Optional["VaultIndex"] = None
+    copy_mode: str = COPY_MODE_COPY
+    copy_stats: "CopyStats" = field(default_factory=lambda: CopyStats())
+    manifest_version: int = DEFAULT_MANIFEST_VERSION
+    search: Optional["SearchIndex"] = None
+    images: Optional["ImagePipeline"] = None
+    profiler: Optional["Profiler"] = None
+    assets: Optional["AssetStore"] = None
+    links: Optional["LinkIndex"] = None
+    deltas: Optional["ManifestDeltas"] = None
+    slim_scenes: bool = False
+    packs: Optional["FragmentPacks"] = None
+    previews: bool = False
+    minify: bool = False
+
+
+class DirectoryEntry(NamedTuple):
+    """A single child of a directory, as listed by the file system or the index."""
+    path: Path
+    is_dir: bool
+    is_file: bool
+
+
+@dataclass
+class BuildPlan:
+    """
+    The work collected by a planning pass over the vault.
+
+    Each entry pairs an absolute source path with the absolute destination it
+    must be written to. `trees` holds whole directories to be copied.
+    """
+    notes: List[Tuple[Path, Path]] = field(default_factory=list)
+    copies: List[Tuple[Path, Path]] = field(default_factory=list)
+    trees: List[Tuple[Path, Path]] = field(default_factory=list)
+
+
+@dataclass
+class CopyStats:
+    """
+    Per-build tallies of how attachments reached the output directory.
+
+    Both dictionaries are keyed by the action taken for a file ("copied",
+    "skipped", "linked", "cloned" or "slimmed").
+    """
+    files: Dict[str, int] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, action: str, size: int) -> None:
+        """Adds one file of `size` bytes to the tally for `action`."""
+        self.files[action] = self.files.get(action, 0) + 1
+        self.bytes[action] = self.bytes.get(action, 0) + size
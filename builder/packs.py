@@ -0,0 +1,144 @@
+"""
+This file bundles each directory's HTML fragments into packs.
+
+The client fetches every fragment on its own, so browsing a directory costs
+one round trip per note. With `--packs`, the build also writes, for each
+directory, its README's fragment and those of its notes concatenated into
+one file in `_packs/`, and the manifest says where each fragment sits in it:
+the directory node gets `packs`, a list of pack paths, and its readme and
+each file node get `pack`, a `[pack number, byte offset, byte length]`
+triple. `notes/content-store.js` fetches a directory's pack once and fills
+its fragment cache from it, so opening the directory's notes afterwards
+costs no further request.
+
+A pack holds at most `max_size` bytes; a directory with more is split into
+several packs, in listing order. Fragments larger than `max_fragment` are
+left out and fetched on their own, as is a fragment that would be alone in
+its pack. The fragment files themselves are still written, for clients that
+ignore packs.
+
+Packs are named after the hashes and sizes of the fragments they hold, so an
+unchanged pack is not written again and can be cached forever; packs no
+directory uses any more are deleted.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from .constants import DEFAULT_PACK_MAX_FRAGMENT, DEFAULT_PACK_MAX_SIZE, PACKS_DIR_NAME
+from .deltas import fragment_hasher
+from .models import BuildContext
+
+
+@dataclass
+class PackStats:
+    """What one `FragmentPacks.attach` call did."""
+    packs: int = 0
+    fragments: int = 0
+    bytes: int = 0
+    written: int = 0
+    removed: int = 0
+
+
+@dataclass
+class FragmentPacks:
+    """
+    Packs each directory's fragments into files of at most `max_size` bytes,
+    leaving out fragments of more than `max_fragment` bytes. `stats` holds
+    the results of the latest `attach`.
+    """
+    max_size: int = DEFAULT_PACK_MAX_SIZE
+    max_fragment: int = DEFAULT_PACK_MAX_FRAGMENT
+    stats: PackStats = field(default_factory=PackStats)
+
+    def attach(self, ctx: BuildContext, manifest_root: Dict) -> PackStats:
+        """
+        Writes the packs of every directory and records them on the manifest
+        nodes, replacing any recorded by an earlier call.
+
+        Args:
+            ctx: The build context.
+            manifest_root: The version 1 manifest node of the vault root.
+
+        Returns:
+            What was packed, written and removed.
+        """
+        stats = PackStats()
+        digest = fragment_hasher(ctx)
+        directory = ctx.output_root / PACKS_DIR_NAME
+        used: Set[str] = set()
+
+        pending = [manifest_root]
+        while pending:
+            node = pending.pop()
+            pending.extend(node["directories"])
+            members = [node["readme"], *node["files"]]
+            node.pop("packs", None)
+            for member in members:
+                member.pop("pack", None)
+
+            packs: List[str] = []
+            for group in self.split([(member, (ctx.output_root / member["html"]).stat().st_size) for member in members]):
+                fingerprint = "".join(f"{digest(member['html'])}{size:x}." for member, size in group)
+                name = f"{hashlib.sha1(fingerprint.encode('ascii')).hexdigest()[:16]}.html"
+                path = directory / name
+                if not path.exists():
+                    write_pack(ctx, path, [member["html"] for member, _ in group])
+                    stats.written += 1
+                used.add(name)
+
+                offset = 0
+                for member, size in group:
+                    member["pack"] = [len(packs), offset, size]
+                    offset += size
+                packs.append(f"{PACKS_DIR_NAME}/{name}")
+                stats.packs += 1
+                stats.fragments += len(group)
+                stats.bytes += offset
+            if packs:
+                node["packs"] = packs
+
+        if directory.is_dir():
+            for path in directory.iterdir():
+                # Compressed variants (`.html.gz`) share their pack's name.
+                if path.name.partition(".")[0] + ".html" not in used:
+                    path.unlink()
+                    stats.removed += 1
+        self.stats = stats
+        return stats
+
+    def split(self, members: List[Tuple[Dict, int]]) -> List[List[Tuple[Dict, int]]]:
+        """
+        Splits a directory's fragments into packs.
+
+        Args:
+            members: The readme and file nodes, in listing order, with the
+                sizes of their fragments.
+
+        Returns:
+            The groups of nodes to pack together; each has at least two.
+        """
+        groups: List[List[Tuple[Dict, int]]] = [[]]
+        size = 0
+        for member in members:
+            if member[1] > self.max_fragment:
+                continue
+            if groups[-1] and size + member[1] > self.max_size:
+                groups.append([])
+                size = 0
+            groups[-1].append(member)
+            size += member[1]
+        return [group for group in groups if len(group) > 1]
+
+
+def write_pack(ctx: BuildContext, path: Path, fragments: List[str]) -> None:
+    """Concatenates fragments into a pack, through a temporary file and a rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with temporary.open("wb") as handle:
+        for fragment in fragments:
+            handle.write((ctx.output_root / fragment).read_bytes())
+    os.replace(temporary, path)
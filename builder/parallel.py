@@ -0,0 +1,107 @@
+"""
+This file executes a build plan across several CPU cores.
+
+The manifest traversal in `build_directory` is cheap; rendering notes and
+copying attachments is where a large vault spends its time. When a build plan
+is attached to the context, the traversal only queues that work. This module
+then renders and writes the queued notes in a process pool while a thread
+pool copies attachments, and finally records the results in the build state
+in the same order a serial build would have.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .file_system import SKIPPED, profiled_copy, profiled_tree
+from .links import Links
+from .manifest import record_rendered_note, write_markdown_fragment
+from .models import BuildContext, BuildPlan
+from .previews import Preview, new_preview
+from .profile import ProfileData
+from .search import Postings
+
+# Notes are handed to worker processes in batches to amortise pickling.
+NOTES_PER_TASK = 16
+
+# The build context of a worker process, set by `init_worker`.
+_worker_ctx: Optional[BuildContext] = None
+_worker_collects_terms = False
+
+
+def run_plan(ctx: BuildContext, plan: BuildPlan, jobs: int) -> None:
+    """
+    Performs all the work queued on a build plan.
+
+    Args:
+        ctx: The build context the plan was collected with.
+        plan: The queued note renders, file copies and directory copies.
+        jobs: The number of worker processes (and copy threads) to use.
+    """
+    # Workers need the paths and the vault index; the build and search state
+    # stay in this process. The context is sent once per worker, not per task.
+    # Workers profile into their own profiler and send the spans back.
+    worker_ctx = replace(ctx, state=None, plan=None, search=None,
+                         profiler=ctx.profiler.for_worker() if ctx.profiler is not None else None)
+    batches = [plan.notes[start:start + NOTES_PER_TASK] for start in range(0, len(plan.notes), NOTES_PER_TASK)]
+    # With an asset store, duplicate attachments queue the same blob; it is
+    # written once.
+    copies: Dict[Path, Path] = {}
+    for source, destination in plan.copies:
+        if destination in copies:
+            ctx.copy_stats.record(SKIPPED, source.stat().st_size)
+        else:
+            copies[destination] = source
+
+    with ThreadPoolExecutor(max_workers=jobs) as copier:
+        tree_futures = [copier.submit(profiled_tree, ctx, source, destination) for source, destination in plan.trees]
+        copy_futures = [copier.submit(profiled_copy, ctx, source, destination) for destination, source in copies.items()]
+
+        rendered: List[Tuple[Path, Path, Dict[str, Optional[Path]], Optional[Postings], Links, Optional[Preview]]] = []
+        if batches:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(worker_ctx, ctx.search is not None)) as renderer:
+                for results, profile in renderer.map(render_batch, batches):
+                    rendered.extend(results)
+                    if profile is not None:
+                        ctx.profiler.merge(profile)
+
+        for future in tree_futures:
+            for result in future.result():
+                ctx.copy_stats.record(*result)
+        for future in copy_futures:
+            ctx.copy_stats.record(*future.result())
+
+    for source, destination, references, terms, links, preview in rendered:
+        record_rendered_note(ctx, source, destination, references, terms, links, preview)
+
+
+def init_worker(ctx: BuildContext, collects_terms: bool) -> None:
+    """Stores the build context, and whether to tokenize notes, in a freshly started worker process."""
+    global _worker_ctx, _worker_collects_terms
+    _worker_ctx = ctx
+    _worker_collects_terms = collects_terms
+
+
+def render_batch(notes: List[Tuple[Path, Path]]) -> Tuple[List[Tuple[Path, Path, Dict[str, Optional[Path]], Optional[Postings], Links, Optional[Preview]]], Optional[ProfileData]]:
+    """
+    Renders and writes a batch of notes inside a worker process.
+
+    Args:
+        notes: (source, destination) pairs to render.
+
+    Returns:
+        (source, destination, references, terms, links, preview) for each
+        note, in input order, and what the worker's profiler recorded for the
+        batch. Terms are None unless the build has a search index, the
+        preview is None unless previews are collected, and the profile is
+        None unless the build is profiled.
+    """
+    results = []
+    for source, destination in notes:
+        terms: Optional[Postings] = {} if _worker_collects_terms else None
+        links: Links = {}
+        preview: Optional[Preview] = new_preview() if _worker_ctx.previews else None
+        references = write_markdown_fragment(_worker_ctx, source, destination, terms, links, preview)
+        results.append((source, destination, references, terms, links, preview))
+    return results, _worker_ctx.profiler.drain() if _worker_ctx.profiler is not None else None
@@ -0,0 +1,138 @@
+"""
+This file builds the note previews stored on manifest nodes.
+
+A directory listing only had each note's title; showing more meant fetching
+every child's fragment. With `--previews`, `render_markdown` also collects a
+small preview of each note while it renders it, and the manifest carries it
+on the note's file node (and on a directory's `readme`) as `preview`:
+
+- `excerpt`: the note's first paragraph as plain text, wikilinks replaced by
+  their labels and markup removed, cut to `PREVIEW_EXCERPT_LENGTH` characters;
+- `outline`: the note's first `PREVIEW_OUTLINE_LENGTH` headings, as
+  `[level, text]` pairs;
+- `words`: the number of words in its headings and paragraphs;
+- `image`: the output-relative path of its first embedded image, as
+  `normalise_image_src` resolved it (Excalidraw scenes are not images), if
+  there is one.
+
+The node also gets `htmlHash`, the content hash of its fragment (as with
+`--manifest-deltas`), so a client can tell when a cached fragment is stale.
+The hash is computed from the fragment in memory when it is written.
+
+Previews are kept in the build state with each note's record, so a note
+that is not rendered again keeps its preview; without a build state, nodes
+get none.
+"""
+
+import hashlib
+import html
+import posixpath
+import re
+from typing import Any, Dict, List, Optional
+
+from .constants import PREVIEW_EXCERPT_LENGTH, PREVIEW_OUTLINE_LENGTH
+from .links import WIKILINK_PATTERN
+from .models import BuildContext
+
+Preview = Dict[str, Any]
+
+TAG_PATTERN = re.compile(r"<[^<>]*>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def new_preview() -> Preview:
+    """Returns an empty preview for `render_markdown` to fill."""
+    return {"excerpt": "", "outline": [], "words": 0}
+
+
+def add_heading(preview: Preview, level: int, text: str) -> None:
+    """Adds a heading to a preview's outline and word count."""
+    if len(preview["outline"]) < PREVIEW_OUTLINE_LENGTH:
+        preview["outline"].append([level, text])
+    preview["words"] += len(text.split())
+
+
+def add_paragraph(preview: Preview, line: str) -> None:
+    """Adds a paragraph line to a preview's word count, and makes the first one its excerpt."""
+    text = plain_text(line)
+    preview["words"] += len(text.split())
+    if not preview["excerpt"] and text:
+        preview["excerpt"] = truncate(text, PREVIEW_EXCERPT_LENGTH)
+
+
+def add_image(preview: Preview, src: str, relative_dir: str) -> None:
+    """
+    Records an image embed as the preview's image, unless one was found before.
+
+    Args:
+        preview: The preview to update.
+        src: The fragment-relative src of the image.
+        relative_dir: The note's directory relative to the vault (and output) root.
+    """
+    if "image" in preview:
+        return
+    if src.startswith("/") or ":" in src.split("/", 1)[0]:
+        preview["image"] = src  # An absolute path or URL.
+    else:
+        preview["image"] = posixpath.normpath(posixpath.join(relative_dir, src))
+
+
+def finish_preview(preview: Preview, fragment: str) -> None:
+    """Stores the content hash of the note's rendered fragment in its preview."""
+    preview["hash"] = hashlib.sha1(fragment.encode("utf-8")).hexdigest()[:16]
+
+
+def plain_text(line: str) -> str:
+    """Reduces a paragraph line to its text: wikilinks become their labels, tags are removed and entities decoded."""
+    def label(match: "re.Match[str]") -> str:
+        # The label `markdown.NoteRenderer.render_link` shows.
+        target, _, alias = match.group(1).partition("|")
+        page, _, heading = target.partition("#")
+        page, heading = page.strip(), heading.strip()
+        return alias.strip() or (f"{page} > {heading}" if page and heading else page or heading)
+
+    text = html.unescape(TAG_PATTERN.sub("", WIKILINK_PATTERN.sub(label, line)))
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def truncate(text: str, length: int) -> str:
+    """Cuts text to at most `length` characters at a word boundary, marking the cut with an ellipsis."""
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    space = cut.rfind(" ")
+    if space > length // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def attach_previews(ctx: BuildContext, manifest_root: Dict) -> None:
+    """
+    Stores each note's preview, and its fragment's `htmlHash`, on its
+    manifest node.
+
+    Args:
+        ctx: The build context.
+        manifest_root: The version 1 manifest node of the vault root.
+    """
+    if ctx.state is None:
+        return
+    previews: Dict[str, Optional[Preview]] = {
+        output: record.preview
+        for record in ctx.state.current.values()
+        for output in record.outputs
+        if output.endswith(".html")
+    }
+
+    pending = [manifest_root]
+    while pending:
+        node = pending.pop()
+        pending.extend(node["directories"])
+        members: List[Dict] = [node["readme"], *node["files"]]
+        for member in members:
+            preview = previews.get(member["html"])
+            if preview is None:
+                member.pop("preview", None)
+                continue
+            member["preview"] = {key: value for key, value in preview.items() if key != "hash"}
+            member["htmlHash"] = preview["hash"]
@@ -0,0 +1,182 @@
+"""
+This file rewrites Excalidraw scenes in minimal form for the output.
+
+Attachments are normally copied byte for byte, but a `.excalidraw` file keeps
+everything the editor needs and the viewer does not: deleted elements, each
+element's edit history (`version`, `versionNonce`, `updated`), editor state
+such as the current tool and colours, and every pasted image as a base64 data
+URL in `files`, including images no element shows any more. The same
+screenshot pasted into several diagrams is carried by each of them.
+
+With `--slim-scenes`, every scene the build copies is written as compact JSON
+without any of that. Embedded images are decoded and stored once per distinct
+content as `_assets/<hash>.<ext>`, the same naming as `asset_store.py`, so a
+screenshot shared by several diagrams (or also present in the vault) is a
+single file. Each entry of `files` keeps its metadata and gets a `src` with
+the blob's path relative to the scene instead of its `dataURL`, which
+`utils/excalidraw.js` fetches before handing the scene to the viewer.
+
+The vault is never written to: the slimmed scene replaces the output file,
+and the pre-rendered SVG previews (see excalidraw.py) are still rendered
+from the original.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .constants import ASSETS_DIR_NAME
+from .models import BuildContext
+from .utils import posix_relpath
+
+SCENE_SUFFIX = ".excalidraw"
+# Per-element fields only the editor's undo history and collaboration use.
+HISTORY_KEYS = {"version", "versionNonce", "updated"}
+# Top-level fields written by the editor or the Obsidian plugin for themselves.
+EDITOR_KEYS = {"source", "prevTextMode"}
+# The only parts of the editor state the read-only viewer shows.
+VIEWER_APP_STATE_KEYS = ("viewBackgroundColor", "theme", "gridSize")
+# File metadata the viewer does not read.
+FILE_METADATA_KEYS = {"lastRetrieved"}
+IMAGE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/svg+xml": ".svg",
+    "image/avif": ".avif",
+}
+DATA_URL_PATTERN = re.compile(r"data:([\w.+-]+/[\w.+-]+);base64,(.*)", re.DOTALL)
+
+
+@dataclass
+class SlimScene:
+    """
+    A scene rewritten for the output.
+
+    `text` is the scene's compact JSON. `blobs` maps the output-relative path
+    of every embedded image moved out of it to the image's bytes.
+    """
+    text: str
+    blobs: Dict[str, bytes] = field(default_factory=dict)
+
+
+def is_scene(path: Path) -> bool:
+    """Checks whether a file is an Excalidraw scene."""
+    return path.suffix.lower() == SCENE_SUFFIX
+
+
+def slim_scene(scene: Dict, relative_dir: Path) -> SlimScene:
+    """
+    Strips a scene down to what the viewer draws.
+
+    Deleted elements and the history fields of the others are dropped, as
+    are files no remaining image element uses. Images embedded as base64
+    data URLs of a known type become blobs; any other file is kept as is.
+
+    Args:
+        scene: The parsed `.excalidraw` JSON.
+        relative_dir: The output-relative directory the scene is written to,
+            which the blobs' `src` paths are relative to.
+
+    Returns:
+        The slimmed scene.
+    """
+    elements = [
+        {key: value for key, value in element.items() if key not in HISTORY_KEYS}
+        for element in scene.get("elements") or []
+        if isinstance(element, dict) and not element.get("isDeleted")
+    ]
+    used = {element.get("fileId") for element in elements if element.get("type") == "image"}
+
+    blobs: Dict[str, bytes] = {}
+    files: Dict[str, Dict] = {}
+    for file_id, entry in (scene.get("files") or {}).items():
+        if file_id not in used or not isinstance(entry, dict):
+            continue
+        entry = {key: value for key, value in entry.items() if key not in FILE_METADATA_KEYS}
+        extracted = extract_image(entry.get("dataURL"))
+        if extracted is not None:
+            blob, data = extracted
+            blobs[blob] = data
+            del entry["dataURL"]
+            entry["src"] = posix_relpath(Path(blob), relative_dir)
+        files[file_id] = entry
+
+    slimmed = {key: value for key, value in scene.items() if key not in EDITOR_KEYS}
+    slimmed["elements"] = elements
+    app_state = scene.get("appState") or {}
+    slimmed["appState"] = {key: app_state[key] for key in VIEWER_APP_STATE_KEYS if key in app_state}
+    slimmed["files"] = files
+    return SlimScene(json.dumps(slimmed, ensure_ascii=False, separators=(",", ":")), blobs)
+
+
+def extract_image(data_url: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """
+    Decodes an image data URL into a blob.
+
+    Args:
+        data_url: A file's `dataURL`.
+
+    Returns:
+        The blob's output-relative path, named after the SHA-1 of the image
+        bytes, and those bytes; or None if the value is not a base64 data URL
+        of a known image type.
+    """
+    match = DATA_URL_PATTERN.fullmatch(data_url) if isinstance(data_url, str) else None
+    if match is None or match.group(1).lower() not in IMAGE_EXTENSIONS:
+        return None
+    try:
+        data = base64.b64decode(match.group(2), validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    digest = hashlib.sha1(data).hexdigest()
+    return f"{ASSETS_DIR_NAME}/{digest[:16]}{IMAGE_EXTENSIONS[match.group(1).lower()]}", data
+
+
+def write_slim_scene(ctx: BuildContext, source: Path, destination: Path) -> Optional[SlimScene]:
+    """
+    Writes the slimmed form of a scene, and any of its blobs not yet present.
+
+    Both are written to a temporary file and renamed into place, so a
+    hardlinked copy from an earlier build is replaced rather than written
+    through to the vault.
+
+    Args:
+        ctx: The build context.
+        source: The `.excalidraw` file in the vault.
+        destination: The absolute path to write the scene to.
+
+    Returns:
+        The slimmed scene, or None if the file is not a readable scene (the
+        caller then copies it unchanged).
+    """
+    try:
+        scene = json.loads(source.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(scene, dict):
+        return None
+    slimmed = slim_scene(scene, destination.parent.relative_to(ctx.output_root))
+
+    for blob, data in slimmed.blobs.items():
+        path = ctx.output_root / blob
+        # A blob is named after its content, so an existing one is already right.
+        if not path.exists():
+            replace_file(path, data)
+    replace_file(destination, slimmed.text.encode("utf-8"))
+    return slimmed
+
+
+def replace_file(path: Path, data: bytes) -> None:
+    """Writes `data` to `path` through a temporary file and an atomic rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
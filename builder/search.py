@@ -0,0 +1,208 @@
+"""
+This file builds the full-text search index for the Notes tab.
+
+While a note is rendered, the text of its headings and paragraphs is split
+into terms and each term's frequency is counted (see `add_terms`). After the
+manifest is written, the postings of every note in the manifest are merged
+into an inverted index: term -> [note id, frequency, note id, frequency, ...].
+The index is split into shards by the first characters of each term, so the
+browser only downloads the shard a query term falls into, plus a small
+`index.json` listing the notes and shards. Both are written to `_search/`;
+the underscore keeps it apart from a vault directory named `search`, whose
+copied files the stale-shard cleanup would otherwise delete.
+
+Postings are cached per note in the output directory, so an incremental build
+only tokenizes the notes it re-renders, and a shard file is only rewritten
+when its contents change.
+"""
+
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from .constants import SEARCH_CACHE_FILENAME, SEARCH_DIR_NAME, SEARCH_INDEX_FILENAME, SEARCH_SHARD_PREFIX_LENGTH
+
+SEARCH_VERSION = 1
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+MIN_TERM_LENGTH = 2
+
+# A note's terms mapped to the number of times they occur.
+Postings = Dict[str, int]
+
+
+@dataclass
+class SearchStats:
+    """What one `SearchIndex.write` produced."""
+    notes: int
+    terms: int
+    shards: int
+    shards_written: int
+    bytes: int
+
+
+def add_terms(postings: Postings, text: str) -> None:
+    """
+    Tokenizes text and adds its term counts to a note's postings.
+
+    Terms are lowercased runs of letters and digits; terms shorter than
+    `MIN_TERM_LENGTH` are not recorded. Tokenizing a note's text in one call
+    is much faster than line by line.
+
+    Args:
+        postings: The note's postings, updated in place.
+        text: The text to tokenize.
+    """
+    counts = Counter(TOKEN_PATTERN.findall(text.lower()))
+    for term, count in counts.items():
+        if len(term) >= MIN_TERM_LENGTH:
+            postings[term] = postings.get(term, 0) + count
+
+
+class SearchIndex:
+    """
+    The per-note postings of the current build, keyed by the output-relative
+    path of each note's HTML fragment and stored with the content digest of
+    the note they were collected from.
+
+    Entries loaded from the cache stay until the note is rendered again, and
+    entries of notes that are no longer in the manifest are dropped by `write`.
+    """
+
+    def __init__(self, output_root: Path, notes: Dict[str, Tuple[str, Postings]]) -> None:
+        self.output_root = output_root
+        self.notes = notes
+
+    @classmethod
+    def load(cls, output_root: Path) -> "SearchIndex":
+        """
+        Reads the postings cache from an output directory.
+
+        A missing, unreadable or outdated cache yields an empty index, so every
+        note is rendered (and tokenized) again.
+        """
+        try:
+            data = json.loads((output_root / SEARCH_CACHE_FILENAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(output_root, {})
+        if not isinstance(data, dict) or data.get("version") != SEARCH_VERSION:
+            return cls(output_root, {})
+        return cls(output_root, {fragment: (digest, postings) for fragment, (digest, postings) in data.get("notes", {}).items()})
+
+    def has(self, fragment: str, digest: str) -> bool:
+        """Whether postings are known for a note's fragment and current content."""
+        entry = self.notes.get(fragment)
+        return entry is not None and entry[0] == digest
+
+    def record(self, fragment: str, digest: str, postings: Postings) -> None:
+        """Stores the postings of a freshly rendered note."""
+        self.notes[fragment] = (digest, postings)
+
+    def postings(self, fragment: str) -> Postings:
+        """Returns a note's postings, or none if it was never tokenized."""
+        entry = self.notes.get(fragment)
+        return entry[1] if entry is not None else {}
+
+    def write(self, manifest_root: Dict) -> SearchStats:
+        """
+        Writes the search index for the notes in a manifest tree and saves the
+        postings cache.
+
+        Notes get ids in manifest order. `index.json` lists, per id, the note's
+        slug path, title and length in terms, and maps each shard prefix to its
+        file. Stale shard files are deleted.
+
+        Args:
+            manifest_root: The manifest node of the vault root.
+
+        Returns:
+            Counts and sizes of what was written.
+        """
+        documents = list(iter_documents(manifest_root))
+        self.notes = {fragment: self.notes[fragment] for fragment, _, _ in documents if fragment in self.notes}
+
+        inverted: Dict[str, List[int]] = {}
+        for note_id, (fragment, _, _) in enumerate(documents):
+            for term, count in self.postings(fragment).items():
+                postings = inverted.get(term)
+                if postings is None:
+                    inverted[term] = [note_id, count]
+                else:
+                    postings += (note_id, count)
+
+        shards: Dict[str, Dict[str, List[int]]] = {}
+        for term in sorted(inverted):
+            shards.setdefault(term[:SEARCH_SHARD_PREFIX_LENGTH], {})[term] = inverted[term]
+
+        search_dir = self.output_root / SEARCH_DIR_NAME
+        search_dir.mkdir(parents=True, exist_ok=True)
+        shard_files: Dict[str, str] = {}
+        written = 0
+        size = 0
+        for prefix, shard in sorted(shards.items()):
+            filename = shard_filename(prefix)
+            shard_files[prefix] = filename
+            payload = json.dumps(shard, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            written += write_if_changed(search_dir / filename, payload)
+            size += len(payload)
+
+        index = {
+            "version": SEARCH_VERSION,
+            "prefixLength": SEARCH_SHARD_PREFIX_LENGTH,
+            "minTermLength": MIN_TERM_LENGTH,
+            "notes": [
+                [slug_path, title, sum(self.postings(fragment).values())]
+                for fragment, slug_path, title in documents
+            ],
+            "shards": shard_files,
+        }
+        payload = json.dumps(index, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        write_if_changed(search_dir / SEARCH_INDEX_FILENAME, payload)
+        size += len(payload)
+
+        keep = set(shard_files.values()) | {SEARCH_INDEX_FILENAME}
+        for path in search_dir.iterdir():
+            if path.is_file() and path.suffix == ".json" and path.name not in keep:
+                path.unlink()
+
+        self.save()
+        return SearchStats(notes=len(documents), terms=len(inverted), shards=len(shard_files), shards_written=written, bytes=size)
+
+    def save(self) -> None:
+        """Writes the postings cache to the output directory."""
+        data = {"version": SEARCH_VERSION, "notes": self.notes}
+        (self.output_root / SEARCH_CACHE_FILENAME).write_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+
+
+def iter_documents(manifest_root: Dict) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yields (fragment, slug path, title) for every note in a manifest tree,
+    depth first: a directory's README and files, then its subdirectories.
+    """
+    pending = [manifest_root]
+    while pending:
+        node = pending.pop()
+        yield node["readme"]["html"], node["slugPath"], node["title"]
+        pending.extend(reversed(node["directories"]))
+        for child in node["files"]:
+            yield child["html"], child["slugPath"], child["title"]
+
+
+def shard_filename(prefix: str) -> str:
+    """Returns the file name of a shard; non-ASCII prefixes are hex encoded."""
+    if prefix.isascii():
+        return f"{prefix}.json"
+    return f"x{prefix.encode('utf-8').hex()}.json"
+
+
+def write_if_changed(path: Path, payload: bytes) -> bool:
+    """Writes bytes to a file unless it already holds exactly them."""
+    try:
+        if path.read_bytes() == payload:
+            return False
+    except OSError:
+        pass
+    path.write_bytes(payload)
+    return True
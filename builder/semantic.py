@@ -0,0 +1,230 @@
+"""
+This file answers semantic queries against the note embedding store and
+exports it for the browser.
+
+`SemanticIndex` normalises the embedding matrix once, so cosine similarity is
+a plain dot product, and answers a whole batch of queries with one matrix
+multiply followed by `argpartition`, which finds the top k of each row without
+sorting all of them. The build uses it to find each note's related notes.
+
+For the SPA, `export_semantic` writes the vectors as int8 codes with one
+float32 scale per row, split into chunks the browser can fetch and score one
+at a time (see `notes/semantic.js`), at a quarter of the float32 size.
+`QuantizedIndex` scores those codes the same way the browser does, so the
+recall lost to quantization can be measured.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .constants import SEMANTIC_DIR_NAME, SEMANTIC_INDEX_FILENAME
+from .embeddings import EmbeddingStore, np
+from .models import BuildContext
+from .search import iter_documents, write_if_changed
+
+SEMANTIC_VERSION = 1
+# Rows per exported chunk; 1,024 rows of 384 dimensions is about 390 KB.
+CHUNK_ROWS = 1024
+# Queries scored per matrix multiply, which bounds the (queries x notes) scores.
+QUERY_BATCH = 256
+
+
+def normalise_rows(matrix: "np.ndarray") -> "np.ndarray":
+    """Returns a float32 copy of a matrix with every non-zero row scaled to unit length."""
+    matrix = np.array(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def top_k(scores: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Selects the k highest scores of each row, best first.
+
+    Args:
+        scores: A (queries, candidates) matrix.
+        k: How many candidates to keep per query.
+
+    Returns:
+        The (queries, k) candidate indices and their scores.
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    selected = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-selected, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(selected, order, axis=1)
+
+
+class SemanticIndex:
+    """
+    Exact cosine top-k search over a float32 embedding matrix.
+
+    Rows are normalised once, when the index is created.
+    """
+
+    def __init__(self, keys: List[str], vectors: "np.ndarray") -> None:
+        self.keys = keys
+        self.matrix = normalise_rows(vectors)
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore) -> "SemanticIndex":
+        """Builds an index over every vector in an embedding store."""
+        return cls(store.keys, store.vectors)
+
+    def query(self, queries: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Finds the k most similar notes for each query vector.
+
+        Args:
+            queries: A (queries, dimension) matrix, or a single vector.
+            k: How many notes to return per query.
+
+        Returns:
+            The (queries, k) row indices and cosine similarities, best first.
+        """
+        queries = normalise_rows(np.atleast_2d(queries))
+        indices: List["np.ndarray"] = []
+        scores: List["np.ndarray"] = []
+        for start in range(0, len(queries), QUERY_BATCH):
+            batch_indices, batch_scores = top_k(queries[start:start + QUERY_BATCH] @ self.matrix.T, k)
+            indices.append(batch_indices)
+            scores.append(batch_scores)
+        if not indices:
+            return np.empty((0, k), dtype=np.intp), np.empty((0, k), dtype=np.float32)
+        return np.concatenate(indices), np.concatenate(scores)
+
+    def related(self, k: int) -> "np.ndarray":
+        """
+        Finds the k most similar other notes of every note.
+
+        Returns:
+            A (notes, k) matrix of row indices, best first.
+        """
+        # One extra candidate, since every note is most similar to itself.
+        k = min(k, len(self.keys) - 1)
+        if k <= 0:
+            return np.empty((len(self.keys), 0), dtype=np.intp)
+        indices, _ = self.query(self.matrix, k + 1)
+        # Move each note's own row to the end (a stable sort keeps the rest in
+        # order); if duplicates pushed it out, the last candidate is dropped.
+        is_own = indices == np.arange(len(self.keys))[:, None]
+        order = np.argsort(is_own, axis=1, kind="stable")
+        return np.take_along_axis(indices, order, axis=1)[:, :k]
+
+
+def quantize_rows(matrix: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Quantizes each row symmetrically to int8.
+
+    Returns:
+        The int8 codes and the float32 per-row scales; `codes * scales[:, None]`
+        approximates `matrix`.
+    """
+    peaks = np.abs(matrix).max(axis=1)
+    scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class QuantizedIndex:
+    """
+    Top-k search over int8-quantized rows, scored chunk by chunk exactly as
+    the browser scores the exported shards.
+    """
+
+    def __init__(self, matrix: "np.ndarray", chunk_rows: int = CHUNK_ROWS) -> None:
+        self.codes, self.scales = quantize_rows(normalise_rows(matrix))
+        self.chunk_rows = chunk_rows
+
+    def query(self, queries: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Finds the approximate k most similar rows for each query vector."""
+        queries = normalise_rows(np.atleast_2d(queries))
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_rows):
+            codes = self.codes[start:start + self.chunk_rows].astype(np.float32)
+            scores[:, start:start + len(codes)] = (queries @ codes.T) * self.scales[start:start + len(codes)]
+        return top_k(scores, k)
+
+
+@dataclass
+class SemanticExport:
+    """What one `export_semantic` call wrote."""
+    notes: int
+    chunks: int
+    chunks_written: int
+    bytes: int
+
+
+def export_semantic(ctx: BuildContext, store: EmbeddingStore, manifest_root: Dict, related: int) -> SemanticExport:
+    """
+    Writes the quantized embeddings and the notes' related notes to `_semantic/`.
+
+    Only notes present in the manifest are exported, in manifest order. Each
+    chunk file holds `rows` little-endian float32 scales followed by
+    `rows * dimension` int8 codes. `index.json` lists the notes' slug paths
+    and titles, the chunks, and for each note the ids of its related notes.
+    Unchanged chunks are not rewritten and stale chunks are deleted.
+
+    Args:
+        ctx: The build context; its build state maps notes to fragments.
+        store: The embedding store of this build.
+        manifest_root: The manifest node of the vault root.
+        related: How many related notes to list per note.
+
+    Returns:
+        Counts and sizes of what was written.
+    """
+    fragments = {
+        output: key
+        for key, record in ctx.state.current.items()
+        for output in record.outputs
+        if output.endswith(".html")
+    }
+    rows = {key: row for row, key in enumerate(store.keys)}
+    notes: List[Tuple[str, str]] = []
+    selected: List[int] = []
+    for fragment, slug_path, title in iter_documents(manifest_root):
+        row: Optional[int] = rows.get(fragments.get(fragment, ""))
+        if row is not None:
+            notes.append((slug_path, title))
+            selected.append(row)
+
+    vectors = np.asarray(store.vectors)[selected] if selected else np.zeros((0, 0), dtype=np.float32)
+    index = SemanticIndex([slug_path for slug_path, _ in notes], vectors)
+    neighbours = index.related(related) if notes else np.empty((0, 0), dtype=np.intp)
+    codes, scales = quantize_rows(index.matrix) if notes else (np.zeros((0, 0), dtype=np.int8), np.zeros(0, dtype=np.float32))
+
+    directory = ctx.output_root / SEMANTIC_DIR_NAME
+    directory.mkdir(parents=True, exist_ok=True)
+    chunks: List[Dict] = []
+    written = 0
+    size = 0
+    for number, start in enumerate(range(0, len(notes), CHUNK_ROWS)):
+        filename = f"chunk-{number:04d}.bin"
+        payload = scales[start:start + CHUNK_ROWS].astype("<f4").tobytes() + codes[start:start + CHUNK_ROWS].tobytes()
+        written += write_if_changed(directory / filename, payload)
+        size += len(payload)
+        chunks.append({"file": filename, "rows": min(CHUNK_ROWS, len(notes) - start)})
+
+    manifest = {
+        "version": SEMANTIC_VERSION,
+        "model": store.model,
+        "dimension": int(codes.shape[1]) if notes else 0,
+        "notes": [list(note) for note in notes],
+        "chunks": chunks,
+        "related": neighbours.tolist(),
+    }
+    payload = json.dumps(manifest, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    write_if_changed(directory / SEMANTIC_INDEX_FILENAME, payload)
+    size += len(payload)
+
+    keep = {chunk["file"] for chunk in chunks} | {SEMANTIC_INDEX_FILENAME}
+    for path in directory.iterdir():
+        if path.is_file() and path.name not in keep:
+            path.unlink()
+    return SemanticExport(notes=len(notes), chunks=len(chunks), chunks_written=written, bytes=size)
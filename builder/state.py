@@ -0,0 +1,365 @@
+"""
+This file tracks what previous builds produced so unchanged work can be skipped.
+
+A small JSON file in the output directory records, for every source file the
+build touched, its size, modification time and content hash, the outputs it
+produced and, for Markdown notes, how each asset reference and wikilink
+resolved. The next build consults this record to re-render only the notes
+whose text or assets changed, to skip copying attachments that are already in
+place, and to delete outputs whose sources have disappeared.
+"""
+
+import copy
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .assets import resolve_asset_reference
+from .constants import BUILD_STATE_FILENAME
+from .models import BuildContext
+from .utils import posix_path
+
+STATE_VERSION = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class SourceRecord:
+    """
+    Everything remembered about a single source file between builds.
+
+    `references` maps each raw asset reference found in a note to the
+    vault-relative path and content hash it resolved to, or None if it did
+    not resolve. `links` maps each wikilink target to the vault-relative path
+    of the note it resolved to, or None. `fragment` is the content hash of a
+    note's HTML fragment once something needed it (see deltas.py).
+    `preview` is a note's manifest preview, if previews were collected (see
+    previews.py).
+    """
+    size: int
+    mtime_ns: int
+    digest: str
+    outputs: List[str] = field(default_factory=list)
+    references: Dict[str, Optional[List[str]]] = field(default_factory=dict)
+    links: Dict[str, Optional[str]] = field(default_factory=dict)
+    fragment: Optional[str] = None
+    preview: Optional[Dict] = None
+
+
+class BuildState:
+    """
+    The record of the previous build plus the one being assembled for this build.
+
+    Sources are keyed by their POSIX path relative to the vault root and
+    outputs by their POSIX path relative to the output root. `settings`
+    holds the build options that change how notes render or attachments are
+    written; it is empty when every such option has its default value.
+    """
+
+    def __init__(self, path: Path, previous: Dict[str, SourceRecord], previous_settings: Optional[Dict] = None) -> None:
+        self.path = path
+        self.previous = previous
+        self.previous_settings = previous_settings or {}
+        self.settings: Dict = {}
+        self.current: Dict[str, SourceRecord] = {}
+        self._fingerprints: Dict[str, SourceRecord] = {}
+        self.rendered = 0
+        self.reused = 0
+
+    @classmethod
+    def load(cls, output_root: Path) -> "BuildState":
+        """
+        Reads the state file from an output directory.
+
+        A missing, unreadable or outdated state file yields an empty state,
+        which makes every source look new.
+
+        Args:
+            output_root: The build's output directory.
+
+        Returns:
+            A BuildState seeded with the previous build's records.
+        """
+        path = output_root / BUILD_STATE_FILENAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path, {})
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+            return cls(path, {})
+        previous = {key: SourceRecord(**value) for key, value in data.get("sources", {}).items()}
+        return cls(path, previous, data.get("settings"))
+
+    @property
+    def has_previous(self) -> bool:
+        """Whether a usable record of an earlier build was found."""
+        return bool(self.previous)
+
+    def fingerprint(self, ctx: BuildContext, source: Path) -> SourceRecord:
+        """
+        Returns the size, mtime and content hash of a source file.
+
+        The file is only read when its size or mtime differ from the previous
+        build; otherwise the recorded hash is trusted. Results are cached for
+        the rest of the build.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the source file.
+
+        Returns:
+            A SourceRecord; only its size, mtime and digest are meaningful.
+        """
+        key = source_key(ctx, source)
+        cached = self._fingerprints.get(key)
+        if cached is not None:
+            return cached
+
+        stat = source.stat()
+        previous = self.previous.get(key)
+        if previous is not None and previous.size == stat.st_size and previous.mtime_ns == stat.st_mtime_ns:
+            digest = previous.digest
+        else:
+            digest = hash_file(source)
+
+        record = SourceRecord(size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest)
+        self._fingerprints[key] = record
+        return record
+
+    def setting_changed(self, name: str) -> bool:
+        """Checks whether a build option differs from the previous build's."""
+        return self.settings.get(name) != self.previous_settings.get(name)
+
+    def is_unchanged(self, ctx: BuildContext, source: Path, destination: Path) -> bool:
+        """
+        Checks whether a source is identical to the previous build's copy and
+        its output is still on disk.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the source file.
+            destination: The absolute path of the output produced from it.
+
+        Returns:
+            True if the output can be reused as-is.
+        """
+        previous = self.previous.get(source_key(ctx, source))
+        if previous is None or not destination.exists():
+            return False
+        return self.fingerprint(ctx, source).digest == previous.digest
+
+    def note_is_fresh(self, ctx: BuildContext, source: Path, destination: Path) -> bool:
+        """
+        Checks whether a previously rendered note can be reused.
+
+        In addition to the note's own content, every asset reference it made
+        last time must still resolve to the same file, and that file's content
+        must be unchanged, and every wikilink it made must still resolve to
+        the same note. Every note is stale if the build's rendering
+        `settings` differ from the previous build's.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the Markdown note.
+            destination: The absolute path of its HTML fragment.
+
+        Returns:
+            True if the existing fragment is up to date.
+        """
+        if self.settings != self.previous_settings or not self.is_unchanged(ctx, source, destination):
+            return False
+        note_key = source_key(ctx, source)
+        previous = self.previous[note_key]
+        for reference, recorded in previous.references.items():
+            resolved = resolve_asset_reference(ctx, source.parent, reference)
+            if self.describe_reference(ctx, resolved) != recorded:
+                return False
+        for target, recorded in previous.links.items():
+            if (ctx.links.resolve(note_key, target) if ctx.links is not None else None) != recorded:
+                return False
+        return True
+
+    def describe_reference(self, ctx: BuildContext, resolved: Optional[Path]) -> Optional[List[str]]:
+        """Converts a resolved asset path into its recorded [path, digest] form."""
+        if resolved is None:
+            return None
+        return [source_key(ctx, resolved), self.fingerprint(ctx, resolved).digest]
+
+    def record_output(self, ctx: BuildContext, source: Path, destination: Path) -> None:
+        """
+        Notes that a source produced (or kept) an output during this build.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the source file.
+            destination: The absolute path of the output file.
+        """
+        record = self._current_record(ctx, source)
+        output = posix_path(destination.relative_to(ctx.output_root))
+        if output not in record.outputs:
+            record.outputs.append(output)
+
+    def record_references(self, ctx: BuildContext, source: Path, references: Dict[str, Optional[Path]]) -> None:
+        """
+        Stores how each asset reference of a freshly rendered note resolved.
+
+        Args:
+            ctx: The build context.
+            source: The absolute path to the Markdown note.
+            references: Raw references mapped to their resolved paths.
+        """
+        record = self._current_record(ctx, source)
+        record.references = {
+            reference: self.describe_reference(ctx, resolved)
+            for reference, resolved in sorted(references.items())
+        }
+
+    def record_links(self, ctx: BuildContext, source: Path, links: Dict[str, Optional[str]]) -> None:
+        """Stores where each wikilink of a freshly rendered note resolved."""
+        self._current_record(ctx, source).links = dict(sorted(links.items()))
+
+    def carry_links(self, ctx: BuildContext, source: Path) -> Dict[str, Optional[str]]:
+        """Keeps and returns the previous build's wikilinks for a reused note."""
+        links = dict(self.previous[source_key(ctx, source)].links)
+        self._current_record(ctx, source).links = links
+        return links
+
+    def carry_fragment(self, ctx: BuildContext, source: Path) -> None:
+        """Keeps the previous build's fragment hash for a reused note."""
+        self._current_record(ctx, source).fragment = self.previous[source_key(ctx, source)].fragment
+
+    def carry_outputs(self, ctx: BuildContext, source: Path) -> None:
+        """Keeps the previous build's outputs of a reused source."""
+        for output in self.previous[source_key(ctx, source)].outputs:
+            self.record_output(ctx, source, ctx.output_root / output)
+
+    def record_preview(self, ctx: BuildContext, source: Path, preview: Dict) -> None:
+        """Stores a freshly rendered note's preview, whose hash is its fragment's."""
+        record = self._current_record(ctx, source)
+        record.preview = preview
+        record.fragment = preview["hash"]
+
+    def carry_preview(self, ctx: BuildContext, source: Path) -> None:
+        """Keeps the previous build's preview for a reused note."""
+        self._current_record(ctx, source).preview = self.previous[source_key(ctx, source)].preview
+
+    def carry_references(self, ctx: BuildContext, source: Path) -> Dict[str, Optional[List[str]]]:
+        """Keeps and returns the previous build's references for a reused note."""
+        references = dict(self.previous[source_key(ctx, source)].references)
+        self._current_record(ctx, source).references = references
+        return references
+
+    def advance(self) -> None:
+        """
+        Treats the build just recorded as the previous build.
+
+        Used by watch mode before each update: the records stay in place, but
+        cached fingerprints are dropped so edited files are hashed again, and
+        outputs that the update no longer produces can be pruned.
+        """
+        self.previous = copy.deepcopy(self.current)
+        self.previous_settings = dict(self.settings)
+        self._fingerprints = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def discard(self, ctx: BuildContext, directory: Path) -> None:
+        """
+        Forgets this build's records for every source beneath a directory, so
+        that a re-traversal of the directory starts from a clean slate.
+
+        Args:
+            ctx: The build context.
+            directory: The absolute path of the directory.
+        """
+        prefix = source_key(ctx, directory)
+        prefix = f"{prefix}/" if prefix else ""
+        for key in [key for key in self.current if key.startswith(prefix)]:
+            del self.current[key]
+            # A cached fingerprint is the discarded record itself.
+            self._fingerprints.pop(key, None)
+
+    def prune(self, ctx: BuildContext) -> List[str]:
+        """
+        Deletes outputs from the previous build that this build did not produce.
+
+        Directories left empty by the deletions are removed as well.
+
+        Args:
+            ctx: The build context.
+
+        Returns:
+            The output-relative paths that were deleted.
+        """
+        produced = {output for record in self.current.values() for output in record.outputs}
+        stale = sorted({
+            output
+            for record in self.previous.values()
+            for output in record.outputs
+            if output not in produced
+        })
+
+        removed: List[str] = []
+        for output in stale:
+            target = ctx.output_root / output
+            if target.is_file():
+                target.unlink()
+                removed.append(output)
+                remove_empty_parents(target.parent, ctx.output_root)
+        return removed
+
+    def save(self) -> None:
+        """Writes this build's records to the state file."""
+        data = {
+            "version": STATE_VERSION,
+            "settings": self.settings,
+            "sources": {key: asdict(record) for key, record in sorted(self.current.items())},
+        }
+        self.path.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+    def _current_record(self, ctx: BuildContext, source: Path) -> SourceRecord:
+        key = source_key(ctx, source)
+        record = self.current.get(key)
+        if record is None:
+            # The fingerprint itself becomes the record, so large vaults do
+            # not hold two records per source.
+            record = self.fingerprint(ctx, source)
+            self.current[key] = record
+        return record
+
+
+def source_key(ctx: BuildContext, source: Path) -> str:
+    """Returns the POSIX path of a source file relative to the vault root."""
+    return posix_path(source.relative_to(ctx.source_root))
+
+
+def hash_file(path: Path) -> str:
+    """
+    Computes the SHA-1 hex digest of a file, reading it in chunks.
+
+    Args:
+        path: The file to hash.
+
+    Returns:
+        The hex digest of the file's contents.
+    """
+    digest = hashlib.sha1()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_empty_parents(directory: Path, stop: Path) -> None:
+    """
+    Removes a directory and its ancestors while they are empty, stopping at
+    (and never removing) `stop`.
+    """
+    while directory != stop and directory.is_relative_to(stop):
+        try:
+            directory.rmdir()
+        except OSError:
+            return
+        directory = directory.parent
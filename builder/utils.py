@@ -124,3 +124,20 @@ def is_within(path: Path, ancestor: Path) -> bool:
         return True
     except ValueError:
         return False
+
+
+def format_size(size: float) -> str:
+    """
+    Formats a byte count for humans, e.g. 1536 -> "1.5 KB".
+
+    Args:
+        size: The number of bytes.
+
+    Returns:
+        The size with a binary-scaled unit.
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
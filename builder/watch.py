@@ -0,0 +1,214 @@
+"""
+This file implements watch mode: rebuilding only what changed while editing.
+
+After a normal build, the vault index, the build state and the manifest tree
+stay in memory. The watcher polls the modification times of every indexed file
+and directory (no extra dependencies, no directory listings) and reacts to
+what changed:
+
+- An edited note is re-rendered; so is every note that references an edited
+  attachment. The manifest tree is untouched.
+- An edited attachment is copied again.
+- A directory whose entries changed is listed again and the closest enclosing
+  manifest node is rebuilt in place, which re-renders nothing that is fresh.
+  Notes elsewhere are re-checked, since their references and wikilinks may
+  now resolve differently.
+
+After each update the manifest is rewritten atomically, along with the search
+index when the build has one.
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from .excalidraw import prune_previews
+from .file_system import copy_file
+from .manifest import build_directory, convert_markdown_file, write_manifest
+from .models import BuildContext
+from .state import source_key
+
+WATCH_INTERVAL_SECONDS = 0.25
+
+Snapshot = Dict[Path, Tuple[int, int]]
+
+
+class VaultWatcher:
+    """
+    Polls a vault and applies incremental updates to an in-memory build.
+
+    The context must carry a vault index and a build state describing the
+    build that produced `manifest_root`.
+    """
+
+    def __init__(self, ctx: BuildContext, manifest_root: Dict) -> None:
+        if ctx.index is None or ctx.state is None:
+            raise ValueError("Watch mode needs a build context with a vault index and a build state.")
+        self.ctx = ctx
+        self.manifest_root = manifest_root
+        self.directory_nodes: Dict[Path, Dict] = {}
+        self._index_manifest()
+        self.snapshot = self._take_snapshot()
+
+    def run(self, interval: float = WATCH_INTERVAL_SECONDS) -> None:
+        """Polls until interrupted with Ctrl+C."""
+        print(f"\nWatching {self.ctx.source_root} for changes (Ctrl+C to stop)...")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+
+    def poll(self) -> bool:
+        """
+        Checks the vault once and applies any changes found.
+
+        Returns:
+            True if anything changed and the manifest was rewritten.
+        """
+        current = self._take_snapshot()
+        changed_directories: Set[Path] = set()
+        changed_files: List[Path] = []
+        for path, previous in self.snapshot.items():
+            if current.get(path) == previous:
+                continue
+            if path in self.ctx.index.children:
+                changed_directories.add(path)
+            elif path in current:
+                changed_files.append(path)
+        if not changed_directories and not changed_files:
+            return False
+
+        started = time.perf_counter()
+        state = self.ctx.state
+        state.advance()
+        if self.ctx.images is not None:
+            self.ctx.images.prepare(self.ctx)
+
+        rebuilt_directories = self._rebuild_directories(changed_directories)
+        for path in sorted(changed_files):
+            if not _is_inside_any(path, rebuilt_directories):
+                self._refresh_file(path)
+        if rebuilt_directories:
+            # Added or removed files can change what other notes' references
+            # resolve to, so every note outside the rebuilt subtrees is checked.
+            self._recheck_notes(rebuilt_directories)
+
+        state.prune(self.ctx)
+        prune_previews(self.ctx)
+        state.save()
+        write_manifest(self.ctx, self.manifest_root)
+        if self.ctx.search is not None:
+            self.ctx.search.write(self.manifest_root)
+        self.snapshot = self._take_snapshot()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"[watch] {state.rendered} notes re-rendered, manifest updated in {elapsed_ms:.0f} ms")
+        return True
+
+    def _rebuild_directories(self, changed_directories: Set[Path]) -> List[Path]:
+        """
+        Re-lists changed directories and rebuilds the manifest nodes enclosing them.
+
+        Returns:
+            The directories whose manifest nodes were rebuilt.
+        """
+        for directory in _topmost(changed_directories):
+            self.ctx.index.rescan(directory)
+        if self.ctx.links is not None:
+            self.ctx.links.rescan(self.ctx)
+
+        targets: Set[Path] = set()
+        for directory in changed_directories:
+            relative = directory.relative_to(self.ctx.source_root)
+            while relative not in self.directory_nodes and relative != relative.parent:
+                relative = relative.parent
+            targets.add(self.ctx.source_root / relative)
+
+        rebuilt = _topmost(targets)
+        for directory in rebuilt:
+            self._rebuild_node(directory)
+        if rebuilt:
+            self._index_manifest()
+        return rebuilt
+
+    def _rebuild_node(self, directory: Path) -> None:
+        """Re-traverses one directory and swaps the result into the manifest tree."""
+        relative = directory.relative_to(self.ctx.source_root)
+        node = self.directory_nodes[relative]
+        slug_segments = node["slugPath"].split("/") if node["slugPath"] else []
+
+        self.ctx.state.discard(self.ctx, directory)
+        rebuilt = build_directory(self.ctx, directory=directory, slug_segments=slug_segments, ancestor_chain=node["breadcrumbs"])
+
+        if rebuilt is not None:
+            node.clear()
+            node.update(rebuilt)
+        elif node is self.manifest_root:
+            print("[watch] The vault root no longer has a README.md; keeping the last good manifest.")
+        else:
+            parent = self.directory_nodes[relative.parent]
+            parent["directories"] = [child for child in parent["directories"] if child is not node]
+
+    def _refresh_file(self, path: Path) -> None:
+        """Redoes the work for one edited file and for the notes that embed it."""
+        ctx = self.ctx
+        key = source_key(ctx, path)
+        record = ctx.state.current.pop(key, None)
+        if record is not None:
+            # The file is recorded afresh, with its new digest and outputs (an
+            # edited attachment's blob is renamed).
+            for output in record.outputs:
+                if output.endswith(".html"):
+                    convert_markdown_file(ctx, path)
+                else:
+                    copy_file(path, ctx, Path(output).parent)
+
+        for note_key, note_record in list(ctx.state.current.items()):
+            if any(recorded and recorded[0] == key for recorded in note_record.references.values()):
+                convert_markdown_file(ctx, ctx.source_root / note_key)
+
+    def _recheck_notes(self, skipped: List[Path]) -> None:
+        """Re-renders any note outside `skipped` whose fragment is no longer fresh."""
+        ctx = self.ctx
+        for key, record in list(ctx.state.current.items()):
+            source = ctx.source_root / key
+            if any(output.endswith(".html") for output in record.outputs) and not _is_inside_any(source, skipped):
+                convert_markdown_file(ctx, source)
+
+    def _index_manifest(self) -> None:
+        """Maps each directory in the manifest tree to its node."""
+        self.directory_nodes = {}
+        pending = [self.manifest_root]
+        while pending:
+            node = pending.pop()
+            self.directory_nodes[Path(node["readme"]["source"]).parent] = node
+            pending.extend(node["directories"])
+
+    def _take_snapshot(self) -> Snapshot:
+        """Stats every indexed directory and file."""
+        snapshot: Snapshot = {}
+        for directory, entries in self.ctx.index.children.items():
+            for path in [directory, *(entry.path for entry in entries if entry.is_file)]:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+def _is_inside_any(path: Path, directories: List[Path]) -> bool:
+    """Whether a path lies inside (or is) one of the given directories."""
+    return any(path.is_relative_to(directory) for directory in directories)
+
+
+def _topmost(directories: Set[Path]) -> List[Path]:
+    """Drops every directory that lies inside another one from the set."""
+    ordered = sorted(directories, key=lambda path: len(path.parts))
+    result: List[Path] = []
+    for directory in ordered:
+        if not _is_inside_any(directory, result):
+            result.append(directory)
+    return result
@@ -9,12 +9,18 @@ import { FAB } from './FAB.js';
 import { AttributeTable } from './AttributeTable.js';
 import { DataLayer } from './DataLayer.js';
 import { MarimoPanel } from './MarimoPanel.js';
+import { TiledDataset } from './TiledDataset.js';
+
+// Written by `python prepare_map.py modular_map/data/bnsf_rail.geojson`
+const TILED_DATA_PATH = 'data/bnsf_rail/index.json';
+const GEOJSON_DATA_PATH = 'data/bnsf_rail.geojson';
 
 class MapApplication {
     constructor() {
         this.map = null;
         this.baseLayer = null;
         this.dataLayer = null;
+        this.dataset = null; // TiledDataset, when the data was preprocessed
         this.fab = null;
         this.attributeTable = null;
         this.marimoPanel = null;
@@ -93,9 +99,18 @@ class MapApplication {
             }
         });
 
-        // Load BNSF rail data
+        // Load BNSF rail data: visible tiles if preprocessed, else the whole file
+        try {
+            this.dataset = await TiledDataset.load(TILED_DATA_PATH);
+        } catch (error) {
+            console.warn(`No preprocessed tiles (${error.message}); loading ${GEOJSON_DATA_PATH}`);
+        }
         try {
-            await this.dataLayer.loadGeoJSON('data/bnsf_rail.geojson');
+            if (this.dataset) {
+                await this.dataLayer.loadTiles(this.dataset);
+            } else {
+                await this.dataLayer.loadGeoJSON(GEOJSON_DATA_PATH);
+            }
         } catch (error) {
             console.error('Failed to load rail data:', error);
         }
@@ -148,8 +163,12 @@ class MapApplication {
         if (this.attributeTable.getIsOpen()) {
             this.attributeTable.close();
         } else {
-            // Load and display in one step
-            await this.attributeTable.loadFromFile('data/bnsf_rail.geojson');
+            // Load and display in one step; a tiled layer's properties are already loaded
+            if (this.dataset) {
+                await this.attributeTable.loadFromDataset(this.dataset);
+            } else {
+                await this.attributeTable.loadFromFile(GEOJSON_DATA_PATH);
+            }
             this.attributeTable.open();
         }
     }
@@ -0,0 +1,168 @@
+/**
+ * AttributeIndex.js - Precomputed Attribute Search Index
+ * Reads the search index written by `prepare_map.py` (search.json + search.bin)
+ * Answers substring queries per column from dictionaries and n-gram postings,
+ * so nothing has to be lowercased or concatenated when the table opens
+ */
+
+const TYPED_ARRAYS = {
+    Uint8: Uint8Array,
+    Uint16: Uint16Array,
+    Uint32: Uint32Array
+};
+
+export class AttributeIndex {
+    constructor(index, buffer) {
+        this.count = index.count;
+        this.gramLengths = index.grams;
+        this.columns = index.columns;
+        this.buffer = buffer;
+        this.gramMaps = new Map(); // "column/length" -> Map(gram -> position), built on first use
+    }
+
+    /**
+     * Load an index and its binary arrays
+     * @param {string} indexPath - Path to search.json
+     * @param {DataLoader} loader - Loader to fetch with
+     * @returns {Promise<AttributeIndex>}
+     */
+    static async load(indexPath, loader) {
+        const baseUrl = indexPath.slice(0, indexPath.lastIndexOf('/') + 1);
+        const index = await loader.loadJSON(indexPath);
+        const buffer = await loader.loadArrayBuffer(baseUrl + index.data);
+        console.log(`⚡ Loaded precomputed search index for ${Object.keys(index.columns).length} columns`);
+        return new AttributeIndex(index, buffer);
+    }
+
+    /**
+     * View an array of the binary file in place (no copy)
+     * @param {Object} entry - { type, offset, length } from search.json
+     * @returns {TypedArray}
+     */
+    view(entry) {
+        return new TYPED_ARRAYS[entry.type](this.buffer, entry.offset, entry.length);
+    }
+
+    /**
+     * Check whether every given column is indexed
+     * @param {Array<string>} columns - Column names
+     * @returns {boolean}
+     */
+    hasColumns(columns) {
+        return columns.every(column => column in this.columns);
+    }
+
+    /**
+     * Get min/max/count of the numeric columns
+     * @returns {Object} - Column name -> { min, max, count }
+     */
+    getStats() {
+        const stats = {};
+        for (const [name, column] of Object.entries(this.columns)) {
+            if (column.stats) stats[name] = column.stats;
+        }
+        return stats;
+    }
+
+    /**
+     * Find the rows where any of the columns contains the query
+     * @param {string} query - Lowercased, trimmed query
+     * @param {Array<string>} columns - Columns to search
+     * @returns {Uint8Array|null} - 1 per matching feature id, or null if the
+     *     index cannot answer (the query spans the '|' column delimiter)
+     */
+    match(query, columns) {
+        if (query.includes('|') || !this.hasColumns(columns)) return null;
+
+        const rows = new Uint8Array(this.count);
+        for (const name of columns) {
+            const values = this.matchValues(name, query);
+            if (!values) continue;
+            // One typed-array read per row; no string work
+            const codes = this.view(this.columns[name].codes);
+            for (let i = 0; i < codes.length; i++) {
+                if (values[codes[i]]) rows[i] = 1;
+            }
+        }
+        return rows;
+    }
+
+    /**
+     * Find the dictionary entries of a column that contain the query
+     * @param {string} name - Column name
+     * @param {string} query - Lowercased query
+     * @returns {Uint8Array|null} - 1 per matching entry, or null if none match
+     */
+    matchValues(name, query) {
+        const column = this.columns[name];
+        const dictionary = column.dictionary;
+        const length = Math.max(...this.gramLengths.filter(gram => gram <= query.length), 0);
+
+        let candidates;
+        if (column.categorical || !length) {
+            // Small dictionaries are cheaper to scan than to intersect
+            candidates = dictionary.keys();
+        } else {
+            candidates = this.intersectPostings(name, length, query);
+            if (!candidates) return null;
+        }
+
+        const values = new Uint8Array(dictionary.length);
+        let found = false;
+        for (const number of candidates) {
+            if (dictionary[number].includes(query)) {
+                values[number] = 1;
+                found = true;
+            }
+        }
+        return found ? values : null;
+    }
+
+    /**
+     * Intersect the postings of every gram of the query
+     * @param {string} name - Column name
+     * @param {number} length - Gram length to use
+     * @param {string} query - Lowercased query
+     * @returns {Array<number>|null} - Candidate dictionary entries, or null if a gram is absent
+     */
+    intersectPostings(name, length, query) {
+        const grams = this.columns[name].grams[length];
+        const positions = this.getGramMap(name, length, grams.keys);
+        const offsets = this.view(grams.offsets);
+        const values = this.view(grams.values);
+
+        const lists = [];
+        for (const gram of new Set(Array.from({ length: query.length - length + 1 }, (_, i) => query.slice(i, i + length)))) {
+            const position = positions.get(gram);
+            if (position === undefined) return null;
+            lists.push(values.subarray(offsets[position], offsets[position + 1]));
+        }
+
+        // Start from the rarest gram; postings are sorted, so merge
+        lists.sort((a, b) => a.length - b.length);
+        let result = Array.from(lists[0]);
+        for (let l = 1; l < lists.length && result.length; l++) {
+            const list = lists[l];
+            const next = [];
+            let j = 0;
+            for (const number of result) {
+                while (j < list.length && list[j] < number) j++;
+                if (j < list.length && list[j] === number) next.push(number);
+            }
+            result = next;
+        }
+        return result;
+    }
+
+    /**
+     * Map each gram of a column to its position (built once per column and length)
+     * @returns {Map<string, number>}
+     */
+    getGramMap(name, length, keys) {
+        const key = `${name}/${length}`;
+        if (!this.gramMaps.has(key)) {
+            this.gramMaps.set(key, new Map(keys.map((gram, position) => [gram, position])));
+        }
+        return this.gramMaps.get(key);
+    }
+}
@@ -13,6 +13,8 @@ import { DataLoader } from './DataLoader.js';
 export class AttributeTable {
     constructor(options = {}) {
         this.data = null;
+        this.dataset = null; // Set when showing a preprocessed (tiled) layer
+        this.columnStats = null; // Numeric min/max per column, from the precomputed index
         this.featureCountSpan = null;
         this.columnCountSpan = null;
         
@@ -119,6 +121,8 @@ export class AttributeTable {
     async loadFromFile(filePath) {
         try {
             this.data = await this.loader.loadGeoJSON(filePath);
+            this.search.setPrecomputedIndex(null);
+            this.columnStats = null;
             this.initializeSearch();
             this.renderTable();
             
@@ -128,6 +132,25 @@ export class AttributeTable {
         }
     }
 
+    /**
+     * Display the properties of a preprocessed layer (no geometry download)
+     * @param {TiledDataset} dataset - Layer prepared by prepare_map.py
+     */
+    async loadFromDataset(dataset) {
+        // The collection is shared with the map; search and sort reorder their own copy
+        const collection = dataset.getFeatureCollection();
+        this.data = { ...collection, features: collection.features.slice() };
+        this.dataset = dataset;
+
+        // Searching uses the index built by prepare_map.py, when there is one
+        const searchIndex = await dataset.loadSearchIndex();
+        this.search.setPrecomputedIndex(searchIndex);
+        this.columnStats = searchIndex ? searchIndex.getStats() : null;
+
+        this.initializeSearch();
+        this.renderTable();
+    }
+
     /**
      * Initialize search module with data and columns
      */
@@ -170,6 +193,7 @@ export class AttributeTable {
             totalFeatures,
             columnsToDisplay,
             columnMapping,
+            columnStats: this.columnStats,
             sortColumn: this.sortColumn,
             sortDirection: this.sortDirection,
             searchHTML: this.search.generateSearchHTML(this.escapeHtml.bind(this)),
@@ -221,6 +245,7 @@ export class AttributeTable {
             features,
             columnsToDisplay,
             columnMapping,
+            columnStats: this.columnStats,
             sortColumn: this.sortColumn,
             sortDirection: this.sortDirection
         });
@@ -301,11 +326,16 @@ export class AttributeTable {
      * @param {Object} feature - GeoJSON feature object
      */
     zoomToFeature(feature) {
-        if (!this.map || !feature || !feature.geometry) return;
+        if (!this.map || !feature) return;
         
-        // Create temporary layer for bounds calculation
-        const tempLayer = L.geoJSON(feature);
-        const bounds = tempLayer.getBounds();
+        // Features of a tiled layer carry a bbox instead of their geometry
+        let bounds;
+        if (feature.geometry) {
+            bounds = L.geoJSON(feature).getBounds();
+        } else if (this.dataset && feature.id !== undefined) {
+            bounds = this.dataset.getBounds(feature.id);
+        }
+        if (!bounds || !bounds.isValid()) return;
         
         // Zoom to feature with padding
         this.map.fitBounds(bounds, {
@@ -330,14 +360,16 @@ export class AttributeTable {
         }
         
         // Create highlight layer with distinctive styling
-        this.highlightLayer = L.geoJSON(feature, {
-            style: {
-                color: '#FFD700',      // Gold
-                weight: 6,
-                opacity: 1,
-                dashArray: '10, 10'    // Dashed line for visibility
-            }
-        }).addTo(this.map);
+        const style = {
+            color: '#FFD700',      // Gold
+            weight: 6,
+            opacity: 1,
+            dashArray: '10, 10'    // Dashed line for visibility
+        };
+        this.highlightLayer = feature.geometry
+            ? L.geoJSON(feature, { style })
+            : L.rectangle(this.dataset.getBounds(feature.id), { ...style, weight: 3, fill: false });
+        this.highlightLayer.addTo(this.map);
         
         // Auto-remove highlight after duration
         setTimeout(() => {
@@ -1,6 +1,7 @@
 /**
  * DataLayer.js - GeoJSON Data Layer Module
  * Handles loading and displaying GeoJSON data on the map
+ * Draws either a whole GeoJSON file or the visible tiles of a TiledDataset
  */
 
 export class DataLayer {
@@ -8,6 +9,12 @@ export class DataLayer {
         this.map = map;
         this.dataLayer = null;
         this.data = null;
+
+        // Tiled mode state
+        this.dataset = null;
+        this.level = null;          // Level currently drawn
+        this.drawnIds = new Set();  // Feature ids drawn at that level
+        this.updateTiles = this.updateTiles.bind(this);
         
         // Styling options
         this.defaultStyle = options.style || {
@@ -66,6 +73,76 @@ export class DataLayer {
         }
     }
 
+    /**
+     * Draw a preprocessed layer, fetching only the tiles in view
+     * Tiles are refetched for the matching zoom level whenever the map moves
+     * @param {TiledDataset} dataset - Layer prepared by prepare_map.py
+     */
+    async loadTiles(dataset) {
+        this.removeFromMap();
+        this.dataset = dataset;
+        // Properties only; geometry lives in the tiles
+        this.data = dataset.getFeatureCollection();
+
+        this.dataLayer = L.geoJSON(null, {
+            style: (feature) => this.getFeatureStyle(feature),
+            onEachFeature: (feature, layer) => this.onEachFeature(feature, layer)
+        });
+        this.dataLayer.addTo(this.map);
+        this.map.on('moveend', this.updateTiles);
+
+        const bounds = dataset.getLayerBounds();
+        if (bounds) {
+            // fitBounds fires moveend, which loads the first tiles
+            this.map.fitBounds(bounds, { padding: [50, 50], maxZoom: 10 });
+        }
+        await this.updateTiles();
+
+        if (this.onDataLoaded) {
+            this.onDataLoaded(this.data);
+        }
+        return this.data;
+    }
+
+    /**
+     * Fetch and draw the tiles in view at the current zoom level
+     * Switching levels clears the features drawn at the previous one
+     */
+    async updateTiles() {
+        if (!this.dataset || !this.dataLayer) return;
+
+        const level = this.dataset.getLevel(this.map.getZoom());
+        if (level !== this.level) {
+            this.dataLayer.clearLayers();
+            this.drawnIds.clear();
+            this.level = level;
+        }
+
+        const tiles = this.dataset.getVisibleTiles(level, this.map.getBounds());
+        const startTime = performance.now();
+        const results = await Promise.allSettled(tiles.map(tile => this.dataset.loadTile(level, tile)));
+
+        // The map may have moved to another level meanwhile
+        if (level !== this.level) return;
+        let added = 0;
+        for (const result of results) {
+            if (result.status === 'rejected') {
+                console.error('❌ Error loading tile:', result.reason);
+                continue;
+            }
+            // Features spanning several tiles appear in each of them
+            const fresh = result.value.filter(feature => !this.drawnIds.has(feature.id));
+            fresh.forEach(feature => this.drawnIds.add(feature.id));
+            if (fresh.length) {
+                this.dataLayer.addData(fresh);
+                added += fresh.length;
+            }
+        }
+        if (added) {
+            console.log(`🧩 Zoom ${this.map.getZoom()}: drew ${added} features from ${tiles.length} tiles (level ${level.zoom}) in ${(performance.now() - startTime).toFixed(2)}ms`);
+        }
+    }
+
     /**
      * Add GeoJSON data to the map
      */
@@ -230,6 +307,9 @@ export class DataLayer {
         if (this.dataLayer) {
             this.map.removeLayer(this.dataLayer);
             this.dataLayer = null;
+            this.map.off('moveend', this.updateTiles);
+            this.level = null;
+            this.drawnIds.clear();
             console.log('Data layer removed from map');
         }
     }
@@ -113,6 +113,29 @@ export class DataLoader {
         }
     }
 
+    /**
+     * Load a binary file
+     * @param {string} filePath - Path to binary file
+     * @returns {Promise<ArrayBuffer>} - File content
+     */
+    async loadArrayBuffer(filePath) {
+        try {
+            const response = await this.fetchWithTimeout(filePath, this.timeout);
+            
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            
+            const buffer = await response.arrayBuffer();
+            console.log(`✅ Loaded ${buffer.byteLength} bytes from ${filePath}`);
+            return buffer;
+            
+        } catch (error) {
+            console.error('❌ Error loading binary file:', error);
+            throw new Error(`Failed to load binary file from ${filePath}: ${error.message}`);
+        }
+    }
+
     /**
      * Load text file
      * @param {string} filePath - Path to text file
@@ -4,6 +4,10 @@
  * 
  * The notebook runs Python code in the browser via WebAssembly (Pyodide).
  * No server required - works on GitHub Pages!
+ * 
+ * An iframe with `data-src` is only loaded when the panel first opens, with
+ * the panel width as the `panel_width` query parameter, so the notebook can
+ * pick the precomputed hillshade level that fits.
  */
 
 export class MarimoPanel {
@@ -170,6 +174,8 @@ export class MarimoPanel {
         if (this.panel) {
             document.documentElement.style.setProperty('--marimo-panel-width', `${this.panel.offsetWidth}px`);
         }
+
+        this.loadNotebook();
         
         console.log('Marimo WASM panel opened');
         
@@ -178,6 +184,21 @@ export class MarimoPanel {
         }
     }
 
+    /**
+     * Load the notebook iframe on first open, telling it the panel width
+     */
+    loadNotebook() {
+        if (!this.iframe || this.iframe.getAttribute('src')) return;
+
+        const dataSrc = this.iframe.dataset.src;
+        if (!dataSrc) return;
+
+        const url = new URL(dataSrc, window.location.href);
+        url.searchParams.set('panel_width', String(this.panel.offsetWidth));
+        this.iframe.src = url.toString();
+        console.log(`Loading Marimo notebook for a ${this.panel.offsetWidth}px panel`);
+    }
+
     /**
      * Close the panel
      */
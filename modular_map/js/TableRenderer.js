@@ -21,6 +21,7 @@ export class TableRenderer {
             totalFeatures,
             columnsToDisplay,
             columnMapping,
+            columnStats,
             sortColumn,
             sortDirection,
             searchHTML,
@@ -35,6 +36,7 @@ export class TableRenderer {
                     features,
                     columnsToDisplay,
                     columnMapping,
+                    columnStats,
                     sortColumn,
                     sortDirection
                 })}
@@ -61,6 +63,7 @@ export class TableRenderer {
             features,
             columnsToDisplay,
             columnMapping,
+            columnStats,
             sortColumn,
             sortDirection
         } = params;
@@ -73,6 +76,7 @@ export class TableRenderer {
                         ${this.renderHeaderCells({
                             columnsToDisplay,
                             columnMapping,
+                            columnStats,
                             sortColumn,
                             sortDirection
                         })}
@@ -93,7 +97,7 @@ export class TableRenderer {
      * @returns {string} - Header cells HTML
      */
     renderHeaderCells(params) {
-        const { columnsToDisplay, columnMapping, sortColumn, sortDirection } = params;
+        const { columnsToDisplay, columnMapping, columnStats, sortColumn, sortDirection } = params;
 
         return columnsToDisplay.map(originalCol => {
             const displayName = columnMapping[originalCol];
@@ -102,8 +106,11 @@ export class TableRenderer {
                 ? (sortDirection === 'asc' ? ' ▴' : ' ▾')
                 : '';
             const sortedClass = isSorted ? 'sorted' : '';
+            // Numeric range from the precomputed index, shown on hover
+            const stats = columnStats && columnStats[originalCol];
+            const title = stats ? ` title="Range: ${this.escapeHtmlFn(`${stats.min} – ${stats.max}`)}"` : '';
             
-            return `<th class="sortable ${sortedClass}" data-column="${originalCol}">${this.escapeHtmlFn(displayName)}${sortIndicator}</th>`;
+            return `<th class="sortable ${sortedClass}" data-column="${originalCol}"${title}>${this.escapeHtmlFn(displayName)}${sortIndicator}</th>`;
         }).join('');
     }
 
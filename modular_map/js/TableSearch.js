@@ -4,6 +4,8 @@
  * 
  * Features:
  * - Pre-computed search index for O(n) performance
+ * - Uses the index built by prepare_map.py (AttributeIndex) when available,
+ *   so nothing is indexed in the browser
  * - Debounced incremental search
  * - Dynamic UI updates without losing focus
  */
@@ -20,6 +22,7 @@ export class TableSearch {
         // Search index for performance optimization
         this.searchIndex = null;
         this.indexedColumns = null;
+        this.precomputedIndex = null; // AttributeIndex from prepare_map.py
         
         // Data reference (will be set externally)
         this.data = null;
@@ -45,6 +48,23 @@ export class TableSearch {
         this.indexedColumns = columns;
     }
 
+    /**
+     * Use an index built ahead of time; features must carry their `id`
+     * @param {AttributeIndex|null} index - Precomputed index, or null to index in the browser
+     */
+    setPrecomputedIndex(index) {
+        this.precomputedIndex = index;
+    }
+
+    /**
+     * Check whether the precomputed index covers the searched columns
+     * @returns {boolean}
+     */
+    usesPrecomputedIndex() {
+        return Boolean(this.precomputedIndex && this.indexedColumns &&
+            this.precomputedIndex.hasColumns(this.indexedColumns));
+    }
+
     /**
      * Build search index - ONE TIME operation when data loads
      * Creates a pre-computed lowercase concatenated string for each feature
@@ -57,6 +77,20 @@ export class TableSearch {
             return;
         }
 
+        // Nothing to build: the precomputed index matches by feature id, whatever the row order
+        this.searchIndex = null;
+        if (this.usesPrecomputedIndex()) {
+            console.log('⚡ Using precomputed search index');
+            return;
+        }
+
+        this.buildStringIndex();
+    }
+
+    /**
+     * Concatenate each feature's searchable values into one lowercase string
+     */
+    buildStringIndex() {
         // Pre-compute: Concatenate all searchable values into ONE string per feature
         this.searchIndex = this.data.features.map(feature => {
             const searchableText = this.indexedColumns
@@ -86,7 +120,7 @@ export class TableSearch {
      * Performance: 10× faster (1 string comparison per feature vs m comparisons)
      */
     filter() {
-        if (!this.data || !this.data.features || !this.searchIndex) {
+        if (!this.data || !this.data.features || (!this.searchIndex && !this.usesPrecomputedIndex())) {
             console.warn('Cannot filter: missing data or search index');
             return;
         }
@@ -105,6 +139,18 @@ export class TableSearch {
 
         const startTime = performance.now();
 
+        // Precomputed index: dictionary and n-gram lookups, then one code comparison per row
+        const matches = this.searchIndex ? null : this.precomputedIndex.match(this.query, this.indexedColumns);
+        if (matches) {
+            this.filteredData = this.data.features.filter(feature => matches[feature.id] === 1);
+            console.log(`🔍 Indexed search completed in ${(performance.now() - startTime).toFixed(2)}ms - Found ${this.filteredData.length} results`);
+            return;
+        }
+        if (!this.searchIndex) {
+            // The query spans columns; fall back to the concatenated strings
+            this.buildStringIndex();
+        }
+
         // OPTIMIZED: Single string comparison per feature (not m comparisons!)
         const filtered = [];
         for (let i = 0; i < this.searchIndex.length; i++) {
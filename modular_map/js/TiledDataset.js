@@ -0,0 +1,175 @@
+/**
+ * TiledDataset.js - Preprocessed Layer Access
+ * Reads the output of `prepare_map.py`: an index of zoom levels and tiles,
+ * simplified geometry tiles, and columnar feature properties
+ * Lets the map fetch only the tiles in view and the table skip geometry
+ */
+
+import { AttributeIndex } from './AttributeIndex.js';
+import { DataLoader } from './DataLoader.js';
+
+export class TiledDataset {
+    constructor(baseUrl, index, properties, loader) {
+        this.baseUrl = baseUrl;
+        this.index = index;
+        this.loader = loader;
+        this.count = properties.count;
+        this.columns = this.decodeColumns(properties.columns);
+        this.bboxes = properties.bbox;
+        this.tileCache = new Map(); // "zoom/key" -> Promise<tile>
+        this.featureCollection = null;
+        this.searchIndex = null; // Promise<AttributeIndex|null>
+    }
+
+    /**
+     * Load a preprocessed layer: its index, then its properties
+     * @param {string} indexPath - Path to the layer's index.json
+     * @param {DataLoader} loader - Loader to fetch with
+     * @returns {Promise<TiledDataset>}
+     */
+    static async load(indexPath, loader = new DataLoader()) {
+        const baseUrl = indexPath.slice(0, indexPath.lastIndexOf('/') + 1);
+        const index = await loader.loadJSON(indexPath);
+        const properties = await loader.loadJSON(baseUrl + index.properties);
+        console.log(`✅ Loaded tiled layer: ${properties.count} features, ${index.levels.length} zoom levels`);
+        return new TiledDataset(baseUrl, index, properties, loader);
+    }
+
+    /**
+     * Expand dictionary-encoded columns into plain value arrays
+     * @param {Object} columns - Columns as written by prepare_map.py
+     * @returns {Object} - Column name -> array of values
+     */
+    decodeColumns(columns) {
+        const decoded = {};
+        for (const [name, column] of Object.entries(columns)) {
+            decoded[name] = column.values || column.codes.map(code => column.dictionary[code]);
+        }
+        return decoded;
+    }
+
+    /**
+     * Get the properties of one feature
+     * @param {number} id - Feature id (position in the source file)
+     * @returns {Object}
+     */
+    getProperties(id) {
+        const props = {};
+        for (const name in this.columns) {
+            props[name] = this.columns[name][id];
+        }
+        return props;
+    }
+
+    /**
+     * Get a feature's bounding box as Leaflet bounds
+     * @param {number} id - Feature id
+     * @returns {L.LatLngBounds|null}
+     */
+    getBounds(id) {
+        const [west, south, east, north] = this.bboxes.slice(id * 4, id * 4 + 4);
+        if (west === null || west === undefined) return null;
+        return L.latLngBounds([south, west], [north, east]);
+    }
+
+    /**
+     * Get the bounds of the whole layer
+     * @returns {L.LatLngBounds|null}
+     */
+    getLayerBounds() {
+        if (!this.index.bbox) return null;
+        const [west, south, east, north] = this.index.bbox;
+        return L.latLngBounds([south, west], [north, east]);
+    }
+
+    /**
+     * Get every feature with its properties and bbox but no geometry
+     * Built once and shared, e.g. by the attribute table
+     * @returns {Object} - FeatureCollection-like object
+     */
+    getFeatureCollection() {
+        if (!this.featureCollection) {
+            const features = new Array(this.count);
+            for (let id = 0; id < this.count; id++) {
+                features[id] = {
+                    type: 'Feature',
+                    id,
+                    properties: this.getProperties(id),
+                    bbox: this.bboxes[id * 4] === null ? null : this.bboxes.slice(id * 4, id * 4 + 4),
+                    geometry: null
+                };
+            }
+            this.featureCollection = { type: 'FeatureCollection', features };
+        }
+        return this.featureCollection;
+    }
+
+    /**
+     * Load the precomputed attribute search index once, if the layer has one
+     * @returns {Promise<AttributeIndex|null>} - null if missing or unreadable
+     */
+    loadSearchIndex() {
+        if (!this.searchIndex) {
+            this.searchIndex = this.index.search
+                ? AttributeIndex.load(this.baseUrl + this.index.search, this.loader).catch(error => {
+                    console.warn('Precomputed search index unavailable, searching rows instead:', error);
+                    return null;
+                })
+                : Promise.resolve(null);
+        }
+        return this.searchIndex;
+    }
+
+    /**
+     * Pick the level to draw at a map zoom: the coarsest one that is at
+     * least as detailed as the zoom needs, or the most detailed one
+     * @param {number} zoom - Map zoom
+     * @returns {Object} - Level entry from the index
+     */
+    getLevel(zoom) {
+        const levels = this.index.levels;
+        return levels.find(level => level.zoom >= zoom) || levels[levels.length - 1];
+    }
+
+    /**
+     * List the tiles of a level whose content intersects the given bounds
+     * @param {Object} level - Level entry from the index
+     * @param {L.LatLngBounds} bounds - Visible map bounds
+     * @returns {Array<Object>} - Tile entries
+     */
+    getVisibleTiles(level, bounds) {
+        const west = bounds.getWest();
+        const south = bounds.getSouth();
+        const east = bounds.getEast();
+        const north = bounds.getNorth();
+        return level.tiles.filter(({ bbox }) =>
+            bbox[0] <= east && bbox[2] >= west && bbox[1] <= north && bbox[3] >= south
+        );
+    }
+
+    /**
+     * Fetch a tile once; later calls share the same request
+     * @param {Object} level - Level entry from the index
+     * @param {Object} tile - Tile entry from the level
+     * @returns {Promise<Array<Object>>} - GeoJSON features with properties
+     */
+    loadTile(level, tile) {
+        const key = `${level.zoom}/${tile.key}`;
+        if (!this.tileCache.has(key)) {
+            const request = this.loader.loadJSON(`${this.baseUrl}tiles/${key}.json`)
+                .then(({ ids, geometries }) => ids.map((id, i) => ({
+                    type: 'Feature',
+                    id,
+                    properties: this.getProperties(id),
+                    geometry: geometries[i]
+                })))
+                .catch(error => {
+                    // Let a later pan retry the tile
+                    this.tileCache.delete(key);
+                    throw error;
+                });
+            this.tileCache.set(key, request);
+        }
+        return this.tileCache.get(key);
+    }
+}
@@ -14,39 +14,131 @@ app = marimo.App(width="medium")
 
 @app.cell
 def _():
+    import io
+    import json
+    import pathlib
+    import urllib.request
+
+    import marimo as mo
     import matplotlib.pyplot as plt
     import numpy as np
+    return io, json, mo, np, pathlib, plt, urllib
 
-    from matplotlib import cbook, cm
-    from matplotlib.colors import LightSource
 
-    # Load and format data
-    dem = cbook.get_sample_data('jacksboro_fault_dem.npz')
-    z = dem['elevation']
-    nrows, ncols = z.shape
-    x = np.linspace(dem['xmin'], dem['xmax'], ncols)
-    y = np.linspace(dem['ymin'], dem['ymax'], nrows)
-    x, y = np.meshgrid(x, y)
+@app.cell
+def _(mo):
+    # Written by precompute_hillshade.py; the WASM export serves public/ next to the notebook
+    pyramid_location = mo.notebook_location() / "public" / "hillshade"
 
-    region = np.s_[5:50, 5:50]
-    x, y, z = x[region], y[region], z[region]
+    # MarimoPanel.js passes the panel width in the iframe URL
+    panel_width = int(mo.query_params().get("panel_width") or 480)
+    # About this many screen pixels per surface facet
+    pixels_per_cell = 8
+    # plot_surface draws one facet per cell; wide panels must not pick a level
+    # the WASM kernel takes seconds to draw
+    max_surface_cells = 64
+    return max_surface_cells, panel_width, pixels_per_cell, pyramid_location
 
-    # Set up plot
-    fig, ax = plt.subplots(subplot_kw=dict(projection='3d'))
 
-    ls = LightSource(270, 45)
-    # To use a custom hillshading mode, override the built-in shading and pass
-    # in the rgb colors of the shaded surface calculated from "shade".
-    rgb = ls.shade(z, cmap=cm.gist_earth, vert_exag=0.1, blend_mode='soft')
-    surf = ax.plot_surface(x, y, z, rstride=1, cstride=1, facecolors=rgb,
-                           linewidth=0, antialiased=False, shade=False)
+@app.cell
+def _(io, json, mo, np, pathlib, urllib):
+    def read_bytes(path):
+        # A local directory when run natively, a URL in the WASM kernel
+        if isinstance(path, pathlib.Path):
+            return path.read_bytes()
+        with urllib.request.urlopen(str(path)) as response:
+            return response.read()
 
-    plt.show()
+    # mo.cache keeps results across cell re-runs, so each file is fetched once
+    @mo.cache
+    def load_index(location):
+        return json.loads(read_bytes(location / "index.json"))
+
+    @mo.cache
+    def load_level(location, name):
+        with np.load(io.BytesIO(read_bytes(location / name))) as arrays:
+            return arrays["elevation"], arrays["rgb"]
+
+    @mo.cache
+    def load_png(location, name):
+        return read_bytes(location / name)
+    return load_index, load_level, load_png
+
+
+@app.cell
+def _(np):
+    def shade_sample():
+        # Fallback when the pyramid was not precomputed: shade the sample in the kernel
+        from matplotlib import cbook, cm
+        from matplotlib.colors import LightSource
+
+        dem = cbook.get_sample_data('jacksboro_fault_dem.npz')
+        nrows, ncols = dem['elevation'].shape
+        x = np.linspace(dem['xmin'], dem['xmax'], ncols)[5:50]
+        y = np.linspace(dem['ymin'], dem['ymax'], nrows)[5:50]
+        z = dem['elevation'][5:50, 5:50]
+        ls = LightSource(270, 45)
+        rgb = ls.shade(z, cmap=cm.gist_earth, vert_exag=0.1, blend_mode='soft')[..., :3]
+        return z, np.round(rgb * 255).astype(np.uint8), [x[0], x[-1], y[0], y[-1]]
+    return (shade_sample,)
+
+
+@app.cell
+def _(
+    load_index,
+    load_level,
+    load_png,
+    max_surface_cells,
+    panel_width,
+    pixels_per_cell,
+    pyramid_location,
+    shade_sample,
+):
+    try:
+        pyramid = load_index(pyramid_location)
+    except Exception as error:  # Missing assets, or the fetch failed
+        print(f"No precomputed hillshade ({error}); shading in the kernel.")
+        pyramid = None
+
+    if pyramid is not None:
+        # The most detailed level that still fits the panel (and the facet
+        # budget), else the coarsest
+        target_cells = panel_width / pixels_per_cell
+        fitting = [level for level in pyramid["levels"] if max(level["shape"]) <= min(target_cells, max_surface_cells)]
+        level = fitting[0] if fitting else pyramid["levels"][-1]
+        z, rgb = load_level(pyramid_location, level["npz"])
+        preview = load_png(pyramid_location, level["png"])
+        extent = pyramid["extent"]
+    else:
+        level, preview = None, None
+        z, rgb, extent = shade_sample()
+    return extent, level, preview, rgb, z
+
+
+@app.cell
+def _(level, mo, preview, z):
+    # The shaded relief as an image: shown before the 3D surface is drawn
+    mo.vstack([
+        mo.md(f"**Hillshade** — level {level['level']}, {z.shape[0]} × {z.shape[1]} cells" if level else "**Hillshade**"),
+        mo.image(preview) if preview is not None else mo.md("_No precomputed preview._"),
+    ])
     return
 
 
 @app.cell
-def _():
+def _(extent, np, plt, rgb, z):
+    nrows, ncols = z.shape
+    x, y = np.meshgrid(np.linspace(extent[0], extent[1], ncols), np.linspace(extent[2], extent[3], nrows))
+
+    # Set up plot
+    fig, ax = plt.subplots(subplot_kw=dict(projection='3d'))
+
+    # The colours were shaded offline (LightSource(270, 45), gist_earth,
+    # vert_exag=0.1, soft blending), so the surface only has to be drawn.
+    surf = ax.plot_surface(x, y, z, rstride=1, cstride=1, facecolors=rgb / 255,
+                           linewidth=0, antialiased=False, shade=False)
+
+    plt.show()
     return
 
 
@@ -0,0 +1,132 @@
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "matplotlib==3.10.7",
+#     "numpy==2.3.3",
+# ]
+# ///
+"""
+Precomputes the hillshade pyramid that `interactive_analysis.py` plots.
+
+In the WASM notebook, loading the DEM sample, building the coordinate grid
+and running `LightSource.shade` took seconds of Pyodide time before anything
+was drawn. This script does that work once: it shades the full DEM at full
+resolution, then halves it repeatedly (averaging 2x2 blocks of elevation and
+of shaded colour) until the grid is under `--min-size` cells on its longer
+side. Each level is written to `public/hillshade/` as:
+
+- `level-<n>.npz`, holding `elevation` (float32) and `rgb` (uint8, H x W x 3);
+- `level-<n>.png`, the shaded relief as an image, for a quick 2D preview.
+
+`index.json` lists the levels with their shapes, plus the DEM's extent and
+the shading parameters. marimo's WASM export copies `public/` next to the
+notebook, where it loads the level that matches the panel size.
+
+Usage:
+    uv run notebooks/precompute_hillshade.py [--out notebooks/public/hillshade] [--min-size 16]
+"""
+
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib import cbook, cm
+from matplotlib.colors import LightSource
+
+DEM_SAMPLE = "jacksboro_fault_dem.npz"
+# The shading used by the notebook since its first version.
+AZIMUTH, ALTITUDE = 270, 45
+VERTICAL_EXAGGERATION = 0.1
+BLEND_MODE = "soft"
+PYRAMID_FORMAT = 1
+
+
+def halve(array: np.ndarray) -> np.ndarray:
+    """Averages 2x2 blocks; an odd last row or column is averaged with a copy of itself."""
+    height, width = array.shape[:2]
+    padding = [(0, height % 2), (0, width % 2)] + [(0, 0)] * (array.ndim - 2)
+    array = np.pad(array, padding, mode="edge")
+    shape = (array.shape[0] // 2, 2, array.shape[1] // 2, 2) + array.shape[2:]
+    return array.reshape(shape).mean(axis=(1, 3))
+
+
+def encode_png(rgb: np.ndarray) -> bytes:
+    """Encodes an RGB array as PNG."""
+    buffer = io.BytesIO()
+    plt.imsave(buffer, rgb, format="png")
+    return buffer.getvalue()
+
+
+def build_pyramid(output: Path, min_size: int) -> dict:
+    """
+    Shades the DEM sample and writes every pyramid level.
+
+    Args:
+        output: The directory to write to.
+        min_size: The coarsest level is the first with fewer cells than this
+            on its longer side.
+
+    Returns:
+        The pyramid index that was written.
+    """
+    dem = cbook.get_sample_data(DEM_SAMPLE)
+    elevation = dem["elevation"].astype(np.float64)
+    light = LightSource(AZIMUTH, ALTITUDE)
+    rgb = light.shade(elevation, cmap=cm.gist_earth, vert_exag=VERTICAL_EXAGGERATION, blend_mode=BLEND_MODE)[..., :3]
+
+    output.mkdir(parents=True, exist_ok=True)
+    for stale in output.glob("level-*"):
+        stale.unlink()
+    levels = []
+    while True:
+        number = len(levels)
+        npz, png = f"level-{number}.npz", f"level-{number}.png"
+        pixels = np.round(rgb * 255).astype(np.uint8)
+        np.savez_compressed(output / npz, elevation=elevation.astype(np.float32), rgb=pixels)
+        (output / png).write_bytes(encode_png(pixels))
+        levels.append({
+            "level": number,
+            "shape": list(elevation.shape),
+            "npz": npz,
+            "png": png,
+            "bytes": (output / npz).stat().st_size + (output / png).stat().st_size,
+        })
+        if max(elevation.shape) < min_size or min(elevation.shape) < 2:
+            break
+        elevation, rgb = halve(elevation), halve(rgb)
+
+    index = {
+        "format": PYRAMID_FORMAT,
+        "source": DEM_SAMPLE,
+        "extent": [float(dem["xmin"]), float(dem["xmax"]), float(dem["ymin"]), float(dem["ymax"])],
+        "shading": {"azimuth": AZIMUTH, "altitude": ALTITUDE, "vertExag": VERTICAL_EXAGGERATION, "blendMode": BLEND_MODE},
+        "levels": levels,
+    }
+    (output / "index.json").write_text(json.dumps(index, indent=2) + "\n", encoding="utf-8")
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", type=Path, default=Path(__file__).resolve().parent / "public" / "hillshade",
+                        help="Output directory (default: public/hillshade next to this script).")
+    parser.add_argument("--min-size", type=int, default=16, help="Stop halving below this many cells (default: 16).")
+    args = parser.parse_args()
+    if args.min_size < 2:
+        parser.error("--min-size must be at least 2")
+
+    started = time.perf_counter()
+    index = build_pyramid(args.out, args.min_size)
+    elapsed = time.perf_counter() - started
+    for level in index["levels"]:
+        height, width = level["shape"]
+        print(f"level {level['level']}: {height} x {width} cells, {level['bytes'] / 1024:.1f} KB")
+    print(f"Wrote {len(index['levels'])} levels to {args.out} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,25 @@
 // Lightweight client-side manifest loader for dynamically rendered notes.
 const CONTENT_BASE = '/try1_ready_2_serve';
 const MANIFEST_URL = `${CONTENT_BASE}/manifest.json`;
+const MANIFEST_STORAGE_KEY = 'notes-manifest';
+const DELTAS_DIR = '_deltas';
 
 let manifestPromise;
 let manifestData;
+let nodeIndex = new Map();
+let packedFragments = new Map();
+let packContents = new Map();
 let contentBase = CONTENT_BASE;
 const htmlCache = new Map();
+const packCache = new Map();
 
 export function loadManifest() {
     if (!manifestPromise) {
-        manifestPromise = fetch(MANIFEST_URL)
-            .then((response) => {
-                if (!response.ok) {
-                    throw new Error(`Unable to fetch notes manifest (status ${response.status}).`);
-                }
-                return response.json();
-            })
+        manifestPromise = fetchManifest()
             .then((data) => {
                 manifestData = data;
+                nodeIndex = indexManifest(data);
+                ({ fragments: packedFragments, packs: packContents } = indexPacks(data));
                 if (data && typeof data.publicPath === 'string') {
                     contentBase = normaliseBasePath(data.publicPath);
                 }
@@ -31,25 +33,181 @@ export function loadManifest() {
     return manifestPromise;
 }
 
+// Reuse the manifest kept from an earlier visit when the build published
+// deltas: it is either still current or patched with one small download.
+async function fetchManifest() {
+    const stored = readStoredManifest();
+    let latest = null;
+    if (stored && stored.hash) {
+        try {
+            const deltasBase = `${normaliseBasePath(stored.publicPath)}/${DELTAS_DIR}`;
+            latest = await fetchJson(`${deltasBase}/latest.json`, { cache: 'no-cache' });
+            if (latest.hash === stored.hash) {
+                return stored;
+            }
+            if (Array.isArray(latest.from) && latest.from.includes(stored.hash)) {
+                const delta = await fetchJson(`${deltasBase}/${stored.hash}.json`);
+                if (delta.to !== latest.hash) {
+                    throw new Error('Manifest delta does not lead to the latest manifest.');
+                }
+                const patched = applyManifestDelta(stored, delta);
+                storeManifest(patched);
+                return patched;
+            }
+        } catch (error) {
+            // Deltas are only a shortcut; fall back to the full manifest.
+        }
+    }
+    const response = await fetch(MANIFEST_URL);
+    if (!response.ok) {
+        throw new Error(`Unable to fetch notes manifest (status ${response.status}).`);
+    }
+    const data = await response.json();
+    // A 'latest.json' that names another manifest than the one served is left
+    // over from an earlier build; trusting it would pin this copy forever.
+    storeManifest(latest && latest.hash !== data.hash ? null : data);
+    return data;
+}
+
+async function fetchJson(url, options) {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+        throw new Error(`Unable to fetch ${url} (status ${response.status}).`);
+    }
+    return response.json();
+}
+
+function readStoredManifest() {
+    try {
+        const text = localStorage.getItem(MANIFEST_STORAGE_KEY);
+        return text ? JSON.parse(text) : null;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Stored before indexManifest decorates the nodes. Only hashed manifests
+// can be patched later, so others are not kept.
+function storeManifest(data) {
+    try {
+        if (data && data.hash) {
+            localStorage.setItem(MANIFEST_STORAGE_KEY, JSON.stringify(data));
+        } else {
+            localStorage.removeItem(MANIFEST_STORAGE_KEY);
+        }
+    } catch (error) {
+        // Storage may be full or disabled; the next visit downloads again.
+    }
+}
+
+// Apply a delta written by builder/deltas.py: directory entries keyed by
+// their vault path replace (or, when null, remove) the stored ones, then
+// ids, parents and the slug index are recomputed as the builder numbers them.
+function applyManifestDelta(manifest, delta) {
+    if (delta.format !== 1 || delta.from !== manifest.hash) {
+        throw new Error('Manifest delta does not apply.');
+    }
+    const entries = new Map();
+    const pending = [manifest.root];
+    while (pending.length > 0) {
+        const node = pending.pop();
+        const { id, directories, files, ...entry } = node;
+        entry.directories = directories.map(directoryKey);
+        entry.files = files.map(({ id: fileId, parent, breadcrumbs, ...file }) => file);
+        entries.set(directoryKey(node), entry);
+        pending.push(...directories);
+    }
+    for (const [key, entry] of Object.entries(delta.directories)) {
+        if (entry === null) {
+            entries.delete(key);
+        } else {
+            entries.set(key, entry);
+        }
+    }
+
+    let nextId = 0;
+    const build = (key) => {
+        const entry = entries.get(key);
+        const node = { ...entry, id: nextId++, directories: [] };
+        for (const childKey of entry.directories) {
+            node.directories.push(build(childKey));
+        }
+        node.files = entry.files.map((file) => ({ ...file, id: nextId++, parent: node.id }));
+        return node;
+    };
+    const root = build('');
+
+    const index = { [root.slugPath]: root.id };
+    const queue = [root];
+    while (queue.length > 0) {
+        const node = queue.shift();
+        for (const child of [...node.directories, ...node.files]) {
+            if (!(child.slugPath in index)) {
+                index[child.slugPath] = child.id;
+            }
+        }
+        queue.push(...node.directories);
+    }
+
+    const patched = { ...manifest, root, index, hash: delta.to };
+    for (const [name, value] of Object.entries(delta.members)) {
+        if (value === null) {
+            delete patched[name];
+        } else {
+            patched[name] = value;
+        }
+    }
+    return patched;
+}
+
+function directoryKey(node) {
+    const source = node.readme.source;
+    const slash = source.lastIndexOf('/');
+    return slash === -1 ? '' : source.slice(0, slash);
+}
+
 export async function resolveNode(slugSegments) {
     const manifest = manifestData || await loadManifest();
     const segments = slugSegments.filter(Boolean);
     if (segments.length === 0) {
         return { node: manifest.root, kind: 'directory' };
     }
-    const result = walk(manifest.root, segments);
+    const result = nodeIndex.get(segments.join('/'));
     if (!result) {
         throw new Error('Not Found');
     }
     return result;
 }
 
-export function fetchHtml(relativePath) {
+// Look up an already indexed node by slug path, e.g. a backlink target.
+export function findNode(slugPath) {
+    if (!slugPath) {
+        return manifestData ? { node: manifestData.root, kind: 'directory' } : undefined;
+    }
+    return nodeIndex.get(slugPath);
+}
+
+// A content hash from the manifest makes the URL change only when the
+// fragment does, so unchanged notes stay in the browser's HTTP cache.
+export function fetchHtml(relativePath, hash) {
     const normalised = relativePath.replace(/^\/+/, '');
-    if (htmlCache.has(normalised)) {
-        return htmlCache.get(normalised);
+    const cacheKey = hash ? `${normalised}?v=${hash}` : normalised;
+    if (htmlCache.has(cacheKey)) {
+        return htmlCache.get(cacheKey);
     }
-    const url = buildContentUrl(normalised);
+    const packed = packedFragments.get(normalised);
+    if (packed) {
+        // The pack fills the cache for its whole directory; if it cannot be
+        // loaded, the fragment is fetched on its own.
+        return loadPack(packed)
+            .then(() => htmlCache.get(cacheKey) || fetchFragment(normalised, cacheKey))
+            .catch(() => fetchFragment(normalised, cacheKey));
+    }
+    return fetchFragment(normalised, cacheKey);
+}
+
+function fetchFragment(normalised, cacheKey) {
+    const url = buildContentUrl(cacheKey);
     const promise = fetch(url)
         .then((response) => {
             if (!response.ok) {
@@ -62,27 +220,123 @@ export function fetchHtml(relativePath) {
             return rewritten;
         })
         .catch((error) => {
-            htmlCache.delete(normalised);
+            htmlCache.delete(cacheKey);
             throw error;
         });
-    htmlCache.set(normalised, promise);
+    htmlCache.set(cacheKey, promise);
     return promise;
 }
 
-function walk(directoryNode, segments) {
-    if (segments.length === 0) {
-        return { node: directoryNode, kind: 'directory' };
+// Fetch a directory's pack once and cache every fragment it holds. Pack names
+// are content hashes, so the pack itself needs no version parameter.
+function loadPack(path) {
+    if (!packCache.has(path)) {
+        const decoder = new TextDecoder();
+        const promise = fetch(buildContentUrl(path))
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to fetch fragment pack (${response.status}).`);
+                }
+                return response.arrayBuffer();
+            })
+            .then((buffer) => {
+                const bytes = new Uint8Array(buffer);
+                for (const { html, hash, offset, length } of packContents.get(path)) {
+                    const cacheKey = hash ? `${html}?v=${hash}` : html;
+                    if (!htmlCache.has(cacheKey)) {
+                        const text = decoder.decode(bytes.subarray(offset, offset + length));
+                        htmlCache.set(cacheKey, Promise.resolve(rewriteRelativeUrls(text, html)));
+                    }
+                }
+            })
+            .catch((error) => {
+                packCache.delete(path);
+                throw error;
+            });
+        packCache.set(path, promise);
+    }
+    return packCache.get(path);
+}
+
+// Map each packed fragment to its pack, and each pack to its fragments.
+// Directory nodes list their packs; readme and file nodes carry
+// [pack number, byte offset, byte length].
+function indexPacks(data) {
+    const fragments = new Map();
+    const packs = new Map();
+    const pending = data && data.root ? [data.root] : [];
+    while (pending.length > 0) {
+        const directory = pending.pop();
+        pending.push(...(directory.directories || []));
+        const paths = directory.packs || [];
+        for (const member of [directory.readme, ...(directory.files || [])]) {
+            if (!member || !member.pack || !paths[member.pack[0]]) {
+                continue;
+            }
+            const [number, offset, length] = member.pack;
+            const path = paths[number];
+            const html = member.html.replace(/^\/+/, '');
+            if (!packs.has(path)) {
+                packs.set(path, []);
+            }
+            packs.get(path).push({ html, hash: member.htmlHash, offset, length });
+            fragments.set(html, path);
+        }
+    }
+    return { fragments, packs };
+}
+
+// Map every slugPath to its node once, so each route resolves in one lookup.
+function indexManifest(data) {
+    const index = new Map();
+    const root = data && data.root;
+    if (!root) {
+        return index;
     }
-    const [head, ...rest] = segments;
-    const nextDirectory = (directoryNode.directories || []).find((entry) => entry.slug === head);
-    if (nextDirectory) {
-        return walk(nextDirectory, rest);
+    const directories = [];
+    const pending = [root];
+    while (pending.length > 0) {
+        const directory = pending.shift();
+        directories.push(directory);
+        pending.push(...(directory.directories || []));
+    }
+
+    if (data.version >= 2 && data.index) {
+        // Version 2 stores breadcrumbs once per directory; file nodes point
+        // at their directory and share one trail array per directory.
+        const byId = new Map();
+        for (const directory of directories) {
+            byId.set(directory.id, { node: directory, kind: 'directory' });
+            const trail = [...(directory.breadcrumbs || []), { title: directory.title, slugPath: directory.slugPath }];
+            for (const file of directory.files || []) {
+                file.breadcrumbs = trail;
+                byId.set(file.id, { node: file, kind: 'file' });
+            }
+        }
+        for (const [slugPath, id] of Object.entries(data.index)) {
+            const entry = byId.get(id);
+            if (entry) {
+                index.set(slugPath, entry);
+            }
+        }
+        return index;
     }
-    const fileMatch = (directoryNode.files || []).find((entry) => entry.slug === head);
-    if (fileMatch && rest.length === 0) {
-        return { node: fileMatch, kind: 'file' };
+
+    // Version 1: the first directory, then the first file, with a given slug wins.
+    index.set(root.slugPath || '', { node: root, kind: 'directory' });
+    for (const directory of directories) {
+        for (const child of directory.directories || []) {
+            if (!index.has(child.slugPath)) {
+                index.set(child.slugPath, { node: child, kind: 'directory' });
+            }
+        }
+        for (const file of directory.files || []) {
+            if (!index.has(file.slugPath)) {
+                index.set(file.slugPath, { node: file, kind: 'file' });
+            }
+        }
     }
-    return null;
+    return index;
 }
 
 export function toNotesHref(slugPath) {
@@ -96,7 +350,7 @@ function getContentBase() {
     return contentBase;
 }
 
-function buildContentUrl(relativePath) {
+export function buildContentUrl(relativePath) {
     const base = getContentBase();
     const trimmed = relativePath.replace(/^\/+/, '');
     if (!base) {
@@ -126,6 +380,20 @@ function rewriteRelativeUrls(html, relativePath) {
         return `${start}${full}${end}`;
     });
     
+    // Rewrite each candidate URL of img srcset attributes
+    result = result.replace(/(<img\b[^>]*\ssrcset\s*=\s*["'])([^"']+)(["'])/gi, (match, start, srcset, end) => {
+        const rewritten = srcset.split(',').map((candidate) => {
+            const [url, ...descriptors] = candidate.trim().split(/\s+/);
+            if (!url || /^(?:[a-z]+:|data:|\/)/i.test(url)) {
+                return candidate.trim();
+            }
+            const cleaned = url.replace(/^\.\//, '');
+            const full = `${prefix}/${cleaned}`.replace(/\/+/g, '/');
+            return [full, ...descriptors].join(' ');
+        });
+        return `${start}${rewritten.join(', ')}${end}`;
+    });
+
     // Rewrite data-excalidraw-src attributes
     result = result.replace(/(data-excalidraw-src\s*=\s*["'])([^"'?#]+)(["'])/gi, (match, start, src, end) => {
         const trimmedSrc = src.trim();
@@ -0,0 +1,112 @@
+// Lazy client for the sharded full-text index written by `build.py --search`.
+import { loadManifest, buildContentUrl, toNotesHref } from './content-store.js';
+
+
+let indexPromise;
+let indexBase = '';
+const shardCache = new Map();
+
+function loadSearchIndex() {
+    if (!indexPromise) {
+        // The manifest sets the content base and names the index, if the
+        // build wrote one; shards sit next to it.
+        indexPromise = loadManifest()
+            .then((manifest) => {
+                if (!manifest.search) {
+                    throw new Error('This build has no search index.');
+                }
+                indexBase = manifest.search.slice(0, manifest.search.lastIndexOf('/') + 1);
+                return fetch(buildContentUrl(manifest.search));
+            })
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to fetch search index (status ${response.status}).`);
+                }
+                return response.json();
+            })
+            .catch((error) => {
+                indexPromise = undefined;
+                throw error;
+            });
+    }
+    return indexPromise;
+}
+
+function loadShard(index, prefix) {
+    const file = index.shards[prefix];
+    if (!file) {
+        return Promise.resolve({});
+    }
+    if (!shardCache.has(file)) {
+        const promise = fetch(buildContentUrl(`${indexBase}${file}`))
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to fetch search shard (status ${response.status}).`);
+                }
+                return response.json();
+            })
+            .catch((error) => {
+                shardCache.delete(file);
+                throw error;
+            });
+        shardCache.set(file, promise);
+    }
+    return shardCache.get(file);
+}
+
+// Mirrors builder/search.py: lowercased runs of letters and digits.
+export function tokenize(text, minLength = 2) {
+    return (text.toLowerCase().match(/[\p{L}\p{N}]+/gu) || []).filter((term) => term.length >= minLength);
+}
+
+// Returns the notes containing every query term, best matches first. The last
+// term also matches as a prefix while the user is still typing it.
+export async function searchNotes(query, { limit = 20 } = {}) {
+    const index = await loadSearchIndex();
+    const terms = [...new Set(tokenize(query, index.minTermLength))];
+    if (terms.length === 0) {
+        return [];
+    }
+    const expandLast = !/\s$/.test(query);
+    const shards = await Promise.all(terms.map((term) => loadShard(index, term.slice(0, index.prefixLength))));
+
+    const noteCount = index.notes.length;
+    let scores;
+    terms.forEach((term, position) => {
+        const shard = shards[position];
+        const matching = expandLast && position === terms.length - 1
+            ? Object.keys(shard).filter((candidate) => candidate.startsWith(term))
+            : (shard[term] ? [term] : []);
+        const termScores = new Map();
+        for (const candidate of matching) {
+            // Postings are flat [noteId, frequency, noteId, frequency, ...] pairs.
+            const postings = shard[candidate];
+            const idf = Math.log(1 + noteCount / (postings.length / 2));
+            for (let i = 0; i < postings.length; i += 2) {
+                const noteId = postings[i];
+                const length = index.notes[noteId][2] || 1;
+                const score = (postings[i + 1] / Math.sqrt(length)) * idf;
+                termScores.set(noteId, (termScores.get(noteId) || 0) + score);
+            }
+        }
+        if (!scores) {
+            scores = termScores;
+            return;
+        }
+        for (const [noteId, score] of scores) {
+            if (termScores.has(noteId)) {
+                scores.set(noteId, score + termScores.get(noteId));
+            } else {
+                scores.delete(noteId);
+            }
+        }
+    });
+
+    return [...scores]
+        .sort((a, b) => b[1] - a[1])
+        .slice(0, limit)
+        .map(([noteId, score]) => {
+            const [slugPath, title] = index.notes[noteId];
+            return { slugPath, title, score, href: toNotesHref(slugPath) };
+        });
+}
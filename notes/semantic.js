@@ -0,0 +1,129 @@
+// Client for the quantized embeddings written by `build.py --semantic`.
+import { loadManifest, buildContentUrl, toNotesHref } from './content-store.js';
+
+const SEMANTIC_DIR = '_semantic';
+
+let indexPromise;
+const chunkCache = new Map();
+
+function loadSemanticIndex() {
+    if (!indexPromise) {
+        indexPromise = loadManifest()
+            .then(() => fetch(buildContentUrl(`${SEMANTIC_DIR}/index.json`)))
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to fetch semantic index (status ${response.status}).`);
+                }
+                return response.json();
+            })
+            .then((index) => {
+                index.rowsBySlug = new Map(index.notes.map(([slugPath], row) => [slugPath, row]));
+                return index;
+            })
+            .catch((error) => {
+                indexPromise = undefined;
+                throw error;
+            });
+    }
+    return indexPromise;
+}
+
+// A chunk holds `rows` float32 scales followed by `rows * dimension` int8 codes.
+function loadChunk(index, number) {
+    if (!chunkCache.has(number)) {
+        const { file, rows } = index.chunks[number];
+        const promise = fetch(buildContentUrl(`${SEMANTIC_DIR}/${file}`))
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to fetch embedding chunk (status ${response.status}).`);
+                }
+                return response.arrayBuffer();
+            })
+            .then((buffer) => ({
+                scales: new Float32Array(buffer, 0, rows),
+                codes: new Int8Array(buffer, rows * 4, rows * index.dimension),
+            }))
+            .catch((error) => {
+                chunkCache.delete(number);
+                throw error;
+            });
+        chunkCache.set(number, promise);
+    }
+    return chunkCache.get(number);
+}
+
+function toResult(index, row, score) {
+    const [slugPath, title] = index.notes[row];
+    return { slugPath, title, score, href: toNotesHref(slugPath) };
+}
+
+// The related notes computed at build time; no embeddings are downloaded.
+export async function relatedNotes(slugPath) {
+    const index = await loadSemanticIndex();
+    const row = index.rowsBySlug.get(slugPath);
+    if (row === undefined) {
+        return [];
+    }
+    return (index.related[row] || []).map((other) => toResult(index, other, null));
+}
+
+// Scores every note against a query vector, fetching chunks one at a time,
+// and returns the k most similar notes, best first.
+export async function searchByVector(vector, { k = 10, exclude = -1 } = {}) {
+    const index = await loadSemanticIndex();
+    const { dimension } = index;
+    let norm = 0;
+    for (let i = 0; i < dimension; i += 1) {
+        norm += vector[i] * vector[i];
+    }
+    norm = Math.sqrt(norm) || 1;
+    const query = Float32Array.from(vector, (value) => value / norm);
+
+    // Kept sorted by descending score; k is small, so insertion is cheap.
+    const best = [];
+    let firstRow = 0;
+    for (let number = 0; number < index.chunks.length; number += 1) {
+        const { scales, codes } = await loadChunk(index, number);
+        for (let row = 0; row < scales.length; row += 1) {
+            const offset = row * dimension;
+            let dot = 0;
+            for (let i = 0; i < dimension; i += 1) {
+                dot += query[i] * codes[offset + i];
+            }
+            const score = dot * scales[row];
+            const id = firstRow + row;
+            if (id === exclude || (best.length === k && score <= best[k - 1][1])) {
+                continue;
+            }
+            let position = best.length;
+            while (position > 0 && best[position - 1][1] < score) {
+                position -= 1;
+            }
+            best.splice(position, 0, [id, score]);
+            if (best.length > k) {
+                best.pop();
+            }
+        }
+        firstRow += scales.length;
+    }
+    return best.map(([row, score]) => toResult(index, row, score));
+}
+
+// Scores every note against the (dequantized) vector of one note.
+export async function similarNotes(slugPath, { k = 10 } = {}) {
+    const index = await loadSemanticIndex();
+    const row = index.rowsBySlug.get(slugPath);
+    if (row === undefined) {
+        return [];
+    }
+    let number = 0;
+    let firstRow = 0;
+    while (firstRow + index.chunks[number].rows <= row) {
+        firstRow += index.chunks[number].rows;
+        number += 1;
+    }
+    const { scales, codes } = await loadChunk(index, number);
+    const offset = (row - firstRow) * index.dimension;
+    const vector = Float32Array.from(codes.subarray(offset, offset + index.dimension), (code) => code * scales[row - firstRow]);
+    return searchByVector(vector, { k, exclude: row });
+}
@@ -0,0 +1,89 @@
+"""
+Preprocesses a GeoJSON layer for the modular_map viewer.
+
+The map and its attribute table used to download the whole FeatureCollection
+(twice) before drawing anything. This script splits it into geometry
+simplified per zoom level, spatial tiles with a bounding box index, and a
+columnar properties file; the viewer then loads only the tiles in view at the
+current zoom, and the table loads the properties without any geometry. The
+attribute table's search index is built here too, so the browser searches
+without scanning every row first. See `builder/map_tiles.py` and
+`builder/map_search.py` for the output format.
+
+Usage:
+    python prepare_map.py modular_map/data/bnsf_rail.geojson [--out DIR]
+                          [--zooms 4,6,8,10,12] [--tolerance PIXELS] [--search-columns A,B,...]
+
+Example:
+    python prepare_map.py modular_map/data/bnsf_rail.geojson
+
+The output goes to a directory named after the input, next to it (here
+'modular_map/data/bnsf_rail/'), where the viewer looks for 'index.json'
+before falling back to the GeoJSON file. The script prints the size of each
+zoom level's tiles, of the properties and of the search index, and the time
+each stage took.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from builder import map_tiles
+from builder.constants import DEFAULT_MAP_ZOOMS, DEFAULT_SIMPLIFY_PIXELS
+from builder.utils import format_size
+
+
+def parse_zooms(value: str) -> list:
+    """Parses a comma-separated list of zoom levels."""
+    try:
+        zooms = sorted({int(zoom) for zoom in value.split(",") if zoom.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a list of zoom levels: {value!r}")
+    if not zooms or zooms[0] < 0 or zooms[-1] > 22:
+        raise argparse.ArgumentTypeError("zoom levels must be between 0 and 22")
+    return zooms
+
+
+def main() -> None:
+    """Parses arguments, preprocesses the layer and prints the report."""
+    parser = argparse.ArgumentParser(description="Split a GeoJSON layer into simplified tiles and columnar properties.")
+    parser.add_argument("source", type=Path, help="The GeoJSON FeatureCollection to preprocess.")
+    parser.add_argument("--out", type=Path, help="Output directory (default: the input's name without its extension, next to it).")
+    parser.add_argument("--zooms", type=parse_zooms, default=list(DEFAULT_MAP_ZOOMS),
+                        help=f"Comma-separated zoom levels; the last keeps every vertex (default: {','.join(map(str, DEFAULT_MAP_ZOOMS))}).")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_SIMPLIFY_PIXELS, metavar="PIXELS",
+                        help=f"Simplification tolerance in screen pixels (default: {DEFAULT_SIMPLIFY_PIXELS}).")
+    parser.add_argument("--search-columns", metavar="A,B,...", help="Comma-separated properties to index for search (default: all).")
+    args = parser.parse_args()
+    if map_tiles.np is None:
+        parser.error("prepare_map.py needs NumPy (pip install numpy)")
+    if args.tolerance <= 0:
+        parser.error("--tolerance must be positive")
+    if not args.source.is_file():
+        parser.error(f"{args.source} is not a file")
+
+    output = args.out or args.source.with_suffix("")
+    search_columns = [name.strip() for name in args.search_columns.split(",") if name.strip()] if args.search_columns else None
+    started = time.perf_counter()
+    try:
+        report = map_tiles.prepare_layer(args.source, output, args.zooms, args.tolerance, search_columns)
+    except ValueError as error:
+        raise SystemExit(f"Error: {error}")
+    elapsed = time.perf_counter() - started
+
+    print(f"Source: {args.source} ({format_size(report.input_bytes)}, {report.features} features, {report.vertices} vertices)")
+    print(f"Output: {output}\n")
+    print(f"{'zoom':>4} {'tiles at':>8} {'tiles':>6} {'features':>9} {'vertices':>10} {'size':>10}")
+    for level in report.levels:
+        kept = level.vertices / report.vertices if report.vertices else 1
+        print(f"{level.zoom:>4} {level.tile_zoom:>8} {level.tiles:>6} {level.features:>9} "
+              f"{level.vertices:>10} {format_size(level.bytes):>10}  ({kept:.0%} of vertices)")
+    print(f"\nProperties: {format_size(report.properties_bytes)}, search index: {format_size(report.search_bytes)}, "
+          f"index: {format_size(report.index_bytes)}, "
+          f"total: {format_size(report.output_bytes)}")
+    print("Time: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in report.timings.items())
+          + f" (total {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@
  * Excalidraw Utilities
  * 
  * This module handles the loading and rendering of Excalidraw diagrams
- * embedded in markdown content.
+ * embedded in markdown content. Embeds that carry an SVG rendered at build
+ * time show it as is; React and Excalidraw are only loaded when one of them
+ * is clicked.
  */
 
 // Track whether Excalidraw libraries have been loaded
@@ -72,6 +74,7 @@ async function loadExcalidrawFile(path) {
       throw new Error(`Failed to load Excalidraw file: ${response.statusText}`);
     }
     const data = await response.json();
+    await loadSceneFiles(data, new URL(path, document.baseURI));
     return data;
   } catch (error) {
     console.error('Error loading Excalidraw file:', error);
@@ -79,6 +82,33 @@ async function loadExcalidrawFile(path) {
   }
 }
 
+/**
+ * Fill in the images of a scene slimmed at build time
+ * With '--slim-scenes', embedded images are stored as separate files and each
+ * entry of `files` carries a `src` relative to the scene instead of a `dataURL`
+ * @param {Object} data - The parsed scene, updated in place
+ * @param {URL} sceneUrl - The URL the scene was fetched from
+ * @returns {Promise<void>}
+ */
+async function loadSceneFiles(data, sceneUrl) {
+  const files = Object.values(data.files || {}).filter(file => file.src && !file.dataURL);
+  await Promise.all(files.map(async (file) => {
+    const response = await fetch(new URL(file.src, sceneUrl));
+    if (!response.ok) {
+      throw new Error(`Failed to load image ${file.src}: ${response.statusText}`);
+    }
+    const blob = await response.blob();
+    file.dataURL = await new Promise((resolve, reject) => {
+      const reader = new FileReader();
+      reader.onload = () => resolve(reader.result);
+      reader.onerror = () => reject(reader.error);
+      // The server's content type may be missing; the scene records the real one
+      reader.readAsDataURL(file.mimeType ? new Blob([blob], { type: file.mimeType }) : blob);
+    });
+    delete file.src;
+  }));
+}
+
 /**
  * Render an Excalidraw diagram into a container
  * @param {HTMLElement} container - The container element
@@ -143,9 +173,20 @@ function initializeExcalidrawEmbeds() {
   
   embeds.forEach(embed => {
     const src = embed.getAttribute('data-excalidraw-src');
-    if (src) {
+    if (!src) {
+      return;
+    }
+    const preview = embed.querySelector('.excalidraw-preview');
+    if (!preview) {
+      // No pre-rendered SVG: load the viewer right away
       renderExcalidraw(embed, src);
+      return;
     }
+    preview.title = 'Click to open the interactive diagram';
+    embed.addEventListener('click', () => {
+      embed.innerHTML = '<div class="excalidraw-loading">Loading Excalidraw diagram...</div>';
+      renderExcalidraw(embed, src);
+    }, { once: true });
   });
 }
 
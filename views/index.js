@@ -1,6 +1,8 @@
 // View functions stay modular so routing just chooses among them.
 import { guides, guidesBySlug } from '../guides.js';
-import { resolveNode, fetchHtml, toNotesHref } from '../notes/content-store.js';
+import { loadManifest, resolveNode, fetchHtml, findNode, toNotesHref } from '../notes/content-store.js';
+import { searchNotes } from '../notes/search.js';
+import { relatedNotes } from '../notes/semantic.js';
 import { codeBlock, escapeHtml } from '../utils/rendering.js';
 import { initializeExcalidrawEmbeds } from '../utils/excalidraw.js';
 import { createSplashPhysics, createSkillBubbles, createFloatingParticles } from '../utils/physics.js';
@@ -164,21 +166,24 @@ function renderNotesPath(ctx, segments) {
             if (ctx.location.path !== requestPath) return;
 
             if (result.kind === 'directory') {
-                const readmeHtml = await fetchHtml(result.node.readme.html);
+                const readmeHtml = await fetchHtml(result.node.readme.html, result.node.readme.htmlHash);
+                const manifest = await loadManifest();
                 if (ctx.location.path !== requestPath) return;
                 document.title = directoryTitle(result.node);
-                ctx.mount.innerHTML = buildDirectoryMarkup(result.node, readmeHtml);
+                ctx.mount.innerHTML = buildDirectoryMarkup(result.node, readmeHtml, Boolean(manifest.search));
                 // Initialize any Excalidraw embeds in the content
                 initializeExcalidrawEmbeds();
+                initializeNotesSearch(ctx.mount);
                 return;
             }
 
-            const fileHtml = await fetchHtml(result.node.html);
+            const fileHtml = await fetchHtml(result.node.html, result.node.htmlHash);
             if (ctx.location.path !== requestPath) return;
             document.title = fileTitle(result.node);
             ctx.mount.innerHTML = buildFileMarkup(result.node, fileHtml);
             // Initialize any Excalidraw embeds in the content
             initializeExcalidrawEmbeds();
+            appendRelatedNotes(ctx, requestPath, result.node);
         })
         .catch((error) => {
             console.error(error);
@@ -188,15 +193,17 @@ function renderNotesPath(ctx, segments) {
         });
 }
 
-function buildDirectoryMarkup(node, readmeHtml) {
+function buildDirectoryMarkup(node, readmeHtml, searchable) {
     return `
         <section class="notes-view">
             ${renderBreadcrumbs(node.breadcrumbs, node.title, node.slugPath)}
             <header class="notes-header">
                 <h1>${escapeHtml(node.title)}</h1>
+                ${searchable ? renderSearchForm() : ''}
             </header>
             ${renderDirectoryLists(node)}
             <article class="notes-content">${readmeHtml}</article>
+            ${renderBacklinks(node)}
         </section>
     `;
 }
@@ -212,6 +219,7 @@ function buildFileMarkup(node, fileHtml) {
             <a class="notes-backlink" href="${backHref}">← Back to ${escapeHtml(backLabel)}</a>
             <h1>${escapeHtml(node.title)}</h1>
             <article class="notes-content">${fileHtml}</article>
+            ${renderBacklinks(node)}
         </section>
     `;
 }
@@ -236,13 +244,104 @@ function renderDirectoryPanel(label, items) {
             <h2>${escapeHtml(label)}</h2>
             <ul>
                 ${items.map((item) => `
-                    <li><a href="${toNotesHref(item.slugPath)}">${escapeHtml(item.title)}</a></li>
+                    <li><a href="${toNotesHref(item.slugPath)}">${escapeHtml(item.title)}</a>${renderPreview(item)}</li>
                 `).join('')}
             </ul>
         </div>
     `;
 }
 
+// Builds run with '--previews' store an excerpt and word count on each
+// node (a directory's on its readme), so listings need no fragment fetch.
+function renderPreview(item) {
+    const preview = item.preview || (item.readme && item.readme.preview);
+    if (!preview) {
+        return '';
+    }
+    const words = `${preview.words} ${preview.words === 1 ? 'word' : 'words'}`;
+    return `
+        <p class="notes-directory-preview">
+            ${preview.excerpt ? `${escapeHtml(preview.excerpt)} ` : ''}<span class="muted">${words}</span>
+        </p>
+    `;
+}
+
+// Backlinks are precomputed by the build, so no other fragment is fetched.
+function renderBacklinks(node) {
+    const backlinks = Array.isArray(node.backlinks) ? node.backlinks : [];
+    if (backlinks.length === 0) {
+        return '';
+    }
+    const items = backlinks.map((slugPath) => {
+        const entry = findNode(slugPath);
+        return { title: entry ? entry.node.title : slugPath || 'Notes', slugPath };
+    });
+    return `<aside class="notes-backlinks">${renderDirectoryPanel('Linked from', items)}</aside>`;
+}
+
+// Shown when the build wrote a full-text index ('build.py --search'), which
+// is only fetched once the reader starts typing.
+function renderSearchForm() {
+    return `
+        <form class="notes-search" role="search">
+            <input type="search" name="q" placeholder="Search notes…" aria-label="Search notes" autocomplete="off">
+            <ol class="notes-search-results" aria-live="polite"></ol>
+        </form>
+    `;
+}
+
+function initializeNotesSearch(mount) {
+    const form = mount.querySelector('.notes-search');
+    if (!form) {
+        return;
+    }
+    const input = form.elements.q;
+    const results = form.querySelector('.notes-search-results');
+    // Responses can arrive out of order; only the latest query's is shown.
+    let latest = 0;
+    form.addEventListener('submit', (event) => event.preventDefault());
+    input.addEventListener('input', () => {
+        const query = input.value;
+        const request = ++latest;
+        if (!query.trim()) {
+            results.innerHTML = '';
+            return;
+        }
+        searchNotes(query, { limit: 10 })
+            .then((matches) => {
+                if (request !== latest) return;
+                results.innerHTML = matches.length > 0
+                    ? matches.map((match) => `<li><a href="${match.href}">${escapeHtml(match.title)}</a></li>`).join('')
+                    : '<li class="muted">No matching notes.</li>';
+            })
+            .catch((error) => {
+                console.error(error);
+                if (request !== latest) return;
+                results.innerHTML = '<li class="muted">Search is unavailable.</li>';
+            });
+    });
+}
+
+// Related notes come from the export written by 'build.py --semantic'; a
+// build without it simply shows none, and is not asked again.
+let relatedUnavailable = false;
+
+function appendRelatedNotes(ctx, requestPath, node) {
+    if (relatedUnavailable) {
+        return;
+    }
+    relatedNotes(node.slugPath)
+        .then((related) => {
+            if (ctx.location.path !== requestPath || related.length === 0) return;
+            const view = ctx.mount.querySelector('.notes-view');
+            if (!view || view.querySelector('.notes-related')) return;
+            view.insertAdjacentHTML('beforeend', `<aside class="notes-related">${renderDirectoryPanel('Related notes', related)}</aside>`);
+        })
+        .catch(() => {
+            relatedUnavailable = true;
+        });
+}
+
 function renderBreadcrumbs(trail, currentTitle, currentSlugPath) {
     const crumbs = Array.isArray(trail) ? [...trail] : [];
     if (currentTitle) {